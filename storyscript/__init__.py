@@ -1,10 +1,40 @@
 # -*- coding: utf-8 -*-
-from .api import Api
+import sys
+
 from .version import version
 
 
 __version__ = version = version
 
 
-loads = Api.loads
-load = Api.load
+if sys.version_info < (3, 7):
+    # Module attributes can't be loaded lazily before Python 3.7
+    from .api import Api
+else:
+    def __getattr__(name):
+        """
+        Imports the Api when first used, so that importing storyscript is
+        fast.
+        """
+        if name == 'Api':
+            from . import api
+            return api.Api
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
+
+
+def loads(*args, **kwargs):
+    """
+    Compiles a story. The compiler is imported when first used, so that
+    importing storyscript is fast.
+    """
+    from . import api
+    return api.Api.loads(*args, **kwargs)
+
+
+def load(*args, **kwargs):
+    """
+    Compiles a story from a stream
+    """
+    from . import api
+    return api.Api.load(*args, **kwargs)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from .document import Document
 from .story import Story
 
 
@@ -7,10 +8,22 @@ class Api:
     Exposes functionalities for external use
     """
     @staticmethod
-    def loads(string):
-        return Story(string).process()
+    def loads(string, segments=False):
+        """
+        Compiles a story. With segments, strings with values are compiled
+        with their segments, which resolve faster.
+        """
+        return Story(string).process(segments=segments)
 
     @staticmethod
     def load(stream):
         story = Story.from_stream(stream).process()
         return {stream.name: story, 'services': story['services']}
+
+    @staticmethod
+    def document(string):
+        """
+        Loads a story that is being edited. The document compiles the story
+        again after each edit with Document.edit, faster than loads would.
+        """
+        return Document(string)
@@ -2,6 +2,7 @@
 import json
 import os
 
+from .buildcache import BuildCache
 from .bundle import Bundle
 from .parser import Grammar
 from .story import Story
@@ -13,11 +14,21 @@ class App:
     """
 
     @classmethod
-    def compile(cls, path, ebnf_file=None, debug=False):
+    def compile(cls, path, ebnf_file=None, debug=False, cache=False,
+                workers=None):
         """
-        Parse and compile stories in path to JSON
+        Parse and compile stories in path to JSON. When cache is set,
+        unchanged stories are loaded from the build cache, or from cache
+        itself when it's a BuildCache.
         """
-        bundle = Bundle(path).bundle(ebnf_file=ebnf_file, debug=debug)
+        build_cache = None
+        if isinstance(cache, BuildCache):
+            build_cache = cache
+        elif cache:
+            build_cache = BuildCache()
+        bundle = Bundle(path, cache=build_cache)
+        bundle = bundle.bundle(ebnf_file=ebnf_file, debug=debug,
+                               workers=workers)
         return json.dumps(bundle, indent=2)
 
     @classmethod
@@ -28,7 +39,7 @@ class App:
         stories = Bundle(path).find_stories()
         results = {}
         for story in stories:
-            results[story] = Story.from_file(story).lex()
+            results[story] = Story.lex_file(story)
         return results
 
     @staticmethod
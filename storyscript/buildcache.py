@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import json
+import os
+
+from .parser import Parser
+from .version import version
+
+
+class BuildCache:
+    """
+    Stores compiled stories on disk, so that unchanged stories don't have to
+    be parsed and compiled again. Entries are keyed by the story source, the
+    grammar and the compiler version.
+
+    When size is set, that many entries are also kept in memory, for
+    long-running processes like the compile server. Without a directory,
+    entries are kept only in memory.
+    """
+    def __init__(self, directory='.storyscript_cache', size=0):
+        self.directory = directory
+        self.size = size
+        self.entries = {}
+        self.grammars = {}
+
+    @staticmethod
+    def grammar_key(ebnf_file):
+        """
+        Identifies a version of an ebnf file by its absolute path, its
+        modification time and its size, so that edited files and files of
+        other directories get their own hashes.
+        """
+        if ebnf_file is None:
+            return None
+        stat = os.stat(ebnf_file)
+        return (os.path.abspath(ebnf_file), stat.st_mtime_ns, stat.st_size)
+
+    def grammar_hash(self, ebnf_file):
+        """
+        Gets the hash of the grammar, computing it once per version of the
+        ebnf file.
+        """
+        key = self.grammar_key(ebnf_file)
+        if key not in self.grammars:
+            parser = Parser(ebnf_file=ebnf_file)
+            self.grammars[key] = parser.hash_grammar(parser.grammar())
+        return self.grammars[key]
+
+    def key(self, source, ebnf_file=None):
+        """
+        Builds the key for a story source
+        """
+        string = '{}:{}:{}'.format(version, self.grammar_hash(ebnf_file),
+                                   source)
+        return hashlib.sha256(string.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, '{}.json'.format(key))
+
+    def keep(self, key, entry):
+        """
+        Keeps an entry in memory, dropping the oldest one when there are
+        already size entries.
+        """
+        if self.size:
+            if key not in self.entries and len(self.entries) >= self.size:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = entry
+
+    def load(self, key):
+        """
+        Loads an entry from the cache. Returns None when missing or
+        unreadable.
+        """
+        if key in self.entries:
+            return self.entries[key]
+        if self.directory is None:
+            return None
+        try:
+            with io.open(self.path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.keep(key, entry)
+        return entry
+
+    def save(self, key, entry):
+        """
+        Saves an entry to the cache. Failures are ignored, as the cache is
+        only an optimization.
+        """
+        self.keep(key, entry)
+        if self.directory is None:
+            return
+        path = self.path(key)
+        temporary = '{}.{}'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with io.open(temporary, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
@@ -1,16 +1,30 @@
 # -*- coding: utf-8 -*-
 import os
+from concurrent.futures import ProcessPoolExecutor
 
+from .exceptions import StoryError
 from .story import Story
 
 
+def build(story, ebnf_file, debug):
+    """
+    Parses and compiles a story, returning its modules and the compiled
+    story. It's a function, so that process pools send only its arguments
+    to their workers.
+    """
+    story.parse(ebnf_file=ebnf_file, debug=debug)
+    story.compile(debug=debug)
+    return story.modules(), story.compiled
+
+
 class Bundle:
     """
     Bundles all stories that must be compiled together.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, cache=None):
         self.path = path
+        self.cache = cache
         self.stories = {}
 
     def find_stories(self):
@@ -34,26 +48,121 @@ class Bundle:
         services.sort()
         return services
 
-    def compile_modules(self, stories, ebnf_file, debug):
-        self.compile(stories, ebnf_file, debug)
+    def load(self, story, ebnf_file):
+        """
+        Loads the modules and the compiled story from the build cache.
+        Returns None when there's no cache or the story is missing.
+        """
+        if self.cache:
+            entry = self.cache.load(self.cache.key(story.story, ebnf_file))
+            if entry:
+                return entry['modules'], entry['compiled']
+        return None
+
+    def save(self, story, ebnf_file, result):
+        """
+        Saves the modules and the compiled story to the build cache.
+        """
+        if self.cache:
+            modules, compiled = result
+            entry = {'modules': modules, 'compiled': compiled}
+            self.cache.save(self.cache.key(story.story, ebnf_file), entry)
 
-    def compile(self, stories, ebnf_file, debug):
+    def compile_story(self, story, ebnf_file, debug):
+        """
+        Parses and compiles a story, unless it's found in the build cache.
+        Returns the modules of the story and the compiled story.
         """
-        Reads and parses a story, then compiles its modules and finally
-        compiles the story itself.
+        result = self.load(story, ebnf_file)
+        if result is None:
+            result = build(story, ebnf_file, debug)
+            self.save(story, ebnf_file, result)
+        return result
+
+    def compile_file(self, storypath, ebnf_file, debug):
+        """
+        Reads and compiles a story file.
+        """
+        story = Story.from_file(storypath)
+        return self.compile_story(story, ebnf_file, debug)
+
+    def collect(self, stories, results, debug, importers=()):
+        """
+        Adds compiled stories to the bundle, each one after the modules it
+        imports, so that the bundle is in topological order. Import cycles
+        are reported as story errors.
         """
         for storypath in stories:
-            story = Story.from_file(storypath)
-            story.parse(ebnf_file=ebnf_file, debug=debug)
-            self.compile_modules(story.modules(), ebnf_file, debug)
-            story.compile(debug=debug)
-            self.stories[storypath] = story.compiled
+            if storypath in importers:
+                cycle = importers[importers.index(storypath):] + (storypath,)
+                error = StoryError('module-cycle',
+                                   {'value': ' -> '.join(cycle)})
+                if debug:
+                    raise error
+                print(error.message())
+                exit()
+            if storypath in self.stories:
+                continue
+            modules, compiled = results[storypath]
+            self.collect(modules, results, debug, importers + (storypath,))
+            self.stories[storypath] = compiled
+
+    def compile(self, stories, ebnf_file, debug):
+        """
+        Compiles stories and the modules they import, following the import
+        graph. Each story is compiled once, regardless of how many stories
+        import it.
+        """
+        results = {}
+        pending = list(stories)
+        while pending:
+            storypath = pending.pop(0)
+            if storypath not in results:
+                results[storypath] = self.compile_file(storypath, ebnf_file,
+                                                       debug)
+                pending += results[storypath][0]
+        self.collect(stories, results, debug)
+
+    def compile_parallel(self, stories, ebnf_file, debug, workers):
+        """
+        Compiles stories over a pool of processes. Modules are compiled in
+        further rounds, as they are found only after parsing their importers.
+        Stories are loaded from the build cache and saved to it here, as
+        workers would save them to their own copies of it.
+        """
+        results = {}
+        pending = list(stories)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while pending:
+                futures = {}
+                for storypath in pending:
+                    story = Story.from_file(storypath)
+                    results[storypath] = self.load(story, ebnf_file)
+                    if results[storypath] is None:
+                        future = executor.submit(build, story, ebnf_file,
+                                                 debug)
+                        futures[storypath] = (story, future)
+                for storypath, (story, future) in futures.items():
+                    results[storypath] = future.result()
+                    self.save(story, ebnf_file, results[storypath])
+                found = []
+                for storypath in pending:
+                    for module in results[storypath][0]:
+                        if module not in results and module not in found:
+                            found.append(module)
+                pending = [module for module in found
+                           if module not in results]
+        self.collect(stories, results, debug)
 
-    def bundle(self, ebnf_file=None, debug=False):
+    def bundle(self, ebnf_file=None, debug=False, workers=None):
         """
-        Makes the bundle
+        Makes the bundle. When workers is more than one, stories are
+        compiled in parallel by that many processes.
         """
         entrypoint = self.find_stories()
-        self.compile(entrypoint, ebnf_file, debug)
+        if workers and workers > 1:
+            self.compile_parallel(entrypoint, ebnf_file, debug, workers)
+        else:
+            self.compile(entrypoint, ebnf_file, debug)
         return {'stories': self.stories, 'services': self.services(),
                 'entrypoint': entrypoint}
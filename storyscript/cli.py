@@ -3,15 +3,21 @@ import os
 
 import click
 
-from .app import App
 from .version import version as app_version
 
 
 class Cli:
+    """
+    The command line. Modules loading the parser are imported by the
+    commands that need them, so that commands like version start fast.
+    """
 
     version_help = 'Prints Storyscript version'
     silent_help = 'Silent mode. Return syntax errors only.'
     ebnf_file_help = 'Load the grammar from a file. Useful for development'
+    cache_help = 'Reuse compiled stories from the .storyscript_cache directory'
+    jobs_help = 'Number of processes compiling stories in parallel'
+    server_help = 'Compile with the server started by serve, when running'
 
     @click.group(invoke_without_command=True)
     @click.option('--version', is_flag=True, help=version_help)
@@ -36,11 +42,24 @@ class Cli:
     @click.option('--silent', '-s', is_flag=True, help=silent_help)
     @click.option('--debug', is_flag=True)
     @click.option('--ebnf-file', help=ebnf_file_help)
-    def compile(storypath, output_file_path, json, silent, debug, ebnf_file):
+    @click.option('--cache', is_flag=True, help=cache_help)
+    @click.option('--jobs', default=1, help=jobs_help)
+    @click.option('--server', is_flag=True, help=server_help)
+    def compile(storypath, output_file_path, json, silent, debug, ebnf_file,
+                cache, jobs, server):
         """
         Compiles stories and prints the resulting json
         """
-        results = App.compile(storypath, ebnf_file=ebnf_file, debug=debug)
+        results = None
+        if server:
+            from .client import Client
+            results = Client().compile(storypath, ebnf_file=ebnf_file,
+                                       debug=debug, cache=cache,
+                                       workers=jobs)
+        if results is None:
+            from .app import App
+            results = App.compile(storypath, ebnf_file=ebnf_file,
+                                  debug=debug, cache=cache, workers=jobs)
         if not silent:
             if json:
                 if output_file_path:
@@ -58,19 +77,38 @@ class Cli:
         """
         Shows lexer tokens for given stories
         """
+        from .app import App
         results = App.lex(storypath)
         for file, tokens in results.items():
             click.echo('File: {}'.format(file))
             for n, token in enumerate(tokens):
                 click.echo('{} {} {}'.format(n, token.type, token.value))
 
+    @staticmethod
+    @main.command()
+    def serve():
+        """
+        Compiles stories for compile --server, keeping the parser loaded.
+        The socket is found in STORYSCRIPT_SOCKET or the runtime directory.
+        """
+        from .server import Server
+        server = Server()
+        click.echo('Serving on {}'.format(server.path))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
     @staticmethod
     @main.command()
     def grammar():
         """
         Prints the grammar specification
         """
-        click.echo(App.grammar())
+        from .parser.grammar import Grammar
+        click.echo(Grammar().build())
 
     @staticmethod
     @main.command()
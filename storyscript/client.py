@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import sys
+import tempfile
+
+from .version import version
+
+
+class Client:
+    """
+    Sends requests to a compile server. It imports only what it needs, so
+    that compiling with the server doesn't load the parser. Responses are
+    awaited for timeout seconds at most.
+    """
+    timeout = 60
+
+    def __init__(self, path=None):
+        self.path = path
+
+    @staticmethod
+    def socket_path():
+        """
+        Finds the socket path, either from STORYSCRIPT_SOCKET or from the
+        user runtime directory.
+        """
+        if 'STORYSCRIPT_SOCKET' in os.environ:
+            return os.environ['STORYSCRIPT_SOCKET']
+        directory = os.environ.get('XDG_RUNTIME_DIR', tempfile.gettempdir())
+        return os.path.join(directory, 'storyscript-{}.sock'.format(
+            os.getuid()))
+
+    @staticmethod
+    def owned(path):
+        """
+        Checks that the socket belongs to the current user, so that another
+        user can't answer in place of the server.
+        """
+        try:
+            return os.stat(path).st_uid == os.getuid()
+        except OSError:
+            return False
+
+    def request(self, method, params=None):
+        """
+        Sends a JSON-RPC request. Returns None when no server is running,
+        or when it doesn't answer within timeout.
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            return None
+        path = self.path or self.socket_path()
+        if not self.owned(path):
+            return None
+        request = {'jsonrpc': '2.0', 'id': 1, 'method': method,
+                   'params': params or {}}
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with connection:
+            connection.settimeout(self.timeout)
+            try:
+                connection.connect(path)
+                message = json.dumps(request).encode('utf-8')
+                connection.sendall(message + b'\n')
+                with connection.makefile('rb') as f:
+                    line = f.readline()
+            except OSError:
+                return None
+        if not line:
+            return None
+        return json.loads(line.decode('utf-8'))
+
+    def compile(self, path, ebnf_file=None, debug=False, cache=False,
+                workers=None):
+        """
+        Compiles stories with the server, printing and exiting as the
+        compile command would. Returns None when no server could compile
+        them.
+        """
+        params = {'cwd': os.getcwd(), 'path': path, 'ebnf_file': ebnf_file,
+                  'debug': debug, 'cache': cache, 'workers': workers,
+                  'version': version}
+        response = self.request('compile', params)
+        if response is None or 'result' not in response:
+            return None
+        result = response['result']
+        sys.stdout.write(result['output'])
+        if result['error']:
+            sys.stderr.write(result['error'])
+            exit(1)
+        if result['exited']:
+            exit(result['code'])
+        return result['results']
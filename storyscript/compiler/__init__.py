@@ -4,5 +4,7 @@ from .faketree import FakeTree
 from .lines import Lines
 from .objects import Objects
 from .preprocessor import Preprocessor
+from .scope import Scope
 
-__all__ = ['Compiler', 'FakeTree', 'Lines', 'Objects', 'Preprocessor']
+__all__ = ['Compiler', 'FakeTree', 'Lines', 'Objects', 'Preprocessor',
+           'Scope']
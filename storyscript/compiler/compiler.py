@@ -79,7 +79,7 @@ class Compiler:
         service = tree.assignment_fragment.service
         if service:
             path = Objects.names(service.path)
-            if path not in self.lines.variables:
+            if self.lines.is_variable(path) is False:
                 self.service(service, None, parent)
                 self.lines.set_name(name)
                 return
@@ -105,7 +105,7 @@ class Compiler:
         Compiles a service tree.
         """
         service_name = Objects.names(tree.path)
-        if service_name in self.lines.variables:
+        if self.lines.is_variable(service_name):
             self.expression(tree, parent)
             return
         line = tree.line()
@@ -291,11 +291,17 @@ class Compiler:
         return Compiler()
 
     @classmethod
-    def compile(cls, tree, debug=False):
+    def compile(cls, tree, debug=False, segments=False):
+        """
+        Compiles a tree. With segments, strings with values are compiled
+        with their segments too.
+        """
         tree = Preprocessor.process(tree)
         compiler = cls.compiler()
         compiler.parse_tree(tree)
         lines = compiler.lines
+        if segments:
+            Objects.segments(lines.lines)
         return {'tree': lines.lines, 'services': lines.get_services(),
                 'entrypoint': lines.first(), 'modules': lines.modules,
                 'functions': lines.functions, 'version': version}
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
-import random
-import uuid
+import hashlib
 
 from lark.lexer import Token
 
@@ -18,24 +17,30 @@ class FakeTree:
 
     def line(self):
         """
-        Creates fake line numbers. The numbers are decreasing, so that the
-        resulting tree is compiled correctly.
+        Creates fake line numbers, as sub-lines of the line before the
+        block: for a block at line 5, the fake lines are 4.1, 4.2 and so on.
+        The numbers are increasing, so that the resulting tree is compiled
+        correctly, and the same story always gets the same numbers.
         """
-        lower_bound = int(self.original_line) - 1
-        upper_bound = int(self.original_line)
-        if len(self.new_lines) > 0:
-            upper_bound = self.new_lines[-1]
-        fake_line = random.uniform(lower_bound, upper_bound)
+        base = int(self.original_line) - 1
+        fake_line = '{}.{}'.format(base, len(self.new_lines) + 1)
         self.new_lines.append(fake_line)
-        return str(fake_line)
+        return fake_line
 
     @staticmethod
-    def path(line):
+    def name(line):
         """
-        Creates a fake tree path.
+        Creates the name of a fake variable, derived from its fake line.
         """
-        path = '${}'.format(uuid.uuid4().hex[:8])
-        return Tree('path', [Token('NAME', path, line=line)])
+        digest = hashlib.sha1(line.encode('utf-8')).hexdigest()
+        return '${}'.format(digest[:8])
+
+    @classmethod
+    def path(cls, line):
+        """
+        Creates a fake tree path, named after the fake line.
+        """
+        return Tree('path', [Token('NAME', cls.name(line), line=line)])
 
     def assignment(self, value):
         """
@@ -49,8 +54,9 @@ class FakeTree:
 
     def add_assignment(self, value):
         """
-        Creates an assignments and adds it to the current block
+        Creates an assignment and adds it to the current block, after the
+        assignments added before it.
         """
         assignment = self.assignment(value)
-        self.block.insert(assignment)
+        self.block.insert(assignment, index=len(self.new_lines) - 1)
         return assignment
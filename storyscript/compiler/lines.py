@@ -1,38 +1,68 @@
 # -*- coding: utf-8 -*-
+import bisect
+import json
+
 from ..exceptions import StoryError
 
 
 class Lines:
     """
     Holds compiled lines and provides methods for operation on lines.
+    Line numbers are kept ordered as they are added, so that finding the
+    first and last lines doesn't need sorting. Line numbers can have
+    sub-lines, like 4.1 or 4.12, which are ordered numerically: 4.12 comes
+    after 4.2.
     """
+    exit_methods = ['if', 'elif', 'try', 'catch']
+
     def __init__(self):
         self.lines = {}
-        self.variables = []
-        self.services = []
+        self.ordered = []
+        self.exits = []
+        self.variables = {}
+        self.services = {}
         self.functions = {}
         self.outputs = {}
         self.modules = {}
 
+    @staticmethod
+    def number(line):
+        """
+        Converts a line number to a tuple that can be ordered
+        """
+        return tuple(int(part) for part in line.split('.'))
+
+    @classmethod
+    def index(cls, ordered, line):
+        """
+        Adds a line number to a list of ordered line numbers. Lines are
+        usually added in order, so they are appended whenever possible.
+        """
+        item = (cls.number(line), line)
+        if ordered == [] or item > ordered[-1]:
+            ordered.append(item)
+        else:
+            bisect.insort(ordered, item)
+
     def sort(self):
         """
         Returns ordered line numbers
         """
-        return sorted(self.lines.keys(), key=lambda x: float(x))
+        return [line for number, line in self.ordered]
 
     def first(self):
         """
         Gets the first line.
         """
-        if self.lines:
-            return self.sort()[0]
+        if self.ordered:
+            return self.ordered[0][1]
 
     def last(self):
         """
         Gets the last line
         """
-        if self.lines:
-            return self.sort()[-1]
+        if self.ordered:
+            return self.ordered[-1][1]
 
     def set_name(self, name):
         """
@@ -55,14 +85,11 @@ class Lines:
         Sets the current line as the exit line for a previous one, as needed
         in if/elif/else and try/catch/finally blocks.
         """
-        methods = ['if', 'elif', 'try', 'catch']
-        for line_number in self.sort()[::-1]:
-            if self.lines[line_number]['method'] in methods:
-                self.lines[line_number]['exit'] = line
-                break
+        if self.exits:
+            self.lines[self.exits[-1][1]]['exit'] = line
 
     def set_output(self, line, output):
-        self.outputs[line] = output
+        self.outputs[line] = set(output)
 
     def is_output(self, parent_line, service):
         """
@@ -79,22 +106,42 @@ class Lines:
         """
         Creates the base dictionary for a given line.
         """
-        dictionary = {
-            line: {
-                'method': method,
-                'ln': line,
-                'output': output,
-                'name': name,
-                'service': service,
-                'command': command,
-                'function': function,
-                'args': args,
-                'enter': enter,
-                'exit': exit,
-                'parent': parent
-            }
+        if line not in self.lines:
+            self.index(self.ordered, line)
+            if method in self.exit_methods:
+                self.index(self.exits, line)
+        self.lines[line] = {
+            'method': method,
+            'ln': line,
+            'output': output,
+            'name': name,
+            'service': service,
+            'command': command,
+            'function': function,
+            'args': args,
+            'enter': enter,
+            'exit': exit,
+            'parent': parent
         }
-        self.lines = {**self.lines, **dictionary}
+
+    @staticmethod
+    def variable_key(name):
+        """
+        Makes a hashable key from a variable name, as names may contain
+        objects when they are paths like a['b'] or a[b].
+        """
+        key = []
+        for shard in name:
+            if isinstance(shard, dict):
+                shard = ('$OBJECT', json.dumps(shard, sort_keys=True))
+            key.append(shard)
+        return tuple(key)
+
+    def is_variable(self, name):
+        """
+        Checks whether a name has been defined as variable
+        """
+        return self.variable_key(name) in self.variables
 
     def service_method(self, service, line):
         """
@@ -118,10 +165,11 @@ class Lines:
         if method == 'function':
             self.functions[kwargs['function']] = line
         elif method == 'set':
-            self.variables.append(kwargs['name'])
+            key = self.variable_key(kwargs['name'])
+            self.variables.setdefault(key, line)
         elif method == 'execute':
             if self.is_output(kwargs['parent'], kwargs['service']) is False:
-                self.services.append(kwargs['service'])
+                self.services.setdefault(kwargs['service'], line)
         self.set_next(line)
         self.make(method, line, **kwargs)
 
@@ -133,6 +181,6 @@ class Lines:
 
     def get_services(self):
         """
-        Get the services and remove duplicates.
+        Get the services, in the order they are first used.
         """
-        return list(set(self.services))
+        return list(self.services)
@@ -4,6 +4,7 @@ import re
 from lark.lexer import Token
 
 from ..parser import Tree
+from ..resolver import Resolver
 
 
 class Objects:
@@ -94,6 +95,22 @@ class Objects:
         item['string'] = cls.replace_fillers(item['string'], matches)
         return item
 
+    @classmethod
+    def segments(cls, item):
+        """
+        Adds segments to the strings with values in item, so that they can
+        be resolved by joining their literal parts and values.
+        """
+        if type(item) is list:
+            for value in item:
+                cls.segments(value)
+        elif type(item) is dict:
+            for value in item.values():
+                cls.segments(value)
+            if item.get('$OBJECT') == 'string' and 'values' in item:
+                item['segments'] = Resolver.split(item['string'],
+                                                  item['values'])
+
     @staticmethod
     def boolean(tree):
         if tree.child(0).value == 'true':
@@ -1,8 +1,4 @@
 # -*- coding: utf-8 -*-
-import uuid
-
-from lark.lexer import Token
-
 from .faketree import FakeTree
 from ..parser import Tree
 
@@ -12,6 +8,7 @@ class Preprocessor:
     Performs additional transformations that can't be performed, or would be
     too complicated for the Transformer, before the tree is compiled.
     """
+    parents = ['arguments', 'assignment_fragment']
 
     @staticmethod
     def fake_tree(block):
@@ -28,53 +25,63 @@ class Preprocessor:
         assignment = fake_tree.add_assignment(inline_expression.service)
         parent.replace(1, assignment.path)
 
-    @classmethod
-    def service_arguments(cls, block, service):
-        """
-        Processes the arguments of a service, replacing inline expressions
-        """
-        fake_tree = cls.fake_tree(block)
-        for argument in service.find_data('arguments'):
-            expression = argument.node('values.inline_expression')
-            if expression:
-                cls.replace_expression(fake_tree, argument, expression)
-
-    @classmethod
-    def assignment_expression(cls, block, tree):
+    @staticmethod
+    def inline_expression(tree):
         """
-        Processess an assignment to an expression, replacing it
+        Finds the inline expression of an arguments or assignment_fragment
+        tree, for example the expression in alpine echo text:(random value)
+        or in a = (alpine echo message:'text')
         """
-        fake_tree = cls.fake_tree(block)
-        parent = block.rules.assignment.assignment_fragment
-        cls.replace_expression(fake_tree, parent, tree.inline_expression)
+        values = tree.child(1)
+        if isinstance(values, Tree) and values.data == 'values':
+            return values.inline_expression
 
-    @classmethod
-    def assignments(cls, block):
+    @staticmethod
+    def relocate(tree, moved):
         """
-        Process assignments, looking for inline expressions, for example:
-        a = alpine echo text:(random value) or a = (alpine echo message:'text')
+        Finds again the first and last tokens of a tree when it changed, or
+        when the ones of its children changed. Trees whose tokens changed are
+        added to moved.
         """
-        for assignment in block.find_data('assignment'):
-            fragment = assignment.assignment_fragment
-            if fragment.service:
-                cls.service_arguments(block, fragment.service)
-            elif fragment.values:
-                if fragment.values.inline_expression:
-                    cls.assignment_expression(block, fragment.values)
+        first = tree.first
+        last = tree.last
+        if first is None or any(id(child) in moved
+                                for child in tree.children):
+            tree.locate()
+            if tree.first is not first or tree.last is not last:
+                moved.add(id(tree))
 
     @classmethod
-    def service(cls, tree):
+    def process(cls, tree):
         """
-        Processes services, looking for inline expressions, for example:
-        alpine echo text:(random value)
+        Replaces inline expressions with fake assignments in one bottom-up
+        traversal, so that nested inline expressions are replaced before the
+        ones containing them. Fake assignments are added to the innermost
+        block, using one fake tree per block. Positions are updated on the
+        way up, as fake assignments can change the start of the trees
+        containing them.
         """
-        service = tree.node('service_block.service')
-        if service:
-            cls.service_arguments(tree, service)
-
-    @classmethod
-    def process(cls, tree):
-        for block in tree.find_data('block'):
-            cls.assignments(block)
-            cls.service(block)
+        fake_trees = {}
+        moved = set()
+        stack = [(tree, None, False)]
+        while stack:
+            node, block, visited = stack.pop()
+            if visited:
+                expression = None
+                if node.data in cls.parents:
+                    expression = cls.inline_expression(node)
+                if expression:
+                    if id(block) not in fake_trees:
+                        fake_trees[id(block)] = cls.fake_tree(block)
+                    fake_tree = fake_trees[id(block)]
+                    cls.replace_expression(fake_tree, node, expression)
+                if fake_trees:
+                    cls.relocate(node, moved)
+                continue
+            if node.data == 'block':
+                block = node
+            stack.append((node, block, True))
+            for child in reversed(node.children):
+                if isinstance(child, Tree):
+                    stack.append((child, block, False))
         return tree
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+
+class Scope(dict):
+    """
+    Holds the names of a kind, like variables or functions, defined by a
+    part of a story. Names that are not defined there are looked up with
+    the defined function, which finds the ones defined before that part.
+    Those lookups are recorded in used, so that the part can be compiled
+    again when the names it looked up change.
+    """
+    def __init__(self, kind, defined, used):
+        super().__init__()
+        self.kind = kind
+        self.defined = defined
+        self.used = used
+
+    def __contains__(self, name):
+        if dict.__contains__(self, name):
+            return True
+        self.used.add((self.kind, name))
+        return self.defined(self.kind, name)
@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+import bisect
+import functools
+import heapq
+import re
+
+from lark.exceptions import (UnexpectedCharacters, UnexpectedInput,
+                             UnexpectedToken)
+from lark.lexer import Token
+
+from .compiler import Compiler, FakeTree, Lines, Preprocessor, Scope
+from .exceptions import StoryError
+from .parser import Parser, Tree
+from .version import version
+
+
+class Segment:
+    """
+    A top-level part of a story, from a line starting at column 0 to the
+    next one. Segments are parsed and compiled on their own.
+    """
+    __slots__ = ('start', 'source', 'trees', 'lines', 'first', 'last',
+                 'services', 'functions', 'modules', 'defines', 'uses')
+
+    def __init__(self, start, source, trees=None):
+        self.start = start
+        self.source = source
+        self.trees = trees
+        self.lines = None
+        self.first = None
+        self.last = None
+        self.services = {}
+        self.functions = {}
+        self.modules = {}
+        self.defines = set()
+        self.uses = set()
+
+
+class Document:
+    """
+    A story being edited, for editors that need it compiled after each
+    edit. The story is split in segments, at the lines starting at column 0
+    that don't continue a block like else or catch. An edit parses and
+    compiles again only the segments it touches, and the later segments
+    that use names whose definitions changed.
+    """
+    kinds = ('variables', 'functions', 'modules')
+    silent_statements = ('imports', 'values')
+    continuation = re.compile(r'(else|catch|finally)(?![\w\-/])')
+    source_lines = re.compile(r'[^\n]*\n|[^\n]+')
+
+    def __init__(self, story, ebnf_file=None, debug=False):
+        self.parser = Parser(ebnf_file=ebnf_file)
+        self.debug = debug
+        self.segments = []
+        self.definitions = {}
+        self.users = {}
+        self.compiled = None
+        self.update(0, 0, story)
+
+    @classmethod
+    def split(cls, source):
+        """
+        Splits a source in the sources of its segments. Blank lines at the
+        start belong to the first segment.
+        """
+        pieces = []
+        blank = True
+        for line in cls.source_lines.findall(source):
+            if blank or line[0] in ' \t\r\n' or cls.continuation.match(line):
+                if pieces:
+                    pieces[-1].append(line)
+                else:
+                    pieces.append([line])
+            else:
+                pieces.append([line])
+            blank = blank and line.strip() == ''
+        return [''.join(piece) for piece in pieces]
+
+    @staticmethod
+    def statement(tree):
+        """
+        Finds the statement of a top-level tree
+        """
+        while tree.data in ('block', 'rules'):
+            tree = tree.child(0)
+        return tree
+
+    @classmethod
+    def continues(cls, tree):
+        """
+        Finds whether a top-level tree continues the one before it, like
+        arguments for the service before them.
+        """
+        return cls.statement(tree).data == 'arguments'
+
+    @classmethod
+    def silent(cls, trees):
+        """
+        Finds whether top-level trees have only imports or values, which are
+        not compiled to lines. Arguments continuing a service skip them.
+        """
+        for tree in trees:
+            if cls.statement(tree).data not in cls.silent_statements:
+                return False
+        return True
+
+    @staticmethod
+    def slashed(source, trees):
+        """
+        Finds whether trees have a slash that is not in a regular
+        expression. The lexer reads it as the start of one when a later line
+        has another slash.
+        """
+        if '/' not in source:
+            return False
+        for tree in trees:
+            for subtree in tree.iter_subtrees():
+                for child in subtree.children:
+                    if isinstance(child, Token) and child.startswith('/'):
+                        if child.type != 'REGEXP':
+                            return True
+        return False
+
+    @staticmethod
+    def missing(error, line, source):
+        """
+        Finds what a segment misses when its parsing failed: any text, when
+        the parser expected more tokens, or a quote when a string was left
+        open. Returns None when the error is in the segment.
+        """
+        if isinstance(error, UnexpectedToken):
+            if error.token.type == '$END':
+                return ''
+        elif isinstance(error, UnexpectedCharacters):
+            character = source[error.pos_in_stream - line + 1]
+            if character in '\'"':
+                return character
+        return None
+
+    @staticmethod
+    def renumber(line, delta):
+        """
+        Moves a line number, that may be a sub-line like 4.1, by delta
+        """
+        number, dot, sub_line = line.partition('.')
+        return '{}{}{}'.format(int(number) + delta, dot, sub_line)
+
+    @classmethod
+    def rename(cls, item, names):
+        """
+        Renames the fake variables found in a compiled item
+        """
+        if isinstance(item, dict):
+            return {key: cls.rename(value, names)
+                    for key, value in item.items()}
+        if isinstance(item, list):
+            return [cls.rename(value, names) for value in item]
+        if isinstance(item, str):
+            return names.get(item, item)
+        return item
+
+    @staticmethod
+    def join(before, source, after):
+        """
+        Joins a source with the ones of the segments around it.
+        """
+        sources = [segment.source for segment in before]
+        sources.append(source)
+        sources += [segment.source for segment in after]
+        return ''.join(sources)
+
+    def line(self, index):
+        """
+        Finds the line where the segment at index starts.
+        """
+        if index < len(self.segments):
+            return self.segments[index].start
+        if self.segments:
+            last = self.segments[-1]
+            return last.start + last.source.count('\n')
+        return 1
+
+    def find(self, line):
+        """
+        Finds the index of the segment of a line.
+        """
+        low = 0
+        high = len(self.segments)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.segments[middle].start <= line:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def offset(self, index, position):
+        """
+        Finds the offset of a (line, column) position from the start of the
+        segment at index.
+        """
+        line, column = position
+        offset = 0
+        while index + 1 < len(self.segments):
+            if self.segments[index + 1].start > line:
+                break
+            offset += len(self.segments[index].source)
+            index += 1
+        segment = self.segments[index]
+        lines = self.source_lines.findall(segment.source)
+        for text in lines[:line - segment.start]:
+            offset += len(text)
+        return offset + column - 1
+
+    def parse(self, line, source):
+        """
+        Parses the source of a segment starting at line. The source is
+        preceded by empty lines, so that the tokens have their lines in the
+        story.
+        """
+        padding = '\n' * (line - 1)
+        return self.parser.parse(padding + source, debug=True).children
+
+    def take(self, pieces, end):
+        """
+        Takes the next source, from the pieces not parsed yet or from the
+        segment at end.
+        """
+        if pieces:
+            return pieces.pop(0), end
+        if end < len(self.segments):
+            return self.segments[end].source, end + 1
+        return None, end
+
+    def take_until(self, source, missing, pieces, end):
+        """
+        Adds the next sources to source, until one has the missing text.
+        Returns None when none has it.
+        """
+        taken = [source]
+        while True:
+            text, end = self.take(pieces, end)
+            if text is None:
+                return None, end
+            taken.append(text)
+            if missing in text:
+                return ''.join(taken), end
+
+    def take_all(self, source, pieces, end):
+        """
+        Adds all the next sources to source. Returns None when there are
+        none.
+        """
+        taken = [source]
+        text, end = self.take(pieces, end)
+        while text is not None:
+            taken.append(text)
+            text, end = self.take(pieces, end)
+        if len(taken) == 1:
+            return None, end
+        return ''.join(taken), end
+
+    def divide(self, source):
+        """
+        Parses a whole source at once, then divides its trees in segments
+        like the ones of its pieces. Returns None when the trees don't fit
+        the pieces, so that they are parsed one by one.
+        """
+        pieces = self.split(source)
+        starts = []
+        line = 1
+        for piece in pieces:
+            starts.append(line)
+            line += piece.count('\n')
+        groups = []
+        following = 0
+        for tree in self.parse(1, source):
+            line, column, end_line, end_column = tree.position
+            first = bisect.bisect(starts, line) - 1
+            last = bisect.bisect(starts, end_line) - 1
+            if groups and self.continues(tree):
+                while len(groups) > 1 and self.silent(groups[-1][2]):
+                    groups[-2][2] += groups.pop()[2]
+                groups[-1][2].append(tree)
+            elif groups and first < following:
+                groups[-1][2].append(tree)
+            elif first == following:
+                groups.append([first, last, [tree]])
+            else:
+                return None
+            groups[-1][1] = max(groups[-1][1], last)
+            following = groups[-1][1] + 1
+        if following != len(pieces):
+            return None
+        segments = []
+        for first, last, trees in groups:
+            source = ''.join(pieces[first:last + 1])
+            if segments and self.slashed(segments[-1].source,
+                                         segments[-1].trees):
+                segments[-1].source += source
+                segments[-1].trees += trees
+                continue
+            segments.append(Segment(starts[first], source, trees))
+        return segments
+
+    def recover(self, error, line, source, pieces, end):
+        """
+        Merges a source that failed to parse with the pieces after it, when
+        it misses the text after it or has a slash. The merged source is
+        None when neither applies.
+        """
+        missing = None
+        if isinstance(error, UnexpectedInput):
+            missing = self.missing(error, line, source)
+        if missing is not None:
+            return self.take_until(source, missing, pieces, end)
+        if '/' in source:
+            return self.take_all(source, pieces, end)
+        return None, end
+
+    def take_previous(self, source, segments, index):
+        """
+        Merges a source that continues the segments before it with them,
+        taking the silent segments too. Returns the merged source, its line
+        and the index of the first segment taken from the document.
+        """
+        taken = [source]
+        while True:
+            if segments:
+                previous = segments.pop()
+            else:
+                index -= 1
+                previous = self.segments[index]
+                if previous.trees is None:
+                    previous.trees = self.parse(previous.start,
+                                                previous.source)
+            taken.insert(0, previous.source)
+            if not self.silent(previous.trees):
+                break
+            if not segments and index == 0:
+                break
+        return ''.join(taken), previous.start, index
+
+    def replace(self, index, end, source):
+        """
+        Parses the new source of the segments from index to end. Segments
+        are merged when one continues another, and the segments after end
+        are taken when the last one misses the text after it. A segment
+        with a slash takes all the text after it, as the lexer could read a
+        regular expression running to a later line.
+        """
+        line = self.line(index)
+        if index == 0 and end == len(self.segments):
+            segments = self.divide(source)
+            if segments is not None:
+                return segments, index, end, line + source.count('\n')
+        pieces = self.split(source)
+        segments = []
+        while pieces:
+            source = pieces.pop(0)
+            try:
+                trees = self.parse(line, source)
+            except (UnexpectedInput, StoryError) as error:
+                merged, end = self.recover(error, line, source, pieces, end)
+                if merged is None:
+                    raise
+                pieces.insert(0, merged)
+                continue
+            if (segments or index > 0) and self.continues(trees[0]):
+                merged, line, index = self.take_previous(source, segments,
+                                                         index)
+                pieces.insert(0, merged)
+                continue
+            if self.slashed(source, trees):
+                merged, end = self.take_all(source, pieces, end)
+                if merged is not None:
+                    pieces.insert(0, merged)
+                    continue
+            segments.append(Segment(line, source, trees))
+            line += source.count('\n')
+        return segments, index, end, line
+
+    def defined(self, start, kind, name):
+        """
+        Finds whether a name is defined by a segment before the line start.
+        """
+        for segment in self.definitions.get((kind, name), ()):
+            if segment.start < start:
+                return True
+        return False
+
+    def register(self, segment):
+        for name in segment.defines:
+            self.definitions.setdefault(name, set()).add(segment)
+        for name in segment.uses:
+            self.users.setdefault(name, set()).add(segment)
+
+    def unregister(self, segment):
+        for name in segment.defines:
+            self.definitions[name].discard(segment)
+        for name in segment.uses:
+            self.users[name].discard(segment)
+
+    def compile(self, segment):
+        """
+        Compiles a segment, with the names defined by the segments before
+        it. Segments that were moved are parsed again first.
+        """
+        self.unregister(segment)
+        if segment.trees is None:
+            segment.trees = self.parse(segment.start, segment.source)
+        lines = Lines()
+        uses = set()
+        defined = functools.partial(self.defined, segment.start)
+        for kind in self.kinds:
+            setattr(lines, kind, Scope(kind, defined, uses))
+        compiler = Compiler.compiler()
+        compiler.lines = lines
+        compiler.parse_tree(Preprocessor.process(Tree('start',
+                                                      segment.trees)))
+        segment.lines = lines.lines
+        segment.first = lines.first()
+        segment.last = lines.last()
+        segment.services = lines.services
+        segment.functions = dict(lines.functions)
+        segment.modules = dict(lines.modules)
+        segment.defines = {(kind, name) for kind in self.kinds
+                           for name in getattr(lines, kind)}
+        segment.uses = uses
+        self.register(segment)
+
+    def move(self, segment, delta):
+        """
+        Moves a segment by delta lines, renumbering its compiled lines and
+        the fake variables named after them. Its trees are dropped, and
+        parsed again if the segment needs to be compiled again.
+        """
+        segment.start += delta
+        segment.trees = None
+        if not segment.lines:
+            return
+        names = {}
+        for line in segment.lines:
+            if '.' in line:
+                new_line = self.renumber(line, delta)
+                names[FakeTree.name(line)] = FakeTree.name(new_line)
+        lines = {}
+        for line, item in segment.lines.items():
+            item = dict(item)
+            for key in ('ln', 'next', 'enter', 'exit', 'parent'):
+                if item.get(key) is not None:
+                    item[key] = self.renumber(item[key], delta)
+            if names:
+                item['name'] = self.rename(item['name'], names)
+                item['args'] = self.rename(item['args'], names)
+            lines[item['ln']] = item
+        segment.lines = lines
+        segment.first = self.renumber(segment.first, delta)
+        segment.last = self.renumber(segment.last, delta)
+        for service, line in segment.services.items():
+            segment.services[service] = self.renumber(line, delta)
+        for function, line in segment.functions.items():
+            segment.functions[function] = self.renumber(line, delta)
+
+    def notify(self, names, start, pending):
+        """
+        Adds the segments from the line start that use names to the
+        segments pending compilation.
+        """
+        for name in names:
+            for segment in self.users.get(name, ()):
+                if segment.start >= start:
+                    heapq.heappush(pending, (segment.start, id(segment),
+                                             segment))
+
+    def apply(self, index, end, source):
+        """
+        Replaces the segments from index to end with the ones of the new
+        source, moving the segments after them when lines were added or
+        removed. The new segments are compiled, then the later segments that
+        use the names they defined before or define now.
+        """
+        segments, index, end, line = self.replace(index, end, source)
+        delta = line - self.line(end)
+        changed = set()
+        for segment in self.segments[index:end]:
+            changed |= segment.defines
+            self.unregister(segment)
+        self.segments[index:end] = segments
+        if delta:
+            for segment in self.segments[index + len(segments):]:
+                self.move(segment, delta)
+        for segment in segments:
+            self.compile(segment)
+            changed ^= segment.defines
+        pending = []
+        self.notify(changed, line, pending)
+        compiled = set()
+        while pending:
+            start, key, segment = heapq.heappop(pending)
+            if key in compiled:
+                continue
+            compiled.add(key)
+            defines = segment.defines
+            self.compile(segment)
+            self.notify(defines ^ segment.defines, start + 1, pending)
+
+    def reset(self, source):
+        """
+        Keeps a source as a single segment, not parsed yet.
+        """
+        self.segments = []
+        if source:
+            self.segments.append(Segment(1, source))
+        self.definitions = {}
+        self.users = {}
+
+    def link(self, segment, line):
+        """
+        Sets the next line of the last line of a segment, copying the line
+        so that stories compiled before are not changed.
+        """
+        item = segment.lines[segment.last]
+        if item.get('next') != line:
+            item = dict(item)
+            if line is None:
+                del item['next']
+            else:
+                item['next'] = line
+            segment.lines[segment.last] = item
+        return item
+
+    def assemble(self):
+        """
+        Assembles the compiled segments in a compiled story, linking each
+        segment to the next one.
+        """
+        tree = {}
+        services = {}
+        functions = {}
+        modules = {}
+        entrypoint = None
+        previous = None
+        for segment in self.segments:
+            if segment.lines:
+                if previous is None:
+                    entrypoint = segment.first
+                else:
+                    entry = next(iter(segment.lines))
+                    tree[previous.last] = self.link(previous, entry)
+                tree.update(segment.lines)
+                previous = segment
+            for service, line in segment.services.items():
+                services.setdefault(service, line)
+            functions.update(segment.functions)
+            modules.update(segment.modules)
+        if previous:
+            tree[previous.last] = self.link(previous, None)
+        return {'tree': tree, 'services': list(services),
+                'entrypoint': entrypoint, 'modules': modules,
+                'functions': functions, 'version': version}
+
+    def load(self, source):
+        """
+        Parses and compiles a source as a single segment, as when loading a
+        story.
+        """
+        self.reset(source)
+        tree = self.parser.parse(source, debug=self.debug)
+        if self.segments:
+            self.segments[0].trees = tree.children
+            self.compile(self.segments[0])
+
+    def update(self, index, end, source):
+        """
+        Replaces the source of the segments from index to end, and compiles
+        the story. When that fails, the story is loaded again as a whole, so
+        that errors are the ones found when loading it. A story that fails
+        is kept as one segment, to be parsed again at the next edit.
+        """
+        before = self.segments[:index]
+        after = self.segments[end:]
+        try:
+            try:
+                self.apply(index, end, source)
+            except (UnexpectedInput, StoryError):
+                self.load(self.join(before, source, after))
+        except BaseException:
+            self.reset(self.join(before, source, after))
+            raise
+        self.compiled = self.assemble()
+        return self.compiled
+
+    def edit(self, start, end, text):
+        """
+        Replaces the text between the start and end positions, given as
+        (line, column) with both starting at 1, and compiles the story.
+        Returns the compiled story.
+        """
+        if self.segments == []:
+            return self.update(0, 0, text)
+        index = self.find(start[0])
+        last = self.find(end[0])
+        if index > 0 and self.segments[index].start == start[0]:
+            index -= 1
+        segments = self.segments[index:last + 1]
+        source = ''.join(segment.source for segment in segments)
+        begin = self.offset(index, start)
+        finish = self.offset(index, end)
+        source = '{}{}{}'.format(source[:begin], text, source[finish:])
+        return self.update(index, last + 1, source)
@@ -14,7 +14,8 @@ class StoryError(SyntaxError):
         'variables-backslash': "Variable names can't contain backslashes",
         'variables-dash': "Variable names can't contain dashes",
         'return-outside': "Return can't be used outside functions",
-        'arguments-noservice': 'Missing service before service arguments'
+        'arguments-noservice': 'Missing service before service arguments',
+        'module-cycle': "Modules can't import each other in a cycle"
     }
 
     def __init__(self, error_type, item):
@@ -43,6 +44,10 @@ class StoryError(SyntaxError):
                     'line {}')
         return template.format(value, line)
 
+    def value_template(self, value):
+        template = 'Failed reading story because of unexpected "{}"'
+        return template.format(value)
+
     def compile_template(self):
         """
         Compiles the correct template for the item, depending on whether it's
@@ -57,7 +62,10 @@ class StoryError(SyntaxError):
             return self.token_template(self.item.context, self.item.line,
                                        self.item.column)
         elif isinstance(self.item, dict):
-            return self.tree_template(self.item['value'], self.item['line'])
+            if 'line' in self.item:
+                return self.tree_template(self.item['value'],
+                                          self.item['line'])
+            return self.value_template(self.item['value'])
         return self.token_template(self.item, self.item.line, self.item.column)
 
     def message(self):
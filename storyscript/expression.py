@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import operator
+import re
+
+
+class Expression:
+    """
+    Evaluates expression templates like '{} > {}', as compiled by
+    Objects.expression, without eval. Each template is parsed once into a
+    function of its values, that follows the precedence and the semantics
+    of Python operators, as eval did.
+    """
+    _cache = {}
+    pattern = re.compile(r'\s*(\{\}|\d+\.\d*|\.\d+|\d+|"[^"]*"|\'[^\']*\'|'
+                         r'[A-Za-z_]\w*|\*\*|//|==|!=|<=|>=|[-+*/%^&|<>()~])')
+    constants = {'True': True, 'False': False, 'None': None}
+    comparisons = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+                   '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+    levels = [
+        {'|': operator.or_},
+        {'^': operator.xor},
+        {'&': operator.and_},
+        {'+': operator.add, '-': operator.sub},
+        {'*': operator.mul, '/': operator.truediv, '//': operator.floordiv,
+         '%': operator.mod}
+    ]
+    unary = {'-': operator.neg, '+': operator.pos, '~': operator.invert}
+
+    def __init__(self, template):
+        self.template = template
+        self.tokens = self.tokenize()
+        self.position = 0
+        self.placeholders = 0
+
+    def tokenize(self):
+        tokens = []
+        end = 0
+        template = self.template.rstrip()
+        while end < len(template):
+            match = self.pattern.match(template, end)
+            if match is None:
+                raise self.error()
+            tokens.append(match.group(1))
+            end = match.end()
+        return tokens
+
+    @classmethod
+    def compile(cls, template):
+        """
+        Gets the function of a template, parsing it the first time.
+        """
+        if template not in cls._cache:
+            cls._cache[template] = cls(template).parse()
+        return cls._cache[template]
+
+    def error(self):
+        return ValueError('Expression not supported: {}'.format(
+            self.template))
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        """
+        Parses the template, returning a function that evaluates it with a
+        list of values for its placeholders.
+        """
+        function = self.disjunction()
+        if self.peek() is not None:
+            raise self.error()
+        return function
+
+    def disjunction(self):
+        left = self.conjunction()
+        while self.peek() == 'or':
+            self.take()
+            left = self.either(left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.inversion()
+        while self.peek() == 'and':
+            self.take()
+            left = self.both(left, self.inversion())
+        return left
+
+    def inversion(self):
+        if self.peek() == 'not':
+            self.take()
+            return self.apply(operator.not_, self.inversion())
+        return self.comparison()
+
+    def comparison(self):
+        left = self.binary(0)
+        chain = []
+        while self.peek() in self.comparisons:
+            function = self.comparisons[self.take()]
+            chain.append((function, self.binary(0)))
+        if len(chain) == 1:
+            return self.combine(chain[0][0], left, chain[0][1])
+        if chain:
+            return self.chain(left, chain)
+        return left
+
+    def binary(self, level):
+        if level == len(self.levels):
+            return self.factor()
+        operators = self.levels[level]
+        left = self.binary(level + 1)
+        while self.peek() in operators:
+            function = operators[self.take()]
+            left = self.combine(function, left, self.binary(level + 1))
+        return left
+
+    def factor(self):
+        if self.peek() in self.unary:
+            function = self.unary[self.take()]
+            return self.apply(function, self.factor())
+        return self.power()
+
+    def power(self):
+        base = self.atom()
+        if self.peek() == '**':
+            self.take()
+            return self.combine(operator.pow, base, self.factor())
+        return base
+
+    def atom(self):
+        token = self.take()
+        if token is None:
+            raise self.error()
+        if token == '{}':
+            self.placeholders += 1
+            return operator.itemgetter(self.placeholders - 1)
+        if token == '(':
+            function = self.disjunction()
+            if self.take() != ')':
+                raise self.error()
+            return function
+        if token in self.constants:
+            return self.constant(self.constants[token])
+        if token[0] in '\'"':
+            return self.constant(token[1:-1])
+        if token[0].isdigit() or token[0] == '.':
+            if '.' in token:
+                return self.constant(float(token))
+            return self.constant(int(token))
+        raise self.error()
+
+    @staticmethod
+    def constant(value):
+        return lambda values: value
+
+    @staticmethod
+    def apply(function, operand):
+        return lambda values: function(operand(values))
+
+    @staticmethod
+    def combine(function, left, right):
+        return lambda values: function(left(values), right(values))
+
+    @staticmethod
+    def either(left, right):
+        return lambda values: left(values) or right(values)
+
+    @staticmethod
+    def both(left, right):
+        return lambda values: left(values) and right(values)
+
+    @staticmethod
+    def chain(left, chain):
+        """
+        Makes a chained comparison like a < b < c, where b is evaluated
+        once and the comparison stops at the first false result.
+        """
+        def compare(values):
+            value = left(values)
+            for function, operand in chain:
+                right = operand(values)
+                result = function(value, right)
+                if not result:
+                    return result
+                value = right
+            return result
+        return compare
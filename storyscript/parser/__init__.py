@@ -1,10 +1,33 @@
-from .ebnf import Ebnf
-from .grammar import Grammar
-from .indenter import CustomIndenter
-from .parser import Parser
-from .transformer import Transformer
-from .tree import Tree
+import importlib
+import sys
 
 
-__all__ = ['CustomIndenter', 'Ebnf', 'Grammar', 'Parser', 'Transformer',
-           'Tree']
+__all__ = ['Cache', 'CustomIndenter', 'Ebnf', 'Grammar', 'Parser',
+           'Transformer', 'Tree']
+
+
+_modules = {'Cache': 'cache', 'CustomIndenter': 'indenter', 'Ebnf': 'ebnf',
+            'Grammar': 'grammar', 'Parser': 'parser',
+            'Transformer': 'transformer', 'Tree': 'tree'}
+
+
+if sys.version_info < (3, 7):
+    # Module attributes can't be loaded lazily before Python 3.7
+    from .cache import Cache
+    from .ebnf import Ebnf
+    from .grammar import Grammar
+    from .indenter import CustomIndenter
+    from .parser import Parser
+    from .transformer import Transformer
+    from .tree import Tree
+else:
+    def __getattr__(name):
+        """
+        Imports the classes of the parser when first used, so that the
+        grammar can be built without importing lark.
+        """
+        if name in _modules:
+            module = importlib.import_module('.' + _modules[name], __name__)
+            return getattr(module, name)
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
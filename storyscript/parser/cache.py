@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import os
+import pickle
+
+import lark
+from lark.parsers.lalr_analysis import Reduce, Shift
+
+from ..version import version
+
+
+class CachePickler(pickle.Pickler):
+    """
+    Pickles Lark instances. Lark compares parse table actions by identity,
+    so they are stored as references instead of copies.
+    """
+    actions = {'Shift': Shift, 'Reduce': Reduce}
+
+    def persistent_id(self, obj):
+        for name, action in self.actions.items():
+            if obj is action:
+                return name
+
+
+class CacheUnpickler(pickle.Unpickler):
+    """
+    Unpickles Lark instances, restoring parse table actions.
+    """
+    def persistent_load(self, pid):
+        return CachePickler.actions[pid]
+
+
+class Cache:
+    """
+    Stores built Lark instances on disk, so that the parse tables don't have
+    to be rebuilt every time the command line is invoked.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or self.default_directory()
+
+    @staticmethod
+    def default_directory():
+        """
+        Finds the cache directory, either from STORYSCRIPT_CACHE_DIR or from
+        the user cache directory.
+        """
+        if 'STORYSCRIPT_CACHE_DIR' in os.environ:
+            return os.environ['STORYSCRIPT_CACHE_DIR']
+        cache_home = os.environ.get('XDG_CACHE_HOME')
+        if cache_home is None:
+            cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'storyscript')
+
+    @staticmethod
+    def key(algo, grammar_hash, embedded=False):
+        """
+        Builds the key for a grammar, including the versions of lark and
+        Storyscript, so that upgrading either of them invalidates the cache.
+        Lark instances with an embedded transformer have their own keys.
+        """
+        string = '{}:{}:{}:{}'.format(algo, grammar_hash, lark.__version__,
+                                      version)
+        if embedded:
+            string = '{}:transformer'.format(string)
+        return hashlib.sha256(string.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, '{}.lark'.format(key))
+
+    def load(self, key):
+        """
+        Loads a Lark instance from the cache. Returns None when missing or
+        unreadable.
+        """
+        try:
+            with io.open(self.path(key), 'rb') as f:
+                return CacheUnpickler(f).load()
+        except Exception:
+            return None
+
+    def save(self, key, lark):
+        """
+        Saves a Lark instance to the cache. Failures are ignored, as the
+        cache is only an optimization.
+        """
+        path = self.path(key)
+        temporary = '{}.{}'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with io.open(temporary, 'wb') as f:
+                CachePickler(f, pickle.HIGHEST_PROTOCOL).dump(lark)
+            os.replace(temporary, path)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
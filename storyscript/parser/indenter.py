@@ -9,3 +9,13 @@ class CustomIndenter(Indenter):
     INDENT_type = '_INDENT'
     DEDENT_type = '_DEDENT'
     tab_len = 8
+
+    def process(self, stream):
+        """
+        Processes a stream of tokens, starting from no indentation. Lark
+        keeps the indentation of the previous stream, which is wrong when
+        that stream failed halfway.
+        """
+        self.paren_level = 0
+        self.indent_level = [0]
+        return super().process(stream)
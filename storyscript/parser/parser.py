@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import io
 
 from lark import Lark
-from lark.exceptions import UnexpectedInput, UnexpectedToken
+from lark.exceptions import (UnexpectedCharacters, UnexpectedInput,
+                             UnexpectedToken)
 
+from .cache import Cache
 from .grammar import Grammar
 from .indenter import CustomIndenter
 from .transformer import Transformer
@@ -15,10 +18,32 @@ class Parser:
     """
     Wraps up the parser submodule and exposes parsing and lexing
     functionalities.
+
+    Lark instances are cached for the whole process, using the algorithm
+    and a hash of the grammar as key, and on disk across processes. The
+    default grammar and its keys are kept for the whole process too, so
+    that new parsers find the cached Lark without building the grammar.
+
+    With lalr, the transformer is embedded in Lark by default, so that the
+    tree is built while parsing instead of being built by Lark and then
+    transformed.
     """
-    def __init__(self, algo='lalr', ebnf_file=None):
+    _cache = {}
+    _keys = {}
+    _grammar = None
+
+    def __init__(self, algo='lalr', ebnf_file=None, embed_transformer=True):
         self.algo = algo
         self.ebnf_file = ebnf_file
+        self.embed_transformer = embed_transformer
+        self.key = None
+
+    def embedded(self):
+        """
+        Whether the transformer is embedded in Lark, which is only supported
+        by lalr.
+        """
+        return self.embed_transformer and self.algo == 'lalr'
 
     def indenter(self):
         """
@@ -26,23 +51,105 @@ class Parser:
         """
         return CustomIndenter()
 
+    def rules(self):
+        """
+        Gets the names of the rules that can be found in parsed trees
+        """
+        rules = set()
+        for rule in self.lark().rules:
+            if not rule.origin.name.startswith('_'):
+                rules.add(rule.origin.name)
+        return rules
+
     def transformer(self):
         """
-        Initialize the transformer
+        Initialize the transformer, with the rules of the grammar
         """
-        return Transformer()
+        return Transformer(rules=self.rules())
 
     def grammar(self):
         if self.ebnf_file:
             with io.open(self.ebnf_file, 'r') as f:
                 return f.read()
-        return Grammar().build()
+        if Parser._grammar is None:
+            Parser._grammar = Grammar().build()
+        return Parser._grammar
+
+    @staticmethod
+    def hash_grammar(grammar):
+        """
+        Hashes a grammar, so that it can be used as a cache key
+        """
+        return hashlib.sha256(grammar.encode('utf-8')).hexdigest()
+
+    def cache_key(self, grammar):
+        return (self.algo, self.hash_grammar(grammar), self.embedded())
+
+    def find_key(self):
+        """
+        Finds the cache key of the grammar. Ebnf files are read each time,
+        as they can be edited, while the keys of the default grammar are
+        kept by algorithm.
+        """
+        if self.ebnf_file:
+            return self.cache_key(self.grammar())
+        default = (self.algo, self.embedded())
+        if default not in self._keys:
+            self._keys[default] = self.cache_key(self.grammar())
+        return self._keys[default]
+
+    def cache(self):
+        """
+        Initialize the disk cache
+        """
+        return Cache()
+
+    def build_lark(self, grammar, key):
+        """
+        Loads Lark from the disk cache, or initializes it with the given
+        grammar and stores it in the cache.
+        """
+        cache = self.cache()
+        disk_key = cache.key(*key)
+        lark = cache.load(disk_key)
+        if lark is None:
+            options = {}
+            if self.embedded():
+                options = {'transformer': Transformer(), 'tree_class': Tree}
+            lark = Lark(grammar, parser=self.algo, postlex=self.indenter(),
+                        **options)
+            cache.save(disk_key, lark)
+        return lark
 
     def lark(self):
         """
-        Get the grammar and initialize Lark.
+        Get the grammar and the cached Lark instance for it, initializing
+        Lark when the grammar was never seen before. The cache key is found
+        once per parser, so that parsing many times with the same parser
+        doesn't build the grammar each time.
         """
-        return Lark(self.grammar(), parser=self.algo, postlex=self.indenter())
+        if self.key is None:
+            self.key = self.find_key()
+        if self.key not in self._cache:
+            self._cache[self.key] = self.build_lark(self.grammar(), self.key)
+        return self._cache[self.key]
+
+    def invalidate(self):
+        """
+        Removes the cached Lark instance of this parser, and forgets its
+        cache key, so that the grammar is read again at the next parse.
+        """
+        if self.key is None:
+            self.key = self.find_key()
+        self._cache.pop(self.key, None)
+        self.key = None
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Removes all cached Lark instances.
+        """
+        cls._cache.clear()
 
     def parse(self, source, debug=False):
         """
@@ -64,6 +171,8 @@ class Parser:
                 raise e
             print(StoryError('input-unexpected', e).message())
             exit()
+        if self.embedded():
+            return tree
         return self.transformer().transform(tree)
 
     def lex(self, source):
@@ -71,3 +180,112 @@ class Parser:
         Lexes the source string
         """
         return self.lark().lex(source)
+
+    def lexer(self):
+        """
+        Gets the lexer of the Lark instance, which lexes without indenting.
+        """
+        lark = self.lark()
+        if hasattr(lark, 'lexer') is False:
+            lark.lexer = lark._build_lexer()
+        return lark.lexer
+
+    @staticmethod
+    def chunks(stream, size):
+        """
+        Reads a stream in chunks of whole lines, of at least size characters
+        unless the stream ends.
+        """
+        lines = []
+        length = 0
+        for line in stream:
+            lines.append(line)
+            length += len(line)
+            if length >= size:
+                yield ''.join(lines)
+                lines = []
+                length = 0
+        if lines:
+            yield ''.join(lines)
+
+    @staticmethod
+    def shift(token, start):
+        """
+        Moves a token lexed from a part of the source to its position in the
+        whole source. Start is the position, line and column of the part.
+        """
+        position, line, column = start
+        if token.line == 1:
+            token.column += column - 1
+        if token.end_line == 1:
+            token.end_column += column - 1
+        token.line += line - 1
+        token.end_line += line - 1
+        token.pos_in_stream += position
+        return token
+
+    def lex_part(self, lexer, part, start):
+        """
+        Lexes a part of the source, yielding tokens with their position in
+        the whole source. Lark sets the end of a token after yielding it, so
+        tokens are yielded once the next one is found.
+        """
+        previous = None
+        try:
+            for token in lexer.lex(part):
+                if previous is not None:
+                    yield self.shift(previous, start)
+                previous = token
+        except UnexpectedCharacters as e:
+            if previous is not None:
+                yield self.shift(previous, start)
+            line = e.line + start[1] - 1
+            column = e.column
+            if e.line == 1:
+                column += start[2] - 1
+            error = UnexpectedCharacters(part, e.pos_in_stream, line, column)
+            error.pos_in_stream += start[0]
+            raise error
+        if previous is not None:
+            yield self.shift(previous, start)
+
+    def stream_tokens(self, chunks):
+        """
+        Lexes a source chunk by chunk. The last token of a chunk is lexed
+        again with the next one, as it could continue there, and so are
+        strings that are still open at the end of a chunk.
+        """
+        lexer = self.lexer()
+        buffer = ''
+        start = (0, 1, 1)
+        for chunk in chunks:
+            buffer += chunk
+            tokens = []
+            try:
+                for token in self.lex_part(lexer, buffer, start):
+                    tokens.append(token)
+            except UnexpectedCharacters as e:
+                if buffer[e.pos_in_stream - start[0]] not in '\'"':
+                    raise e
+            if len(tokens) > 1:
+                last = tokens.pop()
+                for token in tokens:
+                    yield token
+                buffer = buffer[last.pos_in_stream - start[0]:]
+                start = (last.pos_in_stream, last.line, last.column)
+        for token in self.lex_part(lexer, buffer, start):
+            yield token
+
+    def iter_tokens(self, source, chunk_size=8192):
+        """
+        Lexes a source string or stream, yielding tokens, indents and dedents
+        included, as soon as they are found. Streams are read in chunks, so
+        that big stories are never read whole, and their comments are
+        removed chunk by chunk.
+        """
+        from ..story import Story
+        if isinstance(source, str):
+            source = io.StringIO(source)
+        chunks = Story.clean_chunks(self.chunks(source, chunk_size))
+        tokens = self.stream_tokens(chunks)
+        return self.indenter().process(tokens)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import functools
 import re
 
 from lark import Transformer as LarkTransformer
@@ -13,8 +14,36 @@ class Transformer(LarkTransformer):
     Performs transformations on the tree before it's parsed.
     All trees are transformed to Storyscript's custom tree. In some cases,
     additional transformations or checks are performed.
+
+    Rules without a method of their own are dispatched to functions building
+    their trees. These are created once for each rule, when the transformer
+    is initialized with the rules of the grammar or at the first lookup.
     """
 
+    def __init__(self, rules=()):
+        for rule in rules:
+            if not hasattr(type(self), rule):
+                self.builder(rule)
+
+    def builder(self, rule):
+        """
+        Creates the function building the trees of a rule, registering it as
+        an attribute so that lark finds it without further lookups.
+        """
+        builder = functools.partial(self.tree, rule)
+        setattr(self, rule, builder)
+        return builder
+
+    @staticmethod
+    def tree(rule, matches):
+        """
+        Creates a tree, setting its position. Trees are built from the bottom
+        up, so its children have their positions already.
+        """
+        tree = Tree(rule, matches)
+        tree.locate()
+        return tree
+
     def arguments(self, matches):
         """
         Transform an argument tree. If dealing with is a short-hand argument,
@@ -22,7 +51,7 @@ class Transformer(LarkTransformer):
         """
         if len(matches) == 1:
             matches = [matches[0].child(0), matches[0]]
-        return Tree('arguments', matches)
+        return self.tree('arguments', matches)
 
     def assignment(self, matches):
         token = matches[0].children[0]
@@ -30,7 +59,9 @@ class Transformer(LarkTransformer):
             raise StoryError('variables-backslash', token)
         if '-' in token.value:
             raise StoryError('variables-dash', token)
-        return Tree('assignment', matches)
+        return self.tree('assignment', matches)
 
     def __getattr__(self, attribute, *args):
-        return lambda matches: Tree(attribute, matches)
+        if attribute.startswith('__'):
+            raise AttributeError(attribute)
+        return self.builder(attribute)
@@ -1,30 +1,69 @@
 # -*- coding: utf-8 -*-
+import copy
+
 from lark.lexer import Token
-from lark.tree import Tree as LarkTree
 
 from ..version import version
 
 
-class Tree(LarkTree):
+class Tree:
     """
-    Wraps the original Tree class from lark, providing many useful
-    enhancements.
+    A compact tree, replacing the original Tree class from lark and providing
+    many useful enhancements. Trees use slots instead of a dictionary for
+    their attributes, as big stories have hundreds of thousands of them.
+
+    Finding subtrees by name uses an index of the children, built the first
+    time it's needed and rebuilt after Tree.insert and Tree.replace or when
+    the children are reassigned.
+
+    Trees keep their first and last tokens, which give their position. The
+    Transformer sets them while building the tree, otherwise they are found
+    when needed.
     """
+    __slots__ = ('data', 'children', 'first', 'last', '_index', '_indexed')
+    paths = {}
+
+    def __init__(self, data, children):
+        self.data = data
+        self.children = children
+        self.first = None
+        self.last = None
+        self._index = None
+        self._indexed = None
+
+    def index(self):
+        """
+        Gets the index of the children, mapping rule names to the first
+        subtree with that name.
+        """
+        if self._index is None or self._indexed is not self.children:
+            index = {}
+            for item in self.children:
+                if isinstance(item, Tree):
+                    index.setdefault(item.data, item)
+            self._index = index
+            self._indexed = self.children
+        return self._index
 
     @staticmethod
     def walk(tree, path):
-        for item in tree.children:
-            if isinstance(item, Tree):
-                if item.data == path:
-                    return item
+        return tree.index().get(path)
+
+    @classmethod
+    def shards(cls, path):
+        """
+        Splits a path in shards, caching the result.
+        """
+        if path not in cls.paths:
+            cls.paths[path] = path.split('.')
+        return cls.paths[path]
 
     def node(self, path):
         """
         Finds a subtree or a nested subtree, using path
         """
-        shards = path.split('.')
         current = None
-        for shard in shards:
+        for shard in self.shards(path):
             if current is None:
                 current = self.walk(self, shard)
             else:
@@ -35,33 +74,108 @@ class Tree(LarkTree):
         if len(self.children) > index:
             return self.children[index]
 
+    def iter_subtrees(self):
+        """
+        Iterates over the tree and its subtrees, each subtree after its
+        children. Subtrees found more than once are only given once.
+        """
+        visited = set()
+        stack = [self]
+        subtrees = []
+        while stack:
+            subtree = stack.pop()
+            subtrees.append(subtree)
+            if id(subtree) in visited:
+                continue
+            visited.add(id(subtree))
+            for child in subtree.children:
+                if isinstance(child, Tree):
+                    stack.append(child)
+        seen = set()
+        for subtree in reversed(subtrees):
+            if id(subtree) not in seen:
+                seen.add(id(subtree))
+                yield subtree
+
+    def find_data(self, data):
+        """
+        Finds the subtrees with the given name.
+        """
+        for subtree in self.iter_subtrees():
+            if subtree.data == data:
+                yield subtree
+
     def find(self, path):
         """
-        Wraps LarkTree.find_data, making it easier to use.
+        Wraps Tree.find_data, making it easier to use.
         """
         return list(self.find_data(path))
 
+    @staticmethod
+    def boundaries(child):
+        """
+        Gets the first and last tokens of a child tree or token.
+        """
+        if isinstance(child, Tree):
+            if child.first is None:
+                child.locate()
+            return child.first, child.last
+        if isinstance(child, Token):
+            return child, child
+        return None, None
+
+    def locate(self):
+        """
+        Sets the first and last tokens of the tree, from the start of its
+        first child and the end of its last child, or of the first child when
+        the last one has no tokens.
+        """
+        self.first = None
+        self.last = None
+        if self.children:
+            self.first = self.boundaries(self.children[0])[0]
+            if self.first is not None:
+                self.last = self.boundaries(self.children[-1])[1]
+                if self.last is None:
+                    self.last = self.boundaries(self.children[0])[1]
+
+    @property
+    def position(self):
+        """
+        Gets the position of the tree, as line, column, end line and end
+        column.
+        """
+        if self.first is None:
+            self.locate()
+        if self.first is not None:
+            end_line = self.last.end_line or self.last.line
+            end_column = self.last.end_column or self.last.column
+            return (self.first.line, self.first.column, end_line, end_column)
+
     def line(self):
         """
-        Finds the line number of a tree, by finding the first token in the tree
-        and returning its line
+        Gets the line number of a tree, which is the line of its first token
         """
-        for child in self.children:
-            if isinstance(child, Token):
-                return str(child.line)
-            return child.line()
+        if self.first is None:
+            self.locate()
+        if self.first is not None:
+            return str(self.first.line)
 
-    def insert(self, item):
+    def insert(self, item, index=0):
         """
         Inserts an item into the current tree.
         """
-        self.children.insert(0, item)
+        self.children.insert(index, item)
+        self._index = None
+        self.first = None
 
     def replace(self, index, item):
         """
         Replaces a child at the given index
         """
         self.children[index] = item
+        self._index = None
+        self.first = None
 
     def extract_path(self):
         """
@@ -75,5 +189,45 @@ class Tree(LarkTree):
                 string += child.value
         return string
 
+    def pretty(self, indent='  ', level=0):
+        """
+        Represents the tree and its subtrees, one per line.
+        """
+        if len(self.children) == 1 and not isinstance(self.children[0], Tree):
+            return '{}{}\t{}\n'.format(indent * level, self.data,
+                                       self.children[0])
+        string = '{}{}\n'.format(indent * level, self.data)
+        for child in self.children:
+            if isinstance(child, Tree):
+                string += child.pretty(indent, level + 1)
+            else:
+                string += '{}{}\n'.format(indent * (level + 1), child)
+        return string
+
+    def __deepcopy__(self, memo):
+        return Tree(self.data, copy.deepcopy(self.children, memo))
+
+    def __eq__(self, other):
+        try:
+            return self.data == other.data and self.children == other.children
+        except AttributeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.data, tuple(self.children)))
+
+    def __repr__(self):
+        return 'Tree({}, {})'.format(self.data, self.children)
+
     def __getattr__(self, attribute):
+        """
+        Finds subtrees as attributes. Private and special attributes are not
+        subtrees, and the ones missing are unset slots of a tree that is
+        being copied.
+        """
+        if attribute.startswith('_'):
+            raise AttributeError(attribute)
         return self.node(attribute)
@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
 import re
-from functools import reduce
 
+from .expression import Expression
 
-class Resolver:
 
-    @staticmethod
-    def _walk(item, index):
-        if index.isdigit():
-            return item[int(index)]
-        return item[index]
+class Resolver:
+    """
+    Resolves the objects of compiled stories against data. Objects can be
+    resolved directly, or compiled once with compile into functions of the
+    data, which resolve them many times without dispatching on their type.
+    """
+    _regexps = {}
+    _paths = {}
+    regexps_size = 256
+    paths_size = 1024
+    regexp_flags = {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL,
+                    'x': re.VERBOSE, 'u': 0, 'g': 0}
 
     @classmethod
     def handside(cls, item, data):
@@ -32,16 +38,40 @@ class Resolver:
         ]
 
     @classmethod
-    def string(cls, string, data, values=None):
+    def string(cls, string, data, values=None, segments=None):
         """
-        Resolves a string to itself. If values are given, the string
-        is formatted against data, using the order in values.
+        Resolves a string to itself. If values are given, its placeholders
+        are replaced with them, resolved against data. Strings with literal
+        braces can't be formatted, so their segments are joined instead.
+        Strings resolved many times can be compiled once with compile.
         """
         if values:
-            values = Resolver.values(values, data)
-            return string.format(*values)
+            try:
+                return string.format(*cls.values(values, data))
+            except (IndexError, ValueError):
+                if segments is None:
+                    segments = cls.split(string, values)
+            return ''.join([str(cls.resolve(segment, data))
+                            for segment in segments])
         return string
 
+    @staticmethod
+    def split(string, values):
+        """
+        Splits a string with placeholders into its segments, its literal
+        parts interleaved with its values. For example 'hello {}!' with the
+        value name gives ['hello ', name, '!'].
+        """
+        segments = []
+        parts = string.split('{}')
+        for part, value in zip(parts, values):
+            if part:
+                segments.append(part)
+            segments.append(value)
+        if parts[-1]:
+            segments.append(parts[-1])
+        return segments
+
     @classmethod
     def file(cls, filename, data, values=None):
         if values:
@@ -55,10 +85,120 @@ class Resolver:
         Resolves a path against some data, for example the path ['a', 'b']
         with data {'a': {'b': 'value'}} produces 'value'
         """
+        return cls.accessor(paths)(data)
+
+    @classmethod
+    def accessor(cls, paths):
+        """
+        Gets the function resolving a path, compiling it the first time.
+        Paths with objects, like a[b], are compiled each time, as they
+        can't be kept by their segments. Like regexps, the oldest path is
+        dropped when there are already paths_size.
+        """
+        key = tuple(paths)
         try:
-            return reduce(cls._walk, paths, data)
-        except (KeyError, TypeError):
-            return None
+            accessor = cls._paths.get(key)
+        except TypeError:
+            return cls.compile_accessor(paths)
+        if accessor is None:
+            accessor = cls.compile_accessor(paths)
+            if len(cls._paths) >= cls.paths_size:
+                del cls._paths[next(iter(cls._paths))]
+            cls._paths[key] = accessor
+        return accessor
+
+    @staticmethod
+    def segment(path):
+        if type(path) is str and path.isdigit():
+            return int(path)
+        return path
+
+    @classmethod
+    def compile_accessor(cls, paths):
+        """
+        Compiles a path into a function walking data along its segments,
+        that returns None when a key or an index is missing. Numeric
+        segments are converted once. Segments that are objects are resolved
+        against the data before walking.
+        """
+        segments = [cls.segment(path) for path in paths]
+        if any(type(segment) is dict for segment in segments):
+            return cls.compile_dynamic_accessor(segments)
+        if len(segments) == 1:
+            first, = segments
+
+            def access(data):
+                try:
+                    return data[first]
+                except (KeyError, IndexError, TypeError):
+                    return None
+        elif len(segments) == 2:
+            first, second = segments
+
+            def access(data):
+                try:
+                    return data[first][second]
+                except (KeyError, IndexError, TypeError):
+                    return None
+        else:
+            def access(data):
+                try:
+                    for segment in segments:
+                        data = data[segment]
+                    return data
+                except (KeyError, IndexError, TypeError):
+                    return None
+        return access
+
+    @classmethod
+    def compile_dynamic_accessor(cls, segments):
+        functions = []
+        for segment in segments:
+            if type(segment) is dict:
+                functions.append(cls.compile_object(segment))
+            else:
+                functions.append(cls.constant(segment))
+
+        def access(data):
+            item = data
+            try:
+                for function in functions:
+                    item = item[function(data)]
+                return item
+            except (KeyError, IndexError, TypeError):
+                return None
+        return access
+
+    @classmethod
+    def flags(cls, flags):
+        """
+        Gets the re flags of regexp flags like 'im'. The g flag is ignored,
+        as matching doesn't depend on it.
+        """
+        result = 0
+        for flag in flags or '':
+            if flag not in cls.regexp_flags:
+                raise ValueError('Regexp flag not supported: {}'.format(flag))
+            result |= cls.regexp_flags[flag]
+        return result
+
+    @classmethod
+    def regexp(cls, regexp, flags=None):
+        """
+        Compiles a regexp, written with or without its slashes. Compiled
+        regexps are kept by pattern and flags, dropping the oldest one when
+        there are already regexps_size.
+        """
+        key = (regexp, flags)
+        if key not in cls._regexps:
+            pattern = regexp
+            if len(regexp) > 1 and regexp[0] == regexp[-1] == '/':
+                pattern = regexp[1:-1]
+            compiled = re.compile(pattern, cls.flags(flags))
+            if len(cls._regexps) >= cls.regexps_size:
+                del cls._regexps[next(iter(cls._regexps))]
+            cls._regexps[key] = compiled
+        return cls._regexps[key]
 
     @classmethod
     def argument(cls, argument, data):
@@ -76,11 +216,13 @@ class Resolver:
         for item in items:
             yield cls.resolve(item, data)
 
-    @staticmethod
-    def method(method, left, right):
-        if method == 'like':
-            return right.match(left) is not None
-        elif method == 'notlike':
+    @classmethod
+    def method(cls, method, left, right):
+        if method in ('like', 'notlike'):
+            if type(right) is str:
+                right = cls.regexp(right)
+            if method == 'like':
+                return right.match(left) is not None
             return right.match(left) is None
         elif method == 'in':
             return left in right
@@ -96,15 +238,20 @@ class Resolver:
 
     @classmethod
     def expression(cls, data, expression, values):
-        mapping = map(cls.stringify, cls.values(values, data=data))
-        return eval(expression.format(*mapping))
+        """
+        Evaluates an expression template with its resolved values. Templates
+        are parsed once, and evaluated without eval.
+        """
+        function = Expression.compile(expression)
+        return function(cls.values(values, data=data))
 
     @classmethod
     def object(cls, item, data):
         object_type = item.get('$OBJECT')
         if object_type == 'string':
             if 'values' in item:
-                return cls.string(item['string'], data, values=item['values'])
+                return cls.string(item['string'], data, values=item['values'],
+                                  segments=item.get('segments'))
             return cls.string(item['string'], data)
         elif object_type == 'file':
             if 'values' in item:
@@ -113,7 +260,7 @@ class Resolver:
         elif object_type == 'path':
             return cls.path(item['paths'], data)
         elif object_type == 'regexp':
-            return re.compile(item['regexp'])
+            return cls.regexp(item['regexp'], item.get('flags'))
         elif object_type == 'value':
             return item['value']
         elif object_type == 'method':
@@ -159,3 +306,133 @@ class Resolver:
         elif type(item) is list:
             return cls.list(item, data)
         return item
+
+    @classmethod
+    def compile(cls, item):
+        """
+        Compiles an item into a function of the data, that resolves it as
+        resolve does.
+        """
+        if type(item) is dict:
+            return cls.compile_object(item)
+        elif type(item) is list:
+            return cls.compile_list(item)
+        return cls.constant(item)
+
+    @staticmethod
+    def constant(value):
+        return lambda data: value
+
+    @classmethod
+    def compile_values(cls, items_list):
+        """
+        Compiles a list of values into a function returning the list of
+        their resolved values. Lists of plain values are copied.
+        """
+        if not any(type(value) in (dict, list) for value in items_list):
+            return lambda data: list(items_list)
+        functions = [cls.compile(value) for value in items_list]
+        return lambda data: [function(data) for function in functions]
+
+    @classmethod
+    def compile_string(cls, string, values=None, segments=None):
+        """
+        Compiles a string, joining its segments. They are split from the
+        string when the compiler didn't give them.
+        """
+        if segments is None and values:
+            segments = cls.split(string, values)
+        if segments:
+            functions = [cls.compile(segment) for segment in segments]
+            return lambda data: ''.join([str(function(data))
+                                         for function in functions])
+        return cls.constant(string)
+
+    @classmethod
+    def compile_path(cls, paths):
+        return cls.accessor(paths)
+
+    @classmethod
+    def compile_method(cls, method, left, right):
+        """
+        Compiles a method. Like and notlike with a regexp match with the
+        compiled regexp directly.
+        """
+        left = cls.compile_object(left)
+        if method in ('like', 'notlike') and right.get('$OBJECT') == 'regexp':
+            match = cls.regexp(right['regexp'], right.get('flags')).match
+            if method == 'like':
+                return lambda data: match(left(data)) is not None
+            return lambda data: match(left(data)) is None
+        right = cls.compile_object(right)
+        return lambda data: cls.method(method, left(data), right(data))
+
+    @classmethod
+    def compile_expression(cls, expression, values):
+        function = Expression.compile(expression)
+        values = cls.compile_values(values)
+        return lambda data: function(values(data))
+
+    @classmethod
+    def compile_dict(cls, items):
+        items = [(cls.compile_object(key), cls.compile_object(value))
+                 for key, value in items]
+        return lambda data: {key(data): value(data) for key, value in items}
+
+    @classmethod
+    def compile_dictionary(cls, dictionary):
+        items = [(key, cls.compile(value))
+                 for key, value in dictionary.items()]
+        return lambda data: {key: value(data) for key, value in items}
+
+    @classmethod
+    def compile_object(cls, item):
+        object_type = item.get('$OBJECT')
+        if object_type in ('string', 'file'):
+            return cls.compile_string(item['string'], item.get('values'),
+                                      item.get('segments'))
+        elif object_type == 'path':
+            return cls.compile_path(item['paths'])
+        elif object_type == 'regexp':
+            return cls.constant(cls.regexp(item['regexp'],
+                                           item.get('flags')))
+        elif object_type == 'value':
+            return cls.constant(item['value'])
+        elif object_type == 'method':
+            return cls.compile_method(item['method'], item['left'],
+                                      item['right'])
+        elif object_type == 'expression':
+            return cls.compile_expression(item['expression'],
+                                          item['values'])
+        elif object_type == 'argument':
+            return cls.compile_object(item['argument'])
+        elif object_type == 'dict':
+            return cls.compile_dict(item['items'])
+        elif object_type == 'list':
+            return cls.compile_values(item['items'])
+        return cls.compile_dictionary(item)
+
+    @classmethod
+    def compile_list(cls, items):
+        """
+        Compiles a list as list does, joining the resolved items unless
+        there is a single boolean.
+        """
+        values = cls.compile_values(items)
+
+        def resolve(data):
+            result = values(data)
+            if len(result) == 1:
+                if type(result[0]) is bool:
+                    return result
+            return ' '.join(result)
+        return resolve
+
+    @classmethod
+    def compile_line(cls, line):
+        """
+        Compiles the arguments of a line of a compiled story, into a
+        function returning their resolved values. Callers can keep it and
+        call it for each run, as compiled stories don't change.
+        """
+        return cls.compile_values(line['args'] or [])
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import json
+import os
+import socketserver
+import traceback
+
+from .app import App
+from .buildcache import BuildCache
+from .client import Client
+from .version import version
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """
+    Handles a connection to the server, reading one JSON-RPC request and
+    writing its response, each on one line. Requests are handled one at a
+    time, so clients that don't send theirs are dropped after timeout.
+    """
+    timeout = 5
+
+    def handle(self):
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            return
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError:
+            request = None
+        response = self.server.respond(request)
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    Compiles stories for the clients connecting to a Unix socket, so that
+    they don't pay for starting Python and loading the parser each time.
+    Parsers stay loaded between requests, and compiled stories are kept in
+    memory. Requests are handled one at a time.
+    """
+    size = 1024
+
+    def __init__(self, path=None):
+        self.path = path or Client.socket_path()
+        self.memory = BuildCache(directory=None, size=self.size)
+        self.caches = {}
+        self.remove(self.path)
+        mask = os.umask(0o177)
+        try:
+            super().__init__(self.path, Handler)
+        finally:
+            os.umask(mask)
+
+    @staticmethod
+    def remove(path):
+        """
+        Removes the socket left by a server that is not running anymore.
+        """
+        if os.path.exists(path) and Client(path).request('ping') is None:
+            os.remove(path)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def build_cache(self, cwd, cache):
+        """
+        Gets the build cache for a request. With cache, it's the one of the
+        .storyscript_cache directory in cwd, which is kept to reuse its
+        entries in memory.
+        """
+        if cache:
+            directory = os.path.join(cwd, '.storyscript_cache')
+            if directory not in self.caches:
+                self.caches[directory] = BuildCache(directory=directory,
+                                                    size=self.size)
+            return self.caches[directory]
+        return self.memory
+
+    def compile(self, cwd, path, ebnf_file=None, debug=False, cache=False,
+                workers=None):
+        """
+        Compiles the stories in path from the cwd directory, as the compile
+        command would. What is printed is returned as output, and exits are
+        returned too, so that clients can do the same.
+        """
+        result = {'results': None, 'output': '', 'exited': False,
+                  'code': None, 'error': None}
+        output = io.StringIO()
+        directory = os.getcwd()
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(output):
+                build_cache = self.build_cache(cwd, cache)
+                result['results'] = App.compile(path, ebnf_file=ebnf_file,
+                                                debug=debug,
+                                                cache=build_cache,
+                                                workers=workers)
+        except SystemExit as e:
+            result['exited'] = True
+            result['code'] = e.code
+        except Exception:
+            result['error'] = traceback.format_exc()
+        finally:
+            os.chdir(directory)
+        result['output'] = output.getvalue()
+        return result
+
+    def respond(self, request):
+        """
+        Responds to a JSON-RPC request. Requests from other versions of
+        Storyscript are refused, so that their clients compile on their own.
+        """
+        if not isinstance(request, dict):
+            return {'jsonrpc': '2.0', 'id': None,
+                    'error': {'code': -32700, 'message': 'Parse error'}}
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        method = request.get('method')
+        params = request.get('params', {})
+        if method == 'ping':
+            response['result'] = version
+        elif method != 'compile':
+            response['error'] = {'code': -32601,
+                                 'message': 'Method not found'}
+        elif params.pop('version', None) != version:
+            response['error'] = {'code': 1, 'message': 'Version mismatch'}
+        else:
+            try:
+                response['result'] = self.compile(**params)
+            except TypeError:
+                response['error'] = {'code': -32602,
+                                     'message': 'Invalid params'}
+        return response
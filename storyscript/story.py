@@ -8,17 +8,64 @@ from .parser import Parser
 
 
 class Story:
+    """
+    A story, from its source to its compiled tree.
+
+    Comments are found by the comments expression, which also matches
+    strings and regular expressions so that the ones with a # or a quote
+    are skipped in the same pass. Regular expressions are only matched
+    where a value is expected, after =, :, (, [ or a comma, as slashes are
+    also found in names and divisions.
+    Block comments run from ### to the end of the line of the next ###.
+    The unfinished expression also finds strings and block comments that
+    are still open, as their end may be in the next part of a stream.
+    """
+    comments = re.compile(r'\'[^\']*\'|"[^"]*"|[=:(\[,][ \t]*/[^/\n]*/|'
+                          r'###[\s\S]*?###.*|#.*')
+    unfinished = re.compile(r'\'[^\']*\'|"[^"]*"|[=:(\[,][ \t]*/[^/\n]*/|'
+                            r'###[\s\S]*?###.*|(###|\'|")|#.*')
 
     def __init__(self, story):
         self.story = story
 
     @staticmethod
-    def clean_source(source):
+    def uncomment(match):
+        """
+        Replaces a comment with its newlines, keeping strings.
+        """
+        text = match.group()
+        if text[0] == '#':
+            return '\n' * text.count('\n')
+        return text
+
+    @classmethod
+    def clean_source(cls, source):
         """
-        Cleans a story by removing comments.
+        Cleans a story by removing comments, in a single pass. Lines keep
+        their numbers.
         """
-        expression = '(?<=###)\s(.*|\\n)+(?=\s###)|#(.*)'
-        return re.sub(expression, '', source)
+        return cls.comments.sub(cls.uncomment, source)
+
+    @classmethod
+    def clean_chunks(cls, chunks):
+        """
+        Cleans a story given in chunks of whole lines, yielding the cleaned
+        source as soon as its comments are known. Strings and block comments
+        that are still open are kept for the next chunk.
+        """
+        pending = ''
+        for chunk in chunks:
+            pending += chunk
+            end = len(pending)
+            for match in cls.unfinished.finditer(pending):
+                if match.group(1):
+                    end = match.start()
+                    break
+            if end:
+                yield cls.clean_source(pending[:end])
+            pending = pending[end:]
+        if pending:
+            yield cls.clean_source(pending)
 
     @classmethod
     def read(cls, path):
@@ -62,13 +109,28 @@ class Story:
             modules.append(path)
         return modules
 
-    def compile(self, debug=False):
-        self.compiled = Compiler.compile(self.tree, debug=debug)
+    def compile(self, debug=False, segments=False):
+        self.compiled = Compiler.compile(self.tree, debug=debug,
+                                         segments=segments)
 
     def lex(self):
-        return Parser().lex(self.story)
+        return Parser().iter_tokens(self.story)
+
+    @classmethod
+    def lex_file(cls, path):
+        """
+        Lexes a story file while reading it, yielding its tokens.
+        """
+        try:
+            with io.open(path, 'r') as file:
+                for token in Parser().iter_tokens(file):
+                    yield token
+        except FileNotFoundError:
+            abspath = os.path.abspath(path)
+            print('File "{}" not found at {}'.format(path, abspath))
+            exit()
 
-    def process(self, ebnf_file=None, debug=False):
+    def process(self, ebnf_file=None, debug=False, segments=False):
         self.parse(ebnf_file=ebnf_file, debug=debug)
-        self.compile(debug=debug)
+        self.compile(debug=debug, segments=segments)
         return self.compiled
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+from pytest import mark
+
+
+heavy = ('lark', 'storyscript.app', 'storyscript.compiler',
+         'storyscript.parser.cache', 'storyscript.parser.parser')
+
+
+def import_times(code):
+    """
+    Runs code in a new process with -X importtime, returning the imported
+    modules with their own import time, in microseconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    command = [sys.executable, '-X', 'importtime', '-c', code]
+    process = subprocess.run(command, env=env, check=True,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE)
+    times = {}
+    for line in process.stderr.decode('utf-8').splitlines():
+        if line.startswith('import time:') and '|' in line:
+            own, cumulative, name = line[12:].split('|')
+            if own.strip().isdigit():
+                times[name.strip()] = int(own)
+    return times
+
+
+@mark.parametrize('code', [
+    'import storyscript',
+    'import storyscript.cli',
+    'import storyscript.client',
+    "from storyscript.cli import Cli; Cli.main(['grammar'])"
+])
+def test_benchmark_cli_import_time(code):
+    """
+    Ensures the package, the command line, the server client and the
+    grammar command don't import the parser, and that their own modules
+    import within budget.
+    """
+    times = import_times(code)
+    for name in times:
+        assert name.split('.')[0] != 'lark'
+        assert name not in heavy
+    own = sum(time for name, time in times.items()
+              if name.startswith('storyscript'))
+    print('{}: {:.1f}ms'.format(code, own / 1000))
+    assert own < 20000
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import copy
+import time
+
+from storyscript.compiler import Compiler, Lines, Preprocessor
+from storyscript.parser import Parser
+
+
+def measure(function, *args, runs=3):
+    """
+    Measures the best time of a few runs of function
+    """
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def make_lines(size):
+    lines = Lines()
+    for line in range(1, size + 1):
+        lines.make('set', str(line), name=['a'], args=[line])
+
+
+def test_benchmark_lines_make():
+    """
+    Ensures that making lines scales linearly with the number of lines
+    """
+    timings = {}
+    for size in (1000, 10000, 50000):
+        timings[size] = measure(make_lines, size)
+        print('{} lines: {:.4f}s'.format(size, timings[size]))
+    assert timings[50000] / timings[1000] < 50 * 5
+
+
+def synthetic_story(size):
+    """
+    Creates a story of the given number of lines
+    """
+    template = ('a{0} = {0}\nif a{0} > 1\n    b{0} = "x"\nelse\n'
+                '    alpine echo text:"hi"\n')
+    return ''.join(template.format(i) for i in range(size // 5))
+
+
+def test_benchmark_compiler_compile():
+    """
+    Ensures that compiling scales linearly with the number of lines
+    """
+    timings = {}
+    for size in (1000, 10000, 50000):
+        tree = Parser().parse(synthetic_story(size))
+        runs = 1 if size == 50000 else 3
+        timings[size] = measure(Compiler.compile, tree, runs=runs)
+        print('{} lines: {:.4f}s'.format(size, timings[size]))
+    assert timings[50000] / timings[1000] < 50 * 3
+
+
+def nested_story(depth):
+    """
+    Creates a story with blocks nested depth times, each with nested inline
+    expressions.
+    """
+    lines = []
+    for level in range(depth):
+        indent = '    ' * level
+        line = '{}x{} = alpine echo text:(random value:(uuid generate))'
+        lines.append(line.format(indent, level))
+        lines.append('{}if x{}'.format(indent, level))
+    lines.append('{}y = 1'.format('    ' * depth))
+    return '\n'.join(lines)
+
+
+def process_copies(trees):
+    for tree in trees:
+        Preprocessor.process(tree)
+
+
+def test_benchmark_preprocessor_nested():
+    """
+    Ensures that preprocessing scales linearly with the nesting depth
+    """
+    timings = {}
+    for depth in (10, 20, 40):
+        tree = Parser().parse(nested_story(depth))
+        trees = [copy.deepcopy(tree) for i in range(20)]
+        timings[depth] = measure(process_copies, trees, runs=1)
+        print('depth {}: {:.4f}s'.format(depth, timings[depth]))
+    assert timings[40] / timings[10] < 4 * 3
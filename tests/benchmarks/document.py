@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import time
+
+from storyscript.api import Api
+from storyscript.document import Document
+
+from .compiler import measure, synthetic_story
+
+
+def test_benchmark_document_edit():
+    """
+    Compares compiling a 10000 lines story after each edit with loading
+    it, for an edit in an assignment and one adding a line.
+    """
+    story = synthetic_story(10000)
+    loads = measure(Api.loads, story, runs=1)
+    document = Document(story)
+    start = time.perf_counter()
+    document.edit((5001, 9), (5001, 9), '7')
+    typing = time.perf_counter() - start
+    start = time.perf_counter()
+    document.edit((21, 1), (21, 1), 'c = 1\n')
+    adding = time.perf_counter() - start
+    print('loads: {:.4f}s typing: {:.4f}s adding a line: {:.4f}s'.format(
+        loads, typing, adding))
+    source = ''.join(segment.source for segment in document.segments)
+    assert document.compiled == Api.loads(source)
+    assert typing < loads / 20
+    assert adding < loads / 5
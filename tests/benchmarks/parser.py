@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from lark import Transformer as LarkTransformer
+
+from pytest import fixture
+
+from storyscript.parser import Parser, Transformer, Tree
+
+from .compiler import measure, synthetic_story
+
+
+script = 'from storyscript.parser import Parser; Parser().lark()'
+
+
+@fixture
+def startup(tmpdir):
+    """
+    Measures how long a fresh process takes to get a Lark instance, using a
+    temporary disk cache.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    env = dict(os.environ, STORYSCRIPT_CACHE_DIR=str(tmpdir),
+               PYTHONPATH=root)
+
+    def startup():
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', script], env=env, check=True)
+        return time.perf_counter() - start
+    return startup
+
+
+def test_benchmark_parser_startup(startup):
+    """
+    Compares cold startup, building the parse tables, with warm startup,
+    loading them from the disk cache.
+    """
+    cold = startup()
+    warm = min(startup() for i in range(3))
+    print('cold: {:.3f}s warm: {:.3f}s'.format(cold, warm))
+    assert warm < cold
+
+
+def linear_node(tree, path):
+    """
+    Finds a nested subtree scanning the children, as Tree.node did before
+    the children index.
+    """
+    current = tree
+    for shard in path.split('.'):
+        for item in current.children:
+            if isinstance(item, Tree) and item.data == shard:
+                current = item
+                break
+    return current
+
+
+def test_benchmark_tree_node():
+    """
+    Compares finding nested subtrees with the children index against
+    scanning the children.
+    """
+    source = 'alpine echo {} as a, b\n'.format(
+        ' '.join('arg{}:1'.format(i) for i in range(50)))
+    tree = Parser().parse(source).node('block.service_block.service')
+    paths = ['service_fragment.output', 'service_fragment.command',
+             'path']
+    assert [tree.node(path) for path in paths] == [linear_node(tree, path)
+                                                   for path in paths]
+    start = time.perf_counter()
+    for i in range(5000):
+        for path in paths:
+            tree.node(path)
+    indexed = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(5000):
+        for path in paths:
+            linear_node(tree, path)
+    linear = time.perf_counter() - start
+    print('indexed: {:.4f}s linear: {:.4f}s'.format(indexed, linear))
+    assert indexed < linear
+
+
+def transform_memory(transformer, tree):
+    """
+    Measures the memory allocated to transform a tree, returning the memory
+    still used by the result and the peak.
+    """
+    tracemalloc.start()
+    result = transformer.transform(tree)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def test_benchmark_tree_memory():
+    """
+    Compares the memory used by the trees of a 50k lines story with the
+    memory used by lark trees.
+    """
+    tree = Parser(embed_transformer=False).lark().parse(synthetic_story(50000))
+    lark = transform_memory(LarkTransformer(), tree)
+    compact = transform_memory(Transformer(), tree)
+    message = 'lark trees: {:.1f}MB, peak {:.1f}MB'
+    print(message.format(lark[0] / 1e6, lark[1] / 1e6))
+    message = 'compact trees: {:.1f}MB, peak {:.1f}MB'
+    print(message.format(compact[0] / 1e6, compact[1] / 1e6))
+    assert compact[1] < lark[1] * 0.8
+
+
+class LambdaTransformer(Transformer):
+    """
+    Creates a new function at every rule lookup, as Transformer did before
+    dispatching rules to builders.
+    """
+
+    def __getattr__(self, attribute, *args):
+        return lambda matches: self.tree(attribute, matches)
+
+
+def test_benchmark_transformer_dispatch():
+    """
+    Reports the time of transforming a tree with the rule builders and with
+    functions created at every lookup. Dispatching is a small part of
+    transforming, so the difference is within the noise of a run and is
+    not asserted.
+    """
+    parser = Parser(embed_transformer=False)
+    tree = parser.lark().parse(synthetic_story(10000))
+    rules = parser.rules()
+    transformers = {'lambdas': lambda: LambdaTransformer(),
+                    'builders': lambda: Transformer(rules=rules)}
+    results = {}
+    for name, transformer in transformers.items():
+        timings = []
+        for i in range(5):
+            start = time.perf_counter()
+            results[name] = transformer().transform(tree)
+            timings.append(time.perf_counter() - start)
+        print('{}: {:.4f}s'.format(name, min(timings)))
+    assert results['builders'] == results['lambdas']
+
+
+def parse_memory(parser, source):
+    """
+    Measures the peak memory used to parse a story
+    """
+    tracemalloc.start()
+    tree = parser.parse(source)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del tree
+    return peak
+
+
+def test_benchmark_parser_embedded():
+    """
+    Compares parsing with the transformer embedded in Lark and transforming
+    the tree after parsing.
+    """
+    source = synthetic_story(10000)
+    parsers = {'transformed': Parser(embed_transformer=False),
+               'embedded': Parser()}
+    timings = {}
+    peaks = {}
+    for name, parser in parsers.items():
+        parser.lark()
+        timings[name] = measure(parser.parse, source)
+        peaks[name] = parse_memory(parser, source)
+        message = '{}: {:.4f}s, peak {:.1f}MB'
+        print(message.format(name, timings[name], peaks[name] / 1e6))
+    assert timings['embedded'] < timings['transformed']
+    assert peaks['embedded'] < peaks['transformed'] * 0.8
+
+
+def stream_memory(parser, path):
+    """
+    Measures the peak memory used to stream the tokens of a story file,
+    without keeping them.
+    """
+    tracemalloc.start()
+    with io.open(path, 'r') as f:
+        for token in parser.iter_tokens(f):
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def test_benchmark_parser_iter_tokens(tmpdir):
+    """
+    Ensures streaming tokens uses the same memory regardless of the size of
+    the story, and that the first token comes right away.
+    """
+    parser = Parser()
+    parser.lexer()
+    peaks = {}
+    for size in (10000, 40000):
+        path = tmpdir.join('{}.story'.format(size))
+        path.write(synthetic_story(size))
+        peaks[size] = stream_memory(parser, str(path))
+        start = time.perf_counter()
+        with io.open(str(path), 'r') as f:
+            next(parser.iter_tokens(f))
+        first = time.perf_counter() - start
+        message = '{} lines: {}KB, peak {:.1f}KB, first token {:.4f}s'
+        print(message.format(size, path.size() // 1000, peaks[size] / 1e3,
+                             first))
+    assert peaks[40000] < peaks[10000] * 2
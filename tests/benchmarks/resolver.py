@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import re
+from functools import reduce
+
+from storyscript.api import Api
+from storyscript.resolver import Resolver
+
+from .compiler import measure
+
+
+def arguments_story(size):
+    """
+    Creates a story of the given number of lines, whose lines have nested
+    arguments.
+    """
+    template = ('a{0} = {{"key": a.b, "text": "hi {{a.c}} {{d}}"}}\n'
+                'alpine echo data:{{"k": a.b, "l": c}} text:"x {{a.b}}"\n'
+                'if a{0}.key > 1\n    b{0} = a{0}\n')
+    return ''.join(template.format(i) for i in range(size // 4))
+
+
+expressions = [
+    ({'$OBJECT': 'expression', 'expression': '{} == 1',
+      'values': [{'$OBJECT': 'path', 'paths': ['a']}]}, {'a': 1}),
+    ({'$OBJECT': 'expression', 'expression': '{} > {}',
+      'values': [{'$OBJECT': 'path', 'paths': ['a']},
+                 {'$OBJECT': 'value', 'value': 2}]}, {'a': 1}),
+    ({'$OBJECT': 'expression', 'expression': '{} == {}',
+      'values': [{'$OBJECT': 'path', 'paths': ['a']},
+                 {'$OBJECT': 'value', 'value': 'red'}]}, {'a': 'red'})
+]
+
+
+def eval_expression(data, expression, values):
+    """
+    Evaluates an expression as Resolver.expression did before, formatting
+    the values in the template and evaluating it.
+    """
+    mapping = map(Resolver.stringify, Resolver.values(values, data=data))
+    return eval(expression.format(*mapping))
+
+
+def resolve_expressions(function, runs):
+    for i in range(runs):
+        for item, data in expressions:
+            function(data, item['expression'], item['values'])
+
+
+def test_benchmark_resolver_expression():
+    """
+    Compares evaluating the expressions of the resolver integration tests
+    with compiled templates and with eval.
+    """
+    for item, data in expressions:
+        expected = eval_expression(data, item['expression'], item['values'])
+        assert Resolver.resolve(item, data) == expected
+    compiled = measure(resolve_expressions, Resolver.expression, 10000)
+    evaluated = measure(resolve_expressions, eval_expression, 10000)
+    print('compiled: {:.4f}s eval: {:.4f}s'.format(compiled, evaluated))
+    assert compiled < evaluated / 3
+
+
+def resolve_lines(lines, data):
+    return [Resolver.values(line['args'] or [], data=data) for line in lines]
+
+
+def run_lines(functions, data):
+    return [function(data) for function in functions]
+
+
+def test_benchmark_resolver_compile():
+    """
+    Compares resolving the arguments of each line of a 10000 lines story
+    with functions compiled once and by walking their objects.
+    """
+    lines = list(Api.loads(arguments_story(10000))['tree'].values())
+    data = {'a': {'b': 1, 'c': 'c'}, 'c': [1], 'd': 'd'}
+    data.update({'a{}'.format(i): {'key': i} for i in range(2500)})
+    functions = [Resolver.compile_line(line) for line in lines]
+    assert run_lines(functions, data) == resolve_lines(lines, data)
+    compiled = measure(run_lines, functions, data)
+    resolved = measure(resolve_lines, lines, data)
+    print('compiled: {:.4f}s resolved: {:.4f}s'.format(compiled, resolved))
+    assert compiled < resolved
+
+
+like = {'$OBJECT': 'method', 'method': 'like',
+        'left': {'$OBJECT': 'path', 'paths': ['event', 'name']},
+        'right': {'$OBJECT': 'regexp', 'regexp': '/^order\\.(created|paid)$/',
+                  'flags': 'i'}}
+
+
+def compile_like(data):
+    """
+    Resolves the like condition compiling its regexp each time, as
+    Resolver.object did before.
+    """
+    left = Resolver.resolve(like['left'], data)
+    right = re.compile(like['right']['regexp'][1:-1], re.IGNORECASE)
+    return Resolver.method('like', left, right)
+
+
+def filter_events(events, function):
+    return [function(data) for data in events]
+
+
+def test_benchmark_resolver_like():
+    """
+    Compares filtering events with a compiled like condition, whose regexp
+    is compiled once, and compiling the regexp for each event.
+    """
+    names = ('order.created', 'ORDER.PAID', 'order.refunded', 'user.created')
+    events = [{'event': {'name': names[i % 4]}} for i in range(100000)]
+    expected = [i % 4 < 2 for i in range(100000)]
+    assert [Resolver.resolve(like, data) for data in events] == expected
+    assert filter_events(events, compile_like) == expected
+    cached = measure(filter_events, events, Resolver.compile(like))
+    compiled = measure(filter_events, events, compile_like)
+    print('cached: {:.4f}s compiled: {:.4f}s'.format(cached, compiled))
+    assert cached < compiled / 1.5
+
+
+def walk(item, index):
+    if index.isdigit():
+        return item[int(index)]
+    return item[index]
+
+
+def reduce_path(paths, data):
+    """
+    Resolves a path as Resolver.path did before, walking its segments with
+    reduce.
+    """
+    try:
+        return reduce(walk, paths, data)
+    except (KeyError, TypeError):
+        return None
+
+
+def nested_context(depth, width):
+    """
+    Creates a context of the given depth, with width keys at each level
+    """
+    if depth == 0:
+        return 'value'
+    return {'k{}'.format(i): nested_context(depth - 1, width)
+            for i in range(width)}
+
+
+def resolve_paths(function, paths, data, runs):
+    for i in range(runs):
+        for path in paths:
+            function(path, data)
+
+
+def access_paths(accessors, data, runs):
+    for i in range(runs):
+        for accessor in accessors:
+            accessor(data)
+
+
+def test_benchmark_resolver_path():
+    """
+    Compares resolving deep paths against a large context with accessors
+    compiled once, with Resolver.path and by walking their segments.
+    """
+    data = nested_context(6, 8)
+    data['items'] = [nested_context(3, 8) for i in range(100)]
+    paths = [['k{}'.format((i + j) % 8) for j in range(6)]
+             for i in range(8)]
+    paths += [['items', str(i * 9), 'k1', 'k2', 'k3'] for i in range(10)]
+    for path in paths:
+        assert Resolver.path(path, data) == reduce_path(path, data)
+    assert Resolver.path(['items', '100', 'k1'], data) is None
+    accessors = [Resolver.compile_path(path) for path in paths]
+    compiled = measure(access_paths, accessors, data, 5000, runs=7)
+    resolved = measure(resolve_paths, Resolver.path, paths, data, 5000,
+                       runs=7)
+    reduced = measure(resolve_paths, reduce_path, paths, data, 5000, runs=7)
+    print('compiled: {:.4f}s path: {:.4f}s reduce: {:.4f}s'.format(
+        compiled, resolved, reduced))
+    assert compiled < reduced / 1.25
+
+
+def format_string(item, data):
+    """
+    Resolves a string as Resolver.string did before, formatting it with
+    its resolved values.
+    """
+    return item['string'].format(*Resolver.values(item['values'], data))
+
+
+def interpolate_strings(function, items, data, runs):
+    for i in range(runs):
+        for item in items:
+            function(item, data)
+
+
+def join_string(function, data):
+    return function(data)
+
+
+def test_benchmark_resolver_string():
+    """
+    Compares interpolating strings with many placeholders by joining
+    their segments, compiled once, and by formatting them as Resolver.string
+    did before. Resolving them directly formats them too, so it should
+    take about as long.
+    """
+    story = ''.join('a{} = "{}"\n'.format(
+        i, ' '.join('k{0}={{v{0}}}'.format(j) for j in range(20)))
+        for i in range(50))
+    data = {'v{}'.format(j): j for j in range(20)}
+    items = [line['args'][0] for line in
+             Api.loads(story, segments=True)['tree'].values()]
+    for item in items:
+        assert Resolver.resolve(item, data) == format_string(item, data)
+    functions = [Resolver.compile(item) for item in items]
+    joined = measure(interpolate_strings, join_string, functions, data, 500,
+                     runs=7)
+    resolved = measure(interpolate_strings, Resolver.object, items, data,
+                       500, runs=7)
+    formatted = measure(interpolate_strings, format_string, items, data, 500,
+                        runs=7)
+    print('joined: {:.4f}s resolved: {:.4f}s format: {:.4f}s'.format(
+        joined, resolved, formatted))
+    assert joined < formatted / 1.5
+    assert resolved < formatted * 1.25
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from storyscript.client import Client
+from storyscript.server import Server
+
+from .compiler import synthetic_story
+
+
+def test_benchmark_server_latency(tmpdir):
+    """
+    Compares compiling a story with a running server to compiling it with
+    a new process, as the compile command does.
+    """
+    story = tmpdir.join('story.story')
+    story.write(synthetic_story(100))
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    script = 'from storyscript.cli import Cli; Cli.main()'
+    command = [sys.executable, '-c', script, 'compile', str(story), '-j']
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    cold = time.perf_counter() - start
+    server = Server(str(tmpdir.join('storyscript.sock')))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        client = Client(server.path)
+        client.compile(str(story))
+        timings = []
+        for i in range(10):
+            start = time.perf_counter()
+            client.compile(str(story))
+            timings.append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+    warm = min(timings)
+    print('cold: {:.4f}s server: {:.4f}s'.format(cold, warm))
+    assert warm < cold / 10
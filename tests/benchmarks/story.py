@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from pytest import mark
+
+from storyscript.story import Story
+
+from .compiler import measure
+
+
+megabyte = 2 ** 20
+
+
+@mark.parametrize('name, make', [
+    ('unterminated block', lambda size: '###\n' + 'a = 1\n' * (size // 6)),
+    ('unterminated string', lambda size: '"' + '#' * size),
+    ('block openers', lambda size: '### ' * (size // 4)),
+    ('strings and comments', lambda size: '"#"# \'\n' * (size // 6)),
+])
+def test_benchmark_story_clean_source(name, make):
+    """
+    Ensures that removing comments scales linearly with the size of
+    adversarial sources.
+    """
+    timings = {}
+    for size in (megabyte, 4 * megabyte):
+        timings[size] = measure(Story.clean_source, make(size), runs=1)
+        print('{} {}MB: {:.4f}s'.format(name, size // megabyte,
+                                        timings[size]))
+    assert timings[4 * megabyte] / timings[megabyte] < 4 * 3
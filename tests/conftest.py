@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import os
+
+from pytest import fixture
+
+
+collect_ignore = []
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmarks', action='store_true',
+                     help='Runs the timing benchmarks with the other tests')
+
+
+def pytest_configure(config):
+    """
+    Skips the benchmarks unless asked for with --benchmarks or by path, as
+    their timings are not reliable on a loaded machine.
+    """
+    if not config.getoption('benchmarks'):
+        collect_ignore.append('benchmarks')
+
+
+@fixture(scope='session', autouse=True)
+def cache_directory(tmpdir_factory):
+    """
+    Keeps the parse tables built by the tests in a temporary directory,
+    instead of the user cache directory.
+    """
+    directory = str(tmpdir_factory.mktemp('cache'))
+    previous = os.environ.get('STORYSCRIPT_CACHE_DIR')
+    os.environ['STORYSCRIPT_CACHE_DIR'] = directory
+    yield directory
+    if previous is None:
+        del os.environ['STORYSCRIPT_CACHE_DIR']
+    else:
+        os.environ['STORYSCRIPT_CACHE_DIR'] = previous
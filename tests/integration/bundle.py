@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+
+from pytest import fixture, raises
+
+from storyscript.buildcache import BuildCache
+from storyscript.bundle import Bundle
+from storyscript.exceptions import StoryError
+
+
+@fixture
+def stories(tmpdir):
+    tmpdir.join('a.story').write('import "c" as C\nx = 1\nalpine echo\n')
+    tmpdir.join('b.story').write('import "c" as C\nhttp get url:"x"\n')
+    tmpdir.join('c.story').write('import "d" as D\ny = [1, 2]\n')
+    tmpdir.join('d.story').write('twitter tweet message:"hi"\n')
+    return tmpdir
+
+
+def test_bundle_parallel(stories):
+    """
+    Ensures that compiling in parallel gives the same output as compiling
+    sequentially
+    """
+    with stories.as_cwd():
+        sequential = Bundle('a.story').bundle()
+        parallel = Bundle('a.story').bundle(workers=2)
+    assert json.dumps(parallel) == json.dumps(sequential)
+    assert list(parallel['stories']) == ['d.story', 'c.story', 'a.story']
+
+
+def test_bundle_parallel_cache(stories):
+    """
+    Ensures that the stories compiled by the workers are saved to the cache
+    """
+    cache = BuildCache(directory=None, size=8)
+    with stories.as_cwd():
+        result = Bundle('a.story', cache=cache).bundle(workers=2)
+        assert len(cache.entries) == 3
+        cached = Bundle('a.story', cache=cache).bundle(workers=2)
+    assert json.dumps(cached) == json.dumps(result)
+
+
+def test_bundle_import_cycle(tmpdir, capsys):
+    tmpdir.join('a.story').write('import "b" as B\nx = 1\n')
+    tmpdir.join('b.story').write('import "a" as A\ny = 1\n')
+    with tmpdir.as_cwd():
+        with raises(SystemExit):
+            Bundle('a.story').bundle()
+        with raises(StoryError) as e:
+            Bundle('a.story').bundle(debug=True)
+    message = ('Failed reading story because of unexpected "a.story -> '
+               'b.story -> a.story". Reason: Modules can\'t import each other '
+               'in a cycle')
+    assert capsys.readouterr().out == message + '\n'
+    assert e.value.message() == message
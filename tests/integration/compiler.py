@@ -104,6 +104,18 @@ def test_compiler_set(parser):
     assert result['tree']['1']['args'] == [0]
 
 
+def test_compiler_set_string_segments(parser):
+    """
+    Ensures that strings with values are compiled with their segments
+    """
+    tree = parser.parse('a = "hi {name}, {count} } new"')
+    result = Compiler.compile(tree, segments=True)
+    name = {'$OBJECT': 'path', 'paths': ['name']}
+    count = {'$OBJECT': 'path', 'paths': ['count']}
+    segments = ['hi ', name, ', ', count, ' } new']
+    assert result['tree']['1']['args'][0]['segments'] == segments
+
+
 def test_compiler_set_list(parser):
     """
     Ensures that assignments to lists are compiled correctly
@@ -285,3 +297,41 @@ def test_compiler_try_finally(parser):
     assert result['tree']['3']['method'] == 'finally'
     assert result['tree']['3']['enter'] == '4'
     assert result['tree']['4']['parent'] == '3'
+
+
+def test_compiler_inline_expression(parser):
+    """
+    Ensures that inline expressions are compiled to fake assignments with
+    fake lines before the original line
+    """
+    tree = parser.parse('x = 1\nalpine echo text:(random value)')
+    result = Compiler.compile(tree)
+    fake = result['tree']['1.1']
+    assert fake['service'] == 'random'
+    assert fake['next'] == '2'
+    assert result['tree']['1']['next'] == '1.1'
+    path = {'$OBJECT': 'path', 'paths': fake['name']}
+    assert result['tree']['2']['args'][0]['argument'] == path
+
+
+def test_compiler_inline_expression_nested(parser):
+    """
+    Ensures that nested inline expressions are compiled in order
+    """
+    source = 'alpine echo text:(random value:(uuid generate))'
+    result = Compiler.compile(parser.parse(source))
+    assert list(result['tree']) == ['0.1', '0.2', '1']
+    assert result['tree']['0.1']['service'] == 'uuid'
+    assert result['tree']['0.2']['service'] == 'random'
+    argument = result['tree']['0.2']['args'][0]['argument']
+    assert argument['paths'] == result['tree']['0.1']['name']
+
+
+def test_compiler_deterministic(parser):
+    """
+    Ensures that compiling the same story always gives the same result
+    """
+    source = 'a = alpine echo text:(random value)\nb = (alpine echo)'
+    first = Compiler.compile(parser.parse(source))
+    second = Compiler.compile(parser.parse(source))
+    assert first == second
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from pytest import mark, raises
+
+from storyscript.api import Api
+from storyscript.document import Document
+
+
+story = ('a = 1\n'
+         'if a > 1\n'
+         '    b = "x"\n'
+         'else\n'
+         '    alpine echo text:(uuid generate)\n'
+         'c = a\n'
+         'a echo\n'
+         'alpine echo\n'
+         'text:"hi"\n'
+         'function f n:int returns int\n'
+         '    return n\n')
+
+
+def edited(source, start, end, text):
+    """
+    Applies an edit to a source, as Document.edit does
+    """
+    lines = source.split('\n')
+    begin = sum(len(line) + 1 for line in lines[:start[0] - 1]) + start[1] - 1
+    finish = sum(len(line) + 1 for line in lines[:end[0] - 1]) + end[1] - 1
+    return source[:begin] + text + source[finish:]
+
+
+def test_document():
+    assert Document(story).compiled == Api.loads(story)
+
+
+@mark.parametrize('start, end, text', [
+    ((1, 5), (1, 6), '2'),
+    ((3, 5), (3, 6), 'd'),
+    ((1, 1), (1, 1), 'z = 0\n'),
+    ((1, 1), (1, 1), 'alpine echo\n'),
+    ((2, 1), (2, 1), 'c = 1\n'),
+    ((3, 1), (3, 1), '    alpine echo\n'),
+    ((4, 1), (6, 1), ''),
+    ((6, 1), (6, 1), '\n\n'),
+    ((6, 5), (6, 6), '"c"'),
+    ((6, 1), (6, 6), 'c = /a/'),
+    ((7, 1), (7, 2), 'alpine'),
+    ((8, 1), (8, 1), 'a = 2\n'),
+    ((9, 1), (9, 1), 'text:"a"\n'),
+    ((10, 1), (10, 1), 'import "m" as m\n'),
+    ((11, 13), (11, 13), '\n'),
+])
+def test_document_edit(start, end, text):
+    """
+    Ensures that an edited document compiles like the edited story
+    """
+    document = Document(story)
+    result = document.edit(start, end, text)
+    assert result == Api.loads(edited(story, start, end, text))
+
+
+def test_document_edits():
+    """
+    Ensures that successive edits are applied to the edited document
+    """
+    document = Document(story)
+    source = story
+    edits = [((1, 1), (1, 2), 'd'), ((6, 5), (6, 6), 'd'),
+             ((7, 1), (7, 2), 'd'), ((3, 1), (3, 1), '    e = 2\n')]
+    for start, end, text in edits:
+        source = edited(source, start, end, text)
+        assert document.edit(start, end, text) == Api.loads(source)
+
+
+def test_document_edit_string():
+    """
+    Ensures that a string running to a later line takes the lines after it
+    """
+    document = Document(story)
+    source = edited(story, (6, 5), (6, 6), '"c\nd"')
+    assert document.edit((6, 5), (6, 6), '"c\nd"') == Api.loads(source)
+
+
+def test_document_edit_error():
+    """
+    Ensures that a document with an error can be edited again
+    """
+    document = Document(story)
+    with raises(SystemExit):
+        document.edit((2, 1), (2, 1), '    ')
+    assert document.edit((2, 1), (2, 5), '') == Api.loads(story)
+
+
+def test_document_compiled():
+    """
+    Ensures that stories compiled before are not changed by edits
+    """
+    document = Document(story)
+    compiled = Api.loads(story)
+    result = document.compiled
+    document.edit((1, 1), (1, 1), '\n')
+    document.edit((11, 1), (11, 1), 'd = 1\n')
+    assert result == compiled
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
+import io
+
+from lark.exceptions import UnexpectedToken
 from lark.lexer import Token
 from lark.tree import Tree
 
-from pytest import fixture, mark
+from pytest import fixture, mark, raises
 
+from storyscript.exceptions import StoryError
 from storyscript.parser import Parser
+from storyscript.story import Story
 
 
 @fixture
@@ -220,3 +225,92 @@ def test_parser_try_finally(parser):
     assert finally_block.finally_statement.child(0) == token
     path = finally_block.nested_block.block.rules.assignment.path
     assert path.child(0) == Token('NAME', 'x')
+
+
+def test_parser_lark_cached(parser):
+    """
+    Ensures that parsers share the same Lark instance for the same grammar
+    """
+    assert parser.lark() is Parser().lark()
+
+
+def test_parser_after_error(parser):
+    """
+    Ensures that a failed parse doesn't break the following ones, as they
+    share the same Lark instance
+    """
+    with raises(UnexpectedToken):
+        parser.parse('if a\n    x = 1 +\n', debug=True)
+    assert parser.parse('a = 1', debug=True)
+
+
+def test_parser_positions(parser):
+    """
+    Ensures trees have the positions of their first and last tokens
+    """
+    result = parser.parse('x = 1\nalpine echo\n')
+    assert result.position == (1, 1, 2, 12)
+    assert result.node('block.rules.assignment').position == (1, 1, 1, 6)
+
+
+def test_parser_embedded_transformer():
+    """
+    Ensures the tree is the same whether the transformer is embedded or not
+    """
+    source = 'x = 1\nif x\n    alpine echo text:(random value)\n'
+    expected = Parser(embed_transformer=False).parse(source)
+    assert Parser().parse(source) == expected
+
+
+def test_parser_embedded_transformer_assignment_error():
+    with raises(StoryError):
+        Parser().parse('a-b = 1')
+
+
+@mark.parametrize('chunk_size', [1, 10, 65536])
+def test_parser_iter_tokens(parser, chunk_size):
+    """
+    Ensures streaming tokens finds the same tokens as lexing, at the same
+    positions.
+    """
+    source = ("x = 'multi\nline'\nif x\n    y = 1\n\n\n    z = 2\n"
+              'a = "b"\n')
+    attributes = ('type', 'value', 'line', 'column', 'end_line',
+                  'end_column', 'pos_in_stream')
+    expected = [[getattr(token, name) for name in attributes]
+                for token in list(parser.lex(source))]
+    tokens = parser.iter_tokens(io.StringIO(source), chunk_size=chunk_size)
+    result = [[getattr(token, name) for name in attributes]
+              for token in tokens]
+    assert result == expected
+
+
+@mark.parametrize('chunk_size', [1, 65536])
+def test_parser_iter_tokens_comments(parser, chunk_size):
+    """
+    Ensures comments are removed from streamed stories
+    """
+    source = ("# title\nx = 'a # b' # note\n###\nblock\n###\n"
+              'if x # check\n    y = "#" ### c ###\n')
+    expected = [(token.type, token.value, token.line)
+                for token in parser.iter_tokens(Story.clean_source(source))]
+    tokens = parser.iter_tokens(io.StringIO(source), chunk_size=chunk_size)
+    result = [(token.type, token.value, token.line) for token in tokens]
+    assert result == expected
+    assert ('SINGLE_QUOTED', "'a # b'", 2) in result
+    assert ('DOUBLE_QUOTED', '"#"', 7) in result
+
+
+def test_parser_invalidate_edited(tmpdir):
+    """
+    Ensures that invalidating a parser after editing its grammar file uses
+    the edited grammar
+    """
+    ebnf = tmpdir.join('grammar.ebnf')
+    ebnf.write(Parser().grammar())
+    parser = Parser(ebnf_file=str(ebnf))
+    lark = parser.lark()
+    ebnf.write('{}\n// edited\n'.format(Parser().grammar()))
+    parser.invalidate()
+    assert parser.lark() is not lark
+    assert parser.key == parser.cache_key(ebnf.read())
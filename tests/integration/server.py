@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+import socket
+import threading
+
+from pytest import fixture, raises
+
+from storyscript.app import App
+from storyscript.client import Client
+from storyscript.parser import Parser
+from storyscript.server import Handler, Server
+from storyscript.version import version
+
+
+@fixture
+def server(tmpdir):
+    server = Server(str(tmpdir.join('storyscript.sock')))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_server_compile(server, tmpdir):
+    """
+    Ensures the server compiles as the compile command would
+    """
+    story = tmpdir.join('hello.story')
+    story.write('a = 1\nalpine echo text:"hello"\n')
+    result = Client(server.path).compile(str(story))
+    assert json.loads(result) == json.loads(App.compile(str(story)))
+    assert Client(server.path).compile(str(story)) == result
+
+
+def test_server_compile_error(server, tmpdir, capsys):
+    story = tmpdir.join('error.story')
+    story.write('a = \n')
+    with raises(SystemExit):
+        Client(server.path).compile(str(story))
+    assert 'Failed reading story' in capsys.readouterr().out
+
+
+def test_server_silent_client(monkeypatch, server):
+    """
+    Ensures a client that sends no request doesn't block the server
+    """
+    monkeypatch.setattr(Handler, 'timeout', 0.1)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as silent:
+        silent.connect(server.path)
+        assert Client(server.path).request('ping')['result'] == version
+
+
+def test_server_not_answering(monkeypatch, tmpdir):
+    """
+    Ensures clients give up on a server that doesn't answer
+    """
+    monkeypatch.setattr(Client, 'timeout', 0.1)
+    path = str(tmpdir.join('silent.sock'))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(path)
+        listener.listen(1)
+        assert Client(path).request('ping') is None
+
+
+def test_server_no_server(tmpdir):
+    assert Client(str(tmpdir.join('missing.sock'))).compile('path') is None
+
+
+def test_server_compile_ebnf_files(server, tmpdir):
+    """
+    Ensures stories are compiled again with grammar files of the same name
+    in other directories, or edited since
+    """
+    grammar = Parser().grammar()
+    for name in ('one', 'two'):
+        project = tmpdir.mkdir(name)
+        project.join('a.story').write('a = 1\n')
+        project.join('g.ebnf').write('{}\n// {}\n'.format(grammar, name))
+        with project.as_cwd():
+            Client(server.path).compile('a.story', ebnf_file='g.ebnf')
+    assert len(server.memory.entries) == 2
+    ebnf = tmpdir.join('two', 'g.ebnf')
+    ebnf.write('{}\n// edited\n'.format(grammar))
+    with tmpdir.join('two').as_cwd():
+        Client(server.path).compile('a.story', ebnf_file='g.ebnf')
+    assert len(server.memory.entries) == 3
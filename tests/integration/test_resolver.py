@@ -2,13 +2,17 @@ import re
 
 import pytest
 
+from storyscript.api import Api
 from storyscript.resolver import Resolver
 
 
 @pytest.mark.parametrize('path,data,result', [
     (['a', 'b', 'c'], {'a': {'b': {'c': 1}}}, 1),
     (['a'], {'a': {'b': {}}}, {'b': {}}),
-    (['a', '1', 'b'], {'a': [None, {'b': 1}]}, 1)
+    (['a', '1', 'b'], {'a': [None, {'b': 1}]}, 1),
+    (['a', {'$OBJECT': 'path', 'paths': ['b', 'c']}],
+     {'a': {'d': 1}, 'b': {'c': 'd'}}, 1),
+    (['a', {'$OBJECT': 'string', 'string': 'b'}], {'a': {'b': 1}}, 1)
 ])
 def test_resolve_path(path, data, result):
     assert Resolver.path(path, data) == result
@@ -49,8 +53,23 @@ def test_resolve_obj_regexp():
     assert result.pattern == 'abc'
 
 
+@pytest.mark.parametrize('item, left, result', [
+    ({'$OBJECT': 'regexp', 'regexp': '/ab+c/'}, 'abbc', True),
+    ({'$OBJECT': 'regexp', 'regexp': '/abc/'}, 'ABC', False),
+    ({'$OBJECT': 'regexp', 'regexp': '/abc/', 'flags': 'ig'}, 'ABC', True),
+    ({'$OBJECT': 'regexp', 'regexp': '/a.b/'}, 'a\nb', False),
+    ({'$OBJECT': 'regexp', 'regexp': '/a.b/', 'flags': 's'}, 'a\nb', True),
+])
+def test_resolve_regexp_like(item, left, result):
+    regexp = Resolver.object(item, None)
+    assert Resolver.method('like', left, regexp) is result
+    assert Resolver.method('notlike', left, regexp) is not result
+
+
 @pytest.mark.parametrize('method, left, right, result', [
     ('like', 'abc', re.compile('^abc'), True),
+    ('like', 'abc', '/^a/', True),
+    ('notlike', 'abc', '/^b/', True),
     ('has', {'b': 1}, 'b', True),
     ('contains', {'b': 1}, 'b', True),
     ('contains', {}, 'c', False),
@@ -96,3 +115,20 @@ def test_resolve_dict(dictionary, data, result):
 ])
 def test_stringify(value, result):
     assert Resolver.stringify(value) == result
+
+
+@pytest.mark.parametrize('story, result', [
+    ('a = "hi {name}"', 'hi world'),
+    ('a = "{name}{count}"', 'world2'),
+    ('a = "{count} } {name}"', '2 } world'),
+    ('a = "{name} {"', 'world {'),
+])
+def test_resolve_string_segments(story, result):
+    """
+    Ensures strings resolve the same with and without segments
+    """
+    data = {'name': 'world', 'count': 2}
+    item = Api.loads(story)['tree']['1']['args'][0]
+    assert Resolver.resolve(item, data) == result
+    item = Api.loads(story, segments=True)['tree']['1']['args'][0]
+    assert Resolver.resolve(item, data) == result
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from storyscript.api import Api
+from storyscript.document import Document
 from storyscript.story import Story
 
 
@@ -8,9 +9,17 @@ def test_api_loads(patch):
     patch.object(Story, 'process')
     result = Api.loads('string')
     Story.__init__.assert_called_with('string')
+    Story.process.assert_called_with(segments=False)
     assert result == Story.process()
 
 
+def test_api_loads_segments(patch):
+    patch.init(Story)
+    patch.object(Story, 'process')
+    Api.loads('string', segments=True)
+    Story.process.assert_called_with(segments=True)
+
+
 def test_api_load(patch, magic):
     patch.object(Story, 'from_stream')
     stream = magic()
@@ -18,3 +27,10 @@ def test_api_load(patch, magic):
     Story.from_stream.assert_called_with(stream)
     story = Story.from_stream().process()
     assert result == {stream.name: story, 'services': story['services']}
+
+
+def test_api_document(patch):
+    patch.init(Document)
+    result = Api.document('string')
+    Document.__init__.assert_called_with('string')
+    assert isinstance(result, Document)
@@ -3,6 +3,7 @@ import json
 import os
 
 from storyscript.app import App
+from storyscript.buildcache import BuildCache
 from storyscript.bundle import Bundle
 from storyscript.parser import Grammar
 from storyscript.story import Story
@@ -13,8 +14,9 @@ def test_app_compile(patch):
     patch.init(Bundle)
     patch.object(Bundle, 'bundle')
     result = App.compile('path')
-    Bundle.__init__.assert_called_with('path')
-    Bundle.bundle.assert_called_with(ebnf_file=None, debug=False)
+    Bundle.__init__.assert_called_with('path', cache=None)
+    Bundle.bundle.assert_called_with(ebnf_file=None, debug=False,
+                                     workers=None)
     json.dumps.assert_called_with(Bundle.bundle(), indent=2)
     assert result == json.dumps()
 
@@ -24,7 +26,8 @@ def test_app_compile_ebnf_file(patch):
     patch.init(Bundle)
     patch.object(Bundle, 'bundle')
     App.compile('path', ebnf_file='ebnf')
-    Bundle.bundle.assert_called_with(ebnf_file='ebnf', debug=False)
+    Bundle.bundle.assert_called_with(ebnf_file='ebnf', debug=False,
+                                     workers=None)
 
 
 def test_app_compile_debug(patch):
@@ -32,16 +35,48 @@ def test_app_compile_debug(patch):
     patch.init(Bundle)
     patch.object(Bundle, 'bundle')
     App.compile('path', debug='debug')
-    Bundle.bundle.assert_called_with(ebnf_file=None, debug='debug')
+    Bundle.bundle.assert_called_with(ebnf_file=None, debug='debug',
+                                     workers=None)
+
+
+def test_app_compile_workers(patch):
+    patch.object(json, 'dumps')
+    patch.init(Bundle)
+    patch.object(Bundle, 'bundle')
+    App.compile('path', workers=4)
+    Bundle.bundle.assert_called_with(ebnf_file=None, debug=False, workers=4)
+
+
+def test_app_compile_cache(patch):
+    patch.object(json, 'dumps')
+    patch.init(Bundle)
+    patch.init(BuildCache)
+    patch.object(Bundle, 'bundle')
+    App.compile('path', cache=True)
+    BuildCache.__init__.assert_called_with()
+    cache = Bundle.__init__.call_args[1]['cache']
+    assert isinstance(cache, BuildCache)
+
+
+def test_app_compile_build_cache(patch):
+    """
+    Ensures a given build cache is used
+    """
+    patch.object(json, 'dumps')
+    patch.init(Bundle)
+    patch.object(Bundle, 'bundle')
+    cache = BuildCache(directory=None)
+    App.compile('path', cache=cache)
+    Bundle.__init__.assert_called_with('path', cache=cache)
 
 
 def test_app_lexer(patch):
-    patch.object(Story, 'from_file')
+    patch.object(Story, 'lex_file')
     patch.init(Bundle)
     patch.object(Bundle, 'find_stories', return_value=['one.story'])
     result = App.lex('/path')
-    Story.from_file.assert_called_with('one.story')
-    assert result == {'one.story': Story.from_file().lex()}
+    Story.lex_file.assert_called_with('one.story')
+    assert result == {'one.story': Story.lex_file()}
 
 
 def test_app_grammar(patch):
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import json
+import os
+
+from pytest import fixture
+
+from storyscript.buildcache import BuildCache
+from storyscript.parser import Parser
+from storyscript.version import version
+
+
+@fixture
+def cache():
+    return BuildCache(directory='cache')
+
+
+def test_buildcache_init():
+    cache = BuildCache()
+    assert cache.directory == '.storyscript_cache'
+    assert cache.size == 0
+    assert cache.entries == {}
+    assert cache.grammars == {}
+
+
+def test_buildcache_keep():
+    cache = BuildCache(size=2)
+    cache.keep('a', 1)
+    cache.keep('b', 2)
+    cache.keep('a', 3)
+    assert cache.entries == {'a': 3, 'b': 2}
+
+
+def test_buildcache_keep_full():
+    """
+    Ensures the oldest entry is dropped when the memory is full
+    """
+    cache = BuildCache(size=2)
+    for key in 'abc':
+        cache.keep(key, key)
+    assert cache.entries == {'b': 'b', 'c': 'c'}
+
+
+def test_buildcache_keep_no_size(cache):
+    cache.keep('key', 'entry')
+    assert cache.entries == {}
+
+
+def test_buildcache_grammar_key(patch, magic):
+    patch.object(os, 'stat', return_value=magic(st_mtime_ns=1, st_size=2))
+    patch.object(os.path, 'abspath')
+    result = BuildCache.grammar_key('ebnf')
+    os.stat.assert_called_with('ebnf')
+    os.path.abspath.assert_called_with('ebnf')
+    assert result == (os.path.abspath(), 1, 2)
+
+
+def test_buildcache_grammar_key_none():
+    assert BuildCache.grammar_key(None) is None
+
+
+def test_buildcache_grammar_hash(patch, cache):
+    patch.init(Parser)
+    patch.many(Parser, ['grammar', 'hash_grammar'])
+    patch.object(BuildCache, 'grammar_key', return_value='key')
+    result = cache.grammar_hash('ebnf')
+    BuildCache.grammar_key.assert_called_with('ebnf')
+    Parser.__init__.assert_called_with(ebnf_file='ebnf')
+    Parser.hash_grammar.assert_called_with(Parser.grammar())
+    assert result == Parser.hash_grammar()
+    assert cache.grammars['key'] == result
+
+
+def test_buildcache_grammar_hash_cached(cache):
+    cache.grammars[None] = 'hash'
+    assert cache.grammar_hash(None) == 'hash'
+
+
+def test_buildcache_key(patch, cache):
+    patch.object(BuildCache, 'grammar_hash', return_value='hash')
+    result = cache.key('source', 'ebnf')
+    BuildCache.grammar_hash.assert_called_with('ebnf')
+    string = '{}:hash:source'.format(version)
+    assert result == hashlib.sha256(string.encode('utf-8')).hexdigest()
+
+
+def test_buildcache_key_changes(cache):
+    assert cache.key('a = 1') != cache.key('a = 2')
+
+
+def test_buildcache_path(cache):
+    assert cache.path('key') == 'cache/key.json'
+
+
+def test_buildcache_load(patch, cache):
+    patch.object(io, 'open')
+    patch.object(json, 'load')
+    result = cache.load('key')
+    io.open.assert_called_with('cache/key.json', 'r')
+    json.load.assert_called_with(io.open().__enter__())
+    assert result == json.load()
+
+
+def test_buildcache_load_missing(cache):
+    assert cache.load('missing') is None
+
+
+def test_buildcache_load_memory(patch, cache):
+    patch.object(io, 'open')
+    cache.entries['key'] = 'entry'
+    assert cache.load('key') == 'entry'
+    assert io.open.call_count == 0
+
+
+def test_buildcache_load_keep(patch, cache):
+    patch.many(json, ['load'])
+    patch.object(io, 'open')
+    patch.object(BuildCache, 'keep')
+    cache.load('key')
+    BuildCache.keep.assert_called_with('key', json.load())
+
+
+def test_buildcache_memory():
+    """
+    Ensures entries are kept only in memory without a directory
+    """
+    cache = BuildCache(directory=None, size=1)
+    cache.save('key', 'entry')
+    assert cache.load('key') == 'entry'
+    assert cache.load('missing') is None
+
+
+def test_buildcache_save_load(tmpdir):
+    cache = BuildCache(directory=str(tmpdir.join('cache')))
+    cache.save('key', {'modules': [], 'compiled': {'tree': {}}})
+    assert cache.load('key') == {'modules': [], 'compiled': {'tree': {}}}
+
+
+def test_buildcache_save_error(patch, tmpdir):
+    patch.object(json, 'dump', side_effect=OSError)
+    cache = BuildCache(directory=str(tmpdir))
+    cache.save('key', {})
+    assert tmpdir.listdir() == []
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
 
-from pytest import fixture
+from pytest import fixture, raises
 
+from storyscript import bundle as bundle_module
 from storyscript.bundle import Bundle
+from storyscript.exceptions import StoryError
 from storyscript.story import Story
 
 
@@ -14,9 +16,14 @@ def bundle():
 
 def test_bundle_init(bundle):
     assert bundle.path == 'path'
+    assert bundle.cache is None
     assert bundle.stories == {}
 
 
+def test_bundle_init_cache():
+    assert Bundle('path', cache='cache').cache == 'cache'
+
+
 def test_bundle_find_stories(patch, bundle):
     """
     Ensures Bundle.find_stories returns the original path if it's not a
@@ -47,22 +54,167 @@ def test_bundle_services_no_duplicates(bundle):
     assert result == ['one']
 
 
-def test_bundle_compile_modules(patch, bundle):
-    patch.object(Bundle, 'compile')
-    bundle.compile_modules(['stories'], 'ebnf', 'debug')
-    Bundle.compile.assert_called_with(['stories'], 'ebnf', 'debug')
+def test_build(magic):
+    story = magic()
+    result = bundle_module.build(story, 'ebnf', False)
+    story.parse.assert_called_with(ebnf_file='ebnf', debug=False)
+    story.compile.assert_called_with(debug=False)
+    assert result == (story.modules(), story.compiled)
+
+
+def test_bundle_load(magic, bundle):
+    story = magic()
+    bundle.cache = magic()
+    bundle.cache.load.return_value = {'modules': 'm', 'compiled': 'c'}
+    result = bundle.load(story, 'ebnf')
+    bundle.cache.key.assert_called_with(story.story, 'ebnf')
+    bundle.cache.load.assert_called_with(bundle.cache.key())
+    assert result == ('m', 'c')
+
+
+def test_bundle_load_missing(magic, bundle):
+    bundle.cache = magic()
+    bundle.cache.load.return_value = None
+    assert bundle.load(magic(), 'ebnf') is None
+
+
+def test_bundle_load_no_cache(magic, bundle):
+    assert bundle.load(magic(), 'ebnf') is None
+
+
+def test_bundle_save(magic, bundle):
+    story = magic()
+    bundle.cache = magic()
+    bundle.save(story, 'ebnf', ('m', 'c'))
+    bundle.cache.key.assert_called_with(story.story, 'ebnf')
+    entry = {'modules': 'm', 'compiled': 'c'}
+    bundle.cache.save.assert_called_with(bundle.cache.key(), entry)
+
+
+def test_bundle_save_no_cache(magic, bundle):
+    bundle.save(magic(), 'ebnf', ('m', 'c'))
+
+
+def test_bundle_compile_story(patch, bundle):
+    patch.many(Bundle, ['load', 'save'])
+    patch.object(bundle_module, 'build')
+    Bundle.load.return_value = None
+    result = bundle.compile_story('story', 'ebnf', False)
+    Bundle.load.assert_called_with('story', 'ebnf')
+    bundle_module.build.assert_called_with('story', 'ebnf', False)
+    Bundle.save.assert_called_with('story', 'ebnf', bundle_module.build())
+    assert result == bundle_module.build()
+
+
+def test_bundle_compile_story_cached(patch, bundle):
+    patch.many(Bundle, ['load', 'save'])
+    patch.object(bundle_module, 'build')
+    result = bundle.compile_story('story', 'ebnf', False)
+    assert bundle_module.build.call_count == 0
+    assert result == Bundle.load()
 
 
 def test_bundle_compile(patch, bundle):
-    patch.object(Story, 'from_file')
-    patch.object(Bundle, 'compile_modules')
+    results = {'one.story': (['two.story'], 'one'), 'two.story': ([], 'two')}
+    patch.object(Bundle, 'compile_file', side_effect=lambda path, *args:
+                 results[path])
+    patch.object(Bundle, 'collect')
     bundle.compile(['one.story'], None, False)
+    Bundle.compile_file.assert_called_with('two.story', None, False)
+    Bundle.collect.assert_called_with(['one.story'], results, False)
+
+
+def test_bundle_compile_once(patch, bundle):
+    """
+    Ensures a module imported by many stories is compiled only once
+    """
+    results = {'one.story': (['three.story'], 'one'),
+               'two.story': (['three.story'], 'two'),
+               'three.story': ([], 'three')}
+    patch.object(Bundle, 'compile_file', side_effect=lambda path, *args:
+                 results[path])
+    patch.object(Bundle, 'collect')
+    bundle.compile(['one.story', 'two.story'], None, False)
+    assert Bundle.compile_file.call_count == 3
+
+
+def test_bundle_compile_file(patch, bundle):
+    patch.object(Story, 'from_file')
+    patch.object(Bundle, 'compile_story')
+    result = bundle.compile_file('one.story', 'ebnf', False)
     Story.from_file.assert_called_with('one.story')
-    story = Story.from_file()
-    story.parse.assert_called_with(ebnf_file=None, debug=False)
-    Bundle.compile_modules.assert_called_with(story.modules(), None, False)
-    story.compile.assert_called_with(debug=False)
-    assert bundle.stories['one.story'] == story.compiled
+    Bundle.compile_story.assert_called_with(Story.from_file(), 'ebnf', False)
+    assert result == Bundle.compile_story()
+
+
+def test_bundle_collect(bundle):
+    results = {'one.story': (['two.story'], 'one'), 'two.story': ([], 'two')}
+    bundle.collect(['one.story'], results, False)
+    assert list(bundle.stories.items()) == [('two.story', 'two'),
+                                            ('one.story', 'one')]
+
+
+def test_bundle_collect_once(bundle):
+    results = {'one.story': (['three.story'], 'one'),
+               'two.story': (['three.story'], 'two'),
+               'three.story': ([], 'three')}
+    bundle.collect(['one.story', 'two.story'], results, False)
+    assert list(bundle.stories) == ['three.story', 'one.story', 'two.story']
+
+
+def test_bundle_collect_cycle(bundle):
+    results = {'one.story': (['two.story'], 'one'),
+               'two.story': (['one.story'], 'two')}
+    with raises(StoryError) as e:
+        bundle.collect(['one.story'], results, True)
+    assert e.value.error_type == 'module-cycle'
+    assert e.value.item == {'value': 'one.story -> two.story -> one.story'}
+
+
+def test_bundle_collect_cycle_exit(capsys, bundle):
+    """
+    Ensures import cycles are reported like other story errors
+    """
+    results = {'one.story': (['one.story'], 'one')}
+    with raises(SystemExit):
+        bundle.collect(['one.story'], results, False)
+    assert 'in a cycle' in capsys.readouterr().out
+
+
+def test_bundle_compile_parallel(patch, magic, bundle):
+    executor = magic()
+    results = {'one.story': (['two.story'], 'one'), 'two.story': ([], 'two')}
+    executor.submit.side_effect = lambda f, story, *args: magic(
+        result=magic(return_value=results[story]))
+    patch.object(bundle_module, 'ProcessPoolExecutor')
+    bundle_module.ProcessPoolExecutor().__enter__.return_value = executor
+    patch.object(Story, 'from_file', side_effect=lambda path: path)
+    patch.many(Bundle, ['collect', 'save'])
+    patch.object(Bundle, 'load', return_value=None)
+    bundle.compile_parallel(['one.story'], 'ebnf', False, 2)
+    bundle_module.ProcessPoolExecutor.assert_called_with(max_workers=2)
+    executor.submit.assert_called_with(bundle_module.build, 'two.story',
+                                       'ebnf', False)
+    Bundle.save.assert_called_with('two.story', 'ebnf', ([], 'two'))
+    Bundle.collect.assert_called_with(['one.story'], results, False)
+
+
+def test_bundle_compile_parallel_cached(patch, magic, bundle):
+    """
+    Ensures cached stories are not sent to the workers
+    """
+    executor = magic()
+    patch.object(bundle_module, 'ProcessPoolExecutor')
+    bundle_module.ProcessPoolExecutor().__enter__.return_value = executor
+    patch.object(Story, 'from_file')
+    patch.many(Bundle, ['collect', 'save'])
+    patch.object(Bundle, 'load', return_value=([], 'one'))
+    bundle.compile_parallel(['one.story'], 'ebnf', False, 2)
+    assert executor.submit.call_count == 0
+    assert Bundle.save.call_count == 0
+    Bundle.collect.assert_called_with(['one.story'], {'one.story': ([],
+                                                                    'one')},
+                                      False)
 
 
 def test_bundle_bundle(patch, bundle):
@@ -80,6 +232,19 @@ def test_bundle_bundle_ebnf_file(patch, bundle):
     Bundle.compile.assert_called_with(Bundle.find_stories(), 'ebnf', False)
 
 
+def test_bundle_bundle_workers(patch, bundle):
+    patch.many(Bundle, ['find_stories', 'services', 'compile_parallel'])
+    bundle.bundle(workers=2)
+    Bundle.compile_parallel.assert_called_with(Bundle.find_stories(), None,
+                                               False, 2)
+
+
+def test_bundle_bundle_one_worker(patch, bundle):
+    patch.many(Bundle, ['find_stories', 'services', 'compile'])
+    bundle.bundle(workers=1)
+    Bundle.compile.assert_called_with(Bundle.find_stories(), None, False)
+
+
 def test_bundle_bundle_debug(patch, bundle):
     patch.many(Bundle, ['find_stories', 'services', 'compile'])
     bundle.bundle(debug=True)
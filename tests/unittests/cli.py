@@ -8,6 +8,9 @@ from pytest import fixture, mark
 
 from storyscript.app import App
 from storyscript.cli import Cli
+from storyscript.client import Client
+from storyscript.parser import Grammar
+from storyscript.server import Server
 from storyscript.version import version
 
 
@@ -48,7 +51,8 @@ def test_cli_compile(patch, runner, echo, app):
     """
     patch.object(click, 'style')
     runner.invoke(Cli.compile, ['/path'])
-    App.compile.assert_called_with('/path', ebnf_file=None, debug=False)
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                   cache=False, workers=1)
     click.style.assert_called_with('Script syntax passed!', fg='green')
     click.echo.assert_called_with(click.style())
 
@@ -58,7 +62,8 @@ def test_cli_compile_default_path(patch, runner, app):
     Ensures the compile command default path is the current working directory.
     """
     runner.invoke(Cli.compile, [])
-    App.compile.assert_called_with(os.getcwd(), ebnf_file=None, debug=False)
+    App.compile.assert_called_with(os.getcwd(), ebnf_file=None, debug=False,
+                                   cache=False, workers=1)
 
 
 def test_cli_compile_output_file(runner, app, tmpdir):
@@ -78,14 +83,16 @@ def test_cli_compile_silent(runner, echo, app, option):
     Ensures --silent makes everything quiet
     """
     result = runner.invoke(Cli.compile, ['/path', option])
-    App.compile.assert_called_with('/path', ebnf_file=None, debug=False)
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                   cache=False, workers=1)
     assert result.output == ''
     assert click.echo.call_count == 0
 
 
 def test_cli_compile_debug(runner, echo, app):
     runner.invoke(Cli.compile, ['/path', '--debug'])
-    App.compile.assert_called_with('/path', ebnf_file=None, debug=True)
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=True,
+                                   cache=False, workers=1)
 
 
 @mark.parametrize('option', ['--json', '-j'])
@@ -94,16 +101,73 @@ def test_cli_compile_json(runner, echo, app, option):
     Ensures --json outputs json
     """
     runner.invoke(Cli.compile, ['/path', option])
-    App.compile.assert_called_with('/path', ebnf_file=None, debug=False)
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                   cache=False, workers=1)
     click.echo.assert_called_with(App.compile())
 
 
 def test_cli_compile_ebnf_file(runner, echo, app):
     runner.invoke(Cli.compile, ['/path', '--ebnf-file', 'test.grammar'])
-    kwargs = {'ebnf_file': 'test.grammar', 'debug': False}
+    kwargs = {'ebnf_file': 'test.grammar', 'debug': False, 'cache': False,
+              'workers': 1}
     App.compile.assert_called_with('/path', **kwargs)
 
 
+def test_cli_compile_cache(runner, echo, app):
+    runner.invoke(Cli.compile, ['/path', '--cache'])
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                   cache=True, workers=1)
+
+
+def test_cli_compile_jobs(runner, echo, app):
+    runner.invoke(Cli.compile, ['/path', '--jobs', '4'])
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                   cache=False, workers=4)
+
+
+def test_cli_compile_server(patch, runner, echo, app):
+    """
+    Ensures --server compiles with the server
+    """
+    patch.init(Client)
+    patch.object(Client, 'compile')
+    runner.invoke(Cli.compile, ['/path', '--server', '-j'])
+    Client.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                      cache=False, workers=1)
+    assert App.compile.call_count == 0
+    click.echo.assert_called_with(Client.compile())
+
+
+def test_cli_compile_server_none(patch, runner, echo, app):
+    """
+    Ensures --server compiles on its own when no server is running
+    """
+    patch.object(Client, 'compile', return_value=None)
+    runner.invoke(Cli.compile, ['/path', '--server'])
+    App.compile.assert_called_with('/path', ebnf_file=None, debug=False,
+                                   cache=False, workers=1)
+
+
+def test_cli_serve(patch, runner, echo):
+    patch.init(Server)
+    patch.many(Server, ['serve_forever', 'server_close'])
+    patch.object(Server, 'path', 'path', create=True)
+    runner.invoke(Cli.serve, [])
+    click.echo.assert_called_with('Serving on path')
+    assert Server.serve_forever.call_count == 1
+    assert Server.server_close.call_count == 1
+
+
+def test_cli_serve_interrupt(patch, runner, echo):
+    patch.init(Server)
+    patch.many(Server, ['serve_forever', 'server_close'])
+    Server.serve_forever.side_effect = KeyboardInterrupt
+    patch.object(Server, 'path', 'path', create=True)
+    result = runner.invoke(Cli.serve, [])
+    assert result.exit_code == 0
+    assert Server.server_close.call_count == 1
+
+
 def test_cli_lexer(patch, magic, runner, app, echo):
     """
     Ensures the lex command outputs lexer tokens
@@ -125,11 +189,12 @@ def test_cli_lexer_default(patch, magic, runner, app):
     app.lex.assert_called_with(os.getcwd())
 
 
-def test_cli_grammar(patch, runner, app, echo):
-    patch.object(App, 'grammar')
+def test_cli_grammar(patch, runner, echo):
+    patch.init(Grammar)
+    patch.object(Grammar, 'build')
     runner.invoke(Cli.grammar, [])
-    assert app.grammar.call_count == 1
-    click.echo.assert_called_with(app.grammar())
+    assert Grammar.__init__.call_count == 1
+    click.echo.assert_called_with(Grammar().build())
 
 
 def test_cli_help(patch, runner, echo):
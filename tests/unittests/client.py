@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+
+from pytest import fixture, raises
+
+from storyscript.client import Client
+from storyscript.version import version
+
+
+@fixture
+def connection(patch):
+    patch.object(Client, 'owned', return_value=True)
+    patch.object(socket, 'socket')
+    connection = socket.socket()
+    connection.makefile().__enter__().readline.return_value = b'{"a": 1}\n'
+    return connection
+
+
+def test_client_init():
+    assert Client('path').path == 'path'
+
+
+def test_client_socket_path(patch):
+    patch.dict(os.environ, {'STORYSCRIPT_SOCKET': 'path'})
+    assert Client.socket_path() == 'path'
+
+
+def test_client_socket_path_runtime(patch):
+    patch.dict(os.environ, {'XDG_RUNTIME_DIR': 'run'})
+    os.environ.pop('STORYSCRIPT_SOCKET', None)
+    name = 'storyscript-{}.sock'.format(os.getuid())
+    assert Client.socket_path() == os.path.join('run', name)
+
+
+def test_client_owned(patch, magic):
+    patch.object(os, 'stat', return_value=magic(st_uid=os.getuid()))
+    assert Client.owned('path') is True
+    os.stat.assert_called_with('path')
+
+
+def test_client_owned_other_user(patch, magic):
+    patch.object(os, 'stat', return_value=magic(st_uid=os.getuid() + 1))
+    assert Client.owned('path') is False
+
+
+def test_client_owned_missing(patch):
+    patch.object(os, 'stat', side_effect=OSError)
+    assert Client.owned('path') is False
+
+
+def test_client_request(connection):
+    result = Client('path').request('method', {'param': 1})
+    socket.socket.assert_called_with(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout.assert_called_with(Client.timeout)
+    connection.connect.assert_called_with('path')
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': 'method',
+               'params': {'param': 1}}
+    message = json.dumps(request).encode('utf-8') + b'\n'
+    connection.sendall.assert_called_with(message)
+    assert result == {'a': 1}
+
+
+def test_client_request_default(patch, connection):
+    patch.object(Client, 'socket_path')
+    Client().request('method')
+    connection.connect.assert_called_with(Client.socket_path())
+
+
+def test_client_request_no_server(connection):
+    connection.connect.side_effect = OSError
+    assert Client('path').request('method') is None
+
+
+def test_client_request_not_owned(connection):
+    Client.owned.return_value = False
+    assert Client('path').request('method') is None
+    assert connection.connect.call_count == 0
+
+
+def test_client_request_timeout(connection):
+    connection.makefile().__enter__().readline.side_effect = socket.timeout
+    assert Client('path').request('method') is None
+
+
+def test_client_request_closed(connection):
+    connection.makefile().__enter__().readline.return_value = b''
+    assert Client('path').request('method') is None
+
+
+def test_client_compile(patch, capsys):
+    result = {'results': 'results', 'output': 'output', 'exited': False,
+              'code': None, 'error': None}
+    patch.object(Client, 'request', return_value={'result': result})
+    assert Client().compile('path', cache=True) == 'results'
+    params = {'cwd': os.getcwd(), 'path': 'path', 'ebnf_file': None,
+              'debug': False, 'cache': True, 'workers': None,
+              'version': version}
+    Client.request.assert_called_with('compile', params)
+    assert capsys.readouterr().out == 'output'
+
+
+def test_client_compile_no_server(patch):
+    patch.object(Client, 'request', return_value=None)
+    assert Client().compile('path') is None
+
+
+def test_client_compile_refused(patch):
+    patch.object(Client, 'request', return_value={'error': {}})
+    assert Client().compile('path') is None
+
+
+def test_client_compile_exit(patch):
+    result = {'results': None, 'output': '', 'exited': True, 'code': 2,
+              'error': None}
+    patch.object(Client, 'request', return_value={'result': result})
+    with raises(SystemExit) as e:
+        Client().compile('path')
+    assert e.value.code == 2
+
+
+def test_client_compile_error(patch, capsys):
+    result = {'results': None, 'output': '', 'exited': False, 'code': None,
+              'error': 'traceback'}
+    patch.object(Client, 'request', return_value={'result': result})
+    with raises(SystemExit) as e:
+        Client().compile('path')
+    assert e.value.code == 1
+    assert capsys.readouterr().err == 'traceback'
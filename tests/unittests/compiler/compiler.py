@@ -11,7 +11,9 @@ from storyscript.version import version
 
 @fixture
 def lines(magic):
-    return magic()
+    lines = magic()
+    lines.is_variable.return_value = False
+    return lines
 
 
 @fixture
@@ -154,9 +156,10 @@ def test_compiler_assignment_expression(patch, compiler, lines, tree):
     """
     patch.object(Objects, 'names', return_value='name')
     patch.object(Compiler, 'expression')
-    lines.variables = ['name']
+    lines.is_variable.return_value = True
     compiler.assignment(tree, '1')
     service = tree.assignment_fragment.service
+    lines.is_variable.assert_called_with('name')
     Compiler.expression.assert_called_with(service, '1')
     lines.set_name.assert_called_with(Objects.names())
 
@@ -241,9 +244,10 @@ def test_compiler_service_expressions(patch, compiler, lines, tree):
     """
     patch.object(Objects, 'names', return_value='x')
     patch.object(Compiler, 'expression')
-    lines.variables = ['x']
+    lines.is_variable.return_value = True
     compiler.service(tree, None, 'parent')
     Objects.names.assert_called_with(tree.path)
+    lines.is_variable.assert_called_with('x')
     Compiler.expression.assert_called_with(tree, 'parent')
 
 
@@ -504,6 +508,14 @@ def test_compiler_compile(patch):
     assert result == expected
 
 
+def test_compiler_compile_segments(patch):
+    patch.object(Preprocessor, 'process')
+    patch.object(Objects, 'segments')
+    patch.many(Compiler, ['parse_tree', 'compiler'])
+    Compiler.compile('tree', segments=True)
+    Objects.segments.assert_called_with(Compiler.compiler().lines.lines)
+
+
 def test_compiler_compile_debug(patch):
     patch.object(Preprocessor, 'process')
     patch.many(Compiler, ['parse_tree', 'compiler'])
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
-import random
-import uuid
+import hashlib
 
 from lark.lexer import Token
 
@@ -21,32 +20,36 @@ def test_faketree_init(block, fake_tree):
     assert fake_tree.new_lines == []
 
 
-def test_faketree_line(patch, fake_tree):
+def test_faketree_line(block):
     """
     Ensures FakeTree.line can create a fake line number
     """
-    patch.object(random, 'uniform')
+    block.line.return_value = '5'
+    fake_tree = FakeTree(block)
     result = fake_tree.line()
-    random.uniform.assert_called_with(0, 1)
-    assert fake_tree.new_lines == [random.uniform()]
-    assert result == str(random.uniform())
+    assert fake_tree.new_lines == ['4.1']
+    assert result == '4.1'
 
 
-def test_faketree_line_successive(patch, fake_tree):
+def test_faketree_line_successive(block):
     """
     Ensures FakeTree.line takes into account FakeTree.new_lines
     """
-    patch.object(random, 'uniform')
-    fake_tree.new_lines = [0.2]
-    fake_tree.line()
-    random.uniform.assert_called_with(0, 0.2)
+    block.line.return_value = '5'
+    fake_tree = FakeTree(block)
+    fake_tree.new_lines = ['4.{}'.format(i) for i in range(1, 10)]
+    assert fake_tree.line() == '4.10'
 
 
-def test_faketree_path(patch):
-    patch.object(uuid, 'uuid4')
-    result = FakeTree.path(1)
-    name = '${}'.format(uuid.uuid4().hex[:8])
-    assert result == Tree('path', [Token('NAME', name, line=1)])
+def test_faketree_name():
+    name = '${}'.format(hashlib.sha1(b'4.1').hexdigest()[:8])
+    assert FakeTree.name('4.1') == name
+
+
+def test_faketree_path():
+    result = FakeTree.path('4.1')
+    name = '${}'.format(hashlib.sha1(b'4.1').hexdigest()[:8])
+    assert result == Tree('path', [Token('NAME', name, line='4.1')])
 
 
 def test_faketree_assignment(patch, tree, fake_tree):
@@ -61,7 +64,18 @@ def test_faketree_assignment(patch, tree, fake_tree):
 
 def test_faketree_add_assignment(patch, fake_tree):
     patch.object(FakeTree, 'assignment')
+    fake_tree.new_lines = ['4.1']
     result = fake_tree.add_assignment('value')
     FakeTree.assignment.assert_called_with('value')
-    fake_tree.block.insert.assert_called_with(FakeTree.assignment())
+    fake_tree.block.insert.assert_called_with(FakeTree.assignment(), index=0)
     assert result == FakeTree.assignment()
+
+
+def test_faketree_add_assignment_order(patch, fake_tree):
+    """
+    Ensures assignments are added after the ones added before them
+    """
+    patch.object(FakeTree, 'assignment')
+    fake_tree.new_lines = ['4.1', '4.2']
+    fake_tree.add_assignment('value')
+    fake_tree.block.insert.assert_called_with(FakeTree.assignment(), index=1)
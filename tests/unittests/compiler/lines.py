@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import json
+
 from pytest import fixture, mark, raises
 
 from storyscript.compiler import Lines
@@ -12,32 +14,63 @@ def lines():
 
 def test_lines_init(lines):
     assert lines.lines == {}
-    assert lines.variables == []
-    assert lines.services == []
+    assert lines.ordered == []
+    assert lines.exits == []
+    assert lines.variables == {}
+    assert lines.services == {}
     assert lines.functions == {}
     assert lines.outputs == {}
     assert lines.modules == {}
 
 
+def test_lines_exit_methods():
+    assert Lines.exit_methods == ['if', 'elif', 'try', 'catch']
+
+
+@mark.parametrize('line, number', [('1', (1,)), ('1.2', (1, 2)),
+                                   ('1.12', (1, 12))])
+def test_lines_number(line, number):
+    assert Lines.number(line) == number
+
+
+def test_lines_index():
+    ordered = []
+    Lines.index(ordered, '1')
+    Lines.index(ordered, '2')
+    assert ordered == [((1,), '1'), ((2,), '2')]
+
+
+def test_lines_index_unordered():
+    ordered = [((1,), '1'), ((2,), '2')]
+    Lines.index(ordered, '1.5')
+    assert ordered == [((1,), '1'), ((1, 5), '1.5'), ((2,), '2')]
+
+
+def test_lines_index_sublines():
+    ordered = []
+    for line in ['1.2', '1.10', '1.9', '1', '2']:
+        Lines.index(ordered, line)
+    assert [line for number, line in ordered] == ['1', '1.2', '1.9', '1.10',
+                                                  '2']
+
+
 def test_lines_sort(lines):
-    lines.lines = {'1': '1', '2': '2', '2.1': '2'}
+    lines.ordered = [((1,), '1'), ((2,), '2'), ((2, 1), '2.1')]
     assert lines.sort() == ['1', '2', '2.1']
 
 
-def test_lines_first(patch, lines):
-    patch.object(Lines, 'sort')
-    lines.lines = {'1': '1'}
-    assert lines.last() == lines.sort()[0]
+def test_lines_first(lines):
+    lines.ordered = [((1,), '1'), ((2,), '2')]
+    assert lines.first() == '1'
 
 
 def test_lines_first_none(lines):
-    assert lines.last() is None
+    assert lines.first() is None
 
 
-def test_lines_last(patch, lines):
-    patch.object(Lines, 'sort')
-    lines.lines = {'1': '1'}
-    assert lines.last() == lines.sort()[-1]
+def test_lines_last(lines):
+    lines.ordered = [((1,), '1'), ((2,), '2')]
+    assert lines.last() == '2'
 
 
 def test_lines_last_no_lines(lines):
@@ -58,18 +91,22 @@ def test_lines_set_next(patch, lines):
     assert lines.lines['1']['next'] == '2'
 
 
-@mark.parametrize('method', ['if', 'elif', 'try', 'catch'])
-def test_lines_set_exit(patch, lines, method):
-    patch.object(Lines, 'sort', return_value=['1', '2'])
-    lines.lines = {'1': {}, '2': {'method': method}}
+def test_lines_set_exit(lines):
+    lines.exits = [((1,), '1'), ((2,), '2')]
+    lines.lines = {'1': {}, '2': {}}
     lines.set_exit('3')
-    assert lines.sort.call_count == 1
     assert lines.lines['2']['exit'] == '3'
 
 
+def test_lines_set_exit_none(lines):
+    lines.lines = {'1': {}}
+    lines.set_exit('3')
+    assert lines.lines['1'] == {}
+
+
 def test_lines_set_output(lines):
-    lines.set_output('line', 'output')
-    assert lines.outputs['line'] == 'output'
+    lines.set_output('line', ['output'])
+    assert lines.outputs['line'] == {'output'}
 
 
 def test_lines_is_output(patch, lines):
@@ -91,6 +128,21 @@ def test_lines_make(lines):
     assert lines.lines == expected
 
 
+def test_lines_make_index(lines):
+    lines.make('method', '2')
+    lines.make('method', '1.5')
+    lines.make('method', '2')
+    assert lines.ordered == [((1, 5), '1.5'), ((2,), '2')]
+    assert lines.exits == []
+
+
+@mark.parametrize('method', ['if', 'elif', 'try', 'catch'])
+def test_lines_make_exits(lines, method):
+    lines.make(method, '1')
+    lines.make('set', '2')
+    assert lines.exits == [((1,), '1')]
+
+
 @mark.parametrize('keywords', ['service', 'command', 'function', 'output',
                                'args', 'enter', 'exit', 'parent', 'name'])
 def test_lines_make_keywords(lines, keywords):
@@ -98,6 +150,23 @@ def test_lines_make_keywords(lines, keywords):
     assert lines.lines['1'][keywords] == keywords
 
 
+def test_lines_variable_key():
+    assert Lines.variable_key(['a', 'b']) == ('a', 'b')
+
+
+def test_lines_variable_key_objects():
+    path = {'$OBJECT': 'path', 'paths': ['b']}
+    result = Lines.variable_key(['a', path])
+    assert result == ('a', ('$OBJECT', json.dumps(path, sort_keys=True)))
+    assert hash(result)
+
+
+def test_lines_is_variable(lines):
+    lines.variables = {('a', 'b'): '1'}
+    assert lines.is_variable(['a', 'b']) is True
+    assert lines.is_variable(['a']) is False
+
+
 def test_lines_service_method(lines):
     assert lines.service_method('alpine', '1') == 'execute'
 
@@ -144,7 +213,14 @@ def test_lines_append_set(patch, lines):
     """
     patch.many(Lines, ['make', 'set_next'])
     lines.append('set', 'line', name=['name'])
-    assert lines.variables[-1] == ['name']
+    assert lines.variables == {('name',): 'line'}
+
+
+def test_lines_append_set_first_definition(patch, lines):
+    patch.many(Lines, ['make', 'set_next'])
+    lines.append('set', '1', name=['name'])
+    lines.append('set', '2', name=['name'])
+    assert lines.variables == {('name',): '1'}
 
 
 def test_compiler_append_service(patch, lines):
@@ -157,7 +233,7 @@ def test_compiler_append_service(patch, lines):
     lines.append('execute', 'line', service='service', parent='parent')
     Lines.service_method.assert_called_with('service', 'line')
     lines.is_output.assert_called_with('parent', 'service')
-    assert lines.services[0] == 'service'
+    assert lines.services == {'service': 'line'}
 
 
 def test_lines_append_service_block_output(patch, lines):
@@ -169,7 +245,7 @@ def test_lines_append_service_block_output(patch, lines):
     Lines.service_method.return_value = 'execute'
     lines.outputs = {'line': ['service']}
     lines.append('execute', 'line', service='service', parent='parent')
-    assert lines.services == []
+    assert lines.services == {}
 
 
 def test_lines_append_function_call(patch, lines):
@@ -193,5 +269,5 @@ def test_lines_execute(patch, lines):
 
 
 def test_compiler_get_services(lines):
-    lines.services = ['one', 'one']
-    assert lines.get_services() == ['one']
+    lines.services = {'one': '1', 'two': '2'}
+    assert lines.get_services() == ['one', 'two']
@@ -7,6 +7,7 @@ from pytest import fixture, mark
 
 from storyscript.compiler import Objects
 from storyscript.parser import Tree
+from storyscript.resolver import Resolver
 
 
 @fixture
@@ -134,6 +135,28 @@ def test_objects_string(patch, tree):
     assert result == {'$OBJECT': 'string', 'string': Objects.unescape_string()}
 
 
+def test_objects_segments(patch):
+    patch.object(Resolver, 'split')
+    item = {'$OBJECT': 'string', 'string': 'string', 'values': ['values']}
+    Objects.segments([{'args': [item]}])
+    Resolver.split.assert_called_with('string', ['values'])
+    assert item['segments'] == Resolver.split()
+
+
+def test_objects_segments_nested():
+    value = {'$OBJECT': 'path', 'paths': ['a']}
+    item = {'$OBJECT': 'string', 'string': 'a {}', 'values': [value]}
+    line = {'args': [{'$OBJECT': 'argument', 'argument': item}]}
+    Objects.segments({'1': line})
+    assert item['segments'] == ['a ', value]
+
+
+def test_objects_segments_plain():
+    item = {'$OBJECT': 'string', 'string': 'string'}
+    Objects.segments(item)
+    assert 'segments' not in item
+
+
 def test_objects_string_templating(patch):
     patch.many(Objects, ['unescape_string', 'fillers_values',
                          'replace_fillers'])
@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-import uuid
-
 from lark.lexer import Token
 
 from storyscript.compiler import FakeTree, Preprocessor
@@ -22,92 +20,130 @@ def test_preprocessor_replace_expression(magic, tree):
     parent.replace.assert_called_with(1, tree.add_assignment().path)
 
 
-def test_preprocessor_service_arguments(patch, magic, tree):
-    patch.many(Preprocessor, ['fake_tree', 'replace_expression'])
-    argument = magic()
-    tree.find_data.return_value = [argument]
-    Preprocessor.service_arguments('block', tree)
-    Preprocessor.fake_tree.assert_called_with('block')
-    tree.find_data.assert_called_with('arguments')
-    argument.node.assert_called_with('values.inline_expression')
-    args = (Preprocessor.fake_tree(), argument, argument.node())
-    Preprocessor.replace_expression.assert_called_with(*args)
+def test_preprocessor_parents():
+    assert Preprocessor.parents == ['arguments', 'assignment_fragment']
 
 
-def test_preprocessor_service_arguments_no_expression(patch, magic, tree):
-    patch.many(Preprocessor, ['fake_tree', 'replace_expression'])
-    argument = magic(inline_expression=None)
-    tree.service_fragment.find_data.return_value = [argument]
-    Preprocessor.service_arguments(magic(), tree)
-    assert Preprocessor.replace_expression.call_count == 0
+def test_preprocessor_inline_expression(patch, magic, tree):
+    patch.object(Tree, 'node')
+    values = Tree('values', [magic()])
+    tree.child.return_value = values
+    result = Preprocessor.inline_expression(tree)
+    tree.child.assert_called_with(1)
+    Tree.node.assert_called_with('inline_expression')
+    assert result == Tree.node()
+
+
+def test_preprocessor_inline_expression_path(tree):
+    tree.child.return_value = Tree('path', [])
+    assert Preprocessor.inline_expression(tree) is None
+
+
+def test_preprocessor_inline_expression_token(tree):
+    tree.child.return_value = Token('NAME', 'name')
+    assert Preprocessor.inline_expression(tree) is None
+
+
+def test_preprocessor_relocate():
+    token = Token('WORD', 'word')
+    tree = Tree('tree', [token])
+    moved = set()
+    Preprocessor.relocate(tree, moved)
+    assert tree.first is token
+    assert moved == {id(tree)}
+
+
+def test_preprocessor_relocate_unchanged(patch):
+    patch.object(Tree, 'locate')
+    tree = Tree('tree', [Tree('child', [])])
+    tree.first = Token('WORD', 'word')
+    moved = set()
+    Preprocessor.relocate(tree, moved)
+    assert Tree.locate.call_count == 0
+    assert moved == set()
+
+
+def test_preprocessor_relocate_child_moved():
+    token = Token('WORD', 'word')
+    child = Tree('child', [token])
+    tree = Tree('tree', [child])
+    tree.first = tree.last = Token('WORD', 'old')
+    moved = {id(child)}
+    Preprocessor.relocate(tree, moved)
+    assert tree.first is token
+    assert id(tree) in moved
 
 
-def test_preprocessor_assignment_expression(patch, magic, tree):
+def test_preprocessor_relocate_child_same_tokens():
+    token = Token('WORD', 'word')
+    tree = Tree('tree', [Tree('child', [token])])
+    tree.first = tree.last = token
+    moved = {id(tree.children[0])}
+    Preprocessor.relocate(tree, moved)
+    assert id(tree) not in moved
+
+
+def test_preprocessor_process(patch):
     patch.many(Preprocessor, ['fake_tree', 'replace_expression'])
-    block = magic()
-    Preprocessor.assignment_expression(block, tree)
+    patch.object(Preprocessor, 'inline_expression', return_value='expr')
+    arguments = Tree('arguments', [])
+    block = Tree('block', [Tree('service', [arguments])])
+    tree = Tree('start', [block])
+    result = Preprocessor.process(tree)
+    Preprocessor.inline_expression.assert_called_with(arguments)
     Preprocessor.fake_tree.assert_called_with(block)
-    parent = block.rules.assignment.assignment_fragment
-    args = (Preprocessor.fake_tree(), parent, tree.inline_expression)
+    args = (Preprocessor.fake_tree(), arguments, 'expr')
     Preprocessor.replace_expression.assert_called_with(*args)
+    assert result == tree
+
+
+def test_preprocessor_process_no_expression(patch):
+    patch.many(Preprocessor, ['fake_tree', 'replace_expression'])
+    patch.object(Preprocessor, 'inline_expression', return_value=None)
+    block = Tree('block', [Tree('assignment_fragment', [])])
+    Preprocessor.process(Tree('start', [block]))
+    assert Preprocessor.fake_tree.call_count == 0
+    assert Preprocessor.replace_expression.call_count == 0
 
 
-def test_preprocessor_assignments(patch, magic, tree):
+def test_preprocessor_process_one_fake_tree(patch):
     """
-    Ensures Preprocessor.assignments can process lines like
-    a = alpine echo text:(random value)
+    Ensures only one fake tree is created for each block
     """
-    patch.object(Preprocessor, 'service_arguments')
-    assignment = magic()
-    tree.find_data.return_value = [assignment]
-    Preprocessor.assignments(tree)
-    args = (tree, assignment.assignment_fragment.service)
-    Preprocessor.service_arguments.assert_called_with(*args)
+    patch.many(Preprocessor, ['fake_tree', 'replace_expression'])
+    patch.object(Preprocessor, 'inline_expression', return_value='expr')
+    block = Tree('block', [Tree('arguments', []), Tree('arguments', [])])
+    Preprocessor.process(Tree('start', [block]))
+    assert Preprocessor.fake_tree.call_count == 1
+    assert Preprocessor.replace_expression.call_count == 2
 
 
-def test_preprocessor_assignments_to_expression(patch, magic, tree):
+def test_preprocessor_process_bottom_up(patch):
     """
-    Ensures Preprocessor.assignments can processs lines like
-    a = (alpine echo message:'text')
+    Ensures nested trees are processed first, each in its innermost block
     """
-    patch.object(Preprocessor, 'assignment_expression')
-    assignment = magic()
-    assignment.assignment_fragment.service = None
-    tree.find_data.return_value = [assignment]
-    Preprocessor.assignments(tree)
-    args = (tree, assignment.assignment_fragment.values)
-    Preprocessor.assignment_expression.assert_called_with(*args)
-
-
-def test_preprocessor_assignments_no_expression(patch, magic, tree):
-    patch.object(Preprocessor, 'assignment_expression')
-    assignment = magic()
-    assignment.assignment_fragment.service = None
-    assignment.assignment_fragment.values.inline_expression = None
-    tree.find_data.return_value = [assignment]
-    Preprocessor.assignments(tree)
-    assert Preprocessor.assignment_expression.call_count == 0
-
-
-def test_preprocessor_service(patch, magic, tree):
-    patch.object(Preprocessor, 'service_arguments')
-    Preprocessor.service(tree)
-    tree.node.assert_called_with('service_block.service')
-    Preprocessor.service_arguments.assert_called_with(tree, tree.node())
-
-
-def test_preprocessor_service_no_service(patch, magic, tree):
-    patch.object(Preprocessor, 'service_arguments')
-    tree.node.return_value = None
-    Preprocessor.service(tree)
-    assert Preprocessor.service_arguments.call_count == 0
-
-
-def test_preprocessor_process(patch, magic, tree):
-    patch.many(Preprocessor, ['assignments', 'service'])
-    block = magic()
-    tree.find_data.return_value = [block]
-    result = Preprocessor.process(tree)
-    Preprocessor.assignments.assert_called_with(block)
-    Preprocessor.service.assert_called_with(block)
-    assert result == tree
+    patch.many(Preprocessor, ['fake_tree', 'replace_expression'])
+    patch.object(Preprocessor, 'inline_expression', return_value='expr')
+    inner = Tree('arguments', [])
+    nested = Tree('block', [inner])
+    outer = Tree('arguments', [Tree('values', [nested])])
+    block = Tree('block', [outer])
+    Preprocessor.process(Tree('start', [block]))
+    calls = Preprocessor.inline_expression.call_args_list
+    assert [call[0][0] for call in calls] == [inner, outer]
+    blocks = [call[0][0] for call in Preprocessor.fake_tree.call_args_list]
+    assert blocks == [nested, block]
+
+
+def test_preprocessor_process_relocate(patch):
+    """
+    Ensures positions are updated after the first fake assignment
+    """
+    patch.many(Preprocessor, ['fake_tree', 'replace_expression', 'relocate'])
+    patch.object(Preprocessor, 'inline_expression', return_value='expr')
+    arguments = Tree('arguments', [])
+    block = Tree('block', [arguments])
+    tree = Tree('start', [block])
+    Preprocessor.process(tree)
+    calls = Preprocessor.relocate.call_args_list
+    assert [call[0][0] for call in calls] == [arguments, block, tree]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from pytest import fixture
+
+from storyscript.compiler import Scope
+
+
+@fixture
+def scope(magic):
+    return Scope('variables', magic(), set())
+
+
+def test_scope_init(magic):
+    defined = magic()
+    used = set()
+    scope = Scope('variables', defined, used)
+    assert scope.kind == 'variables'
+    assert scope.defined == defined
+    assert scope.used is used
+    assert scope == {}
+
+
+def test_scope_contains(scope):
+    scope['a'] = 1
+    assert 'a' in scope
+    assert scope.used == set()
+    assert scope.defined.call_count == 0
+
+
+def test_scope_contains_defined(scope):
+    """
+    Ensures names not in the scope are looked up and recorded
+    """
+    assert 'b' in scope
+    scope.defined.assert_called_with('variables', 'b')
+    assert scope.used == {('variables', 'b')}
+
+
+def test_scope_contains_undefined(scope):
+    scope.defined.return_value = False
+    assert 'b' not in scope
+    assert scope.used == {('variables', 'b')}
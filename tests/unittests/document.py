@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+from lark.exceptions import UnexpectedCharacters, UnexpectedToken
+from lark.lexer import Token
+
+from pytest import fixture, raises
+
+from storyscript.compiler import FakeTree
+from storyscript.document import Document, Segment
+from storyscript.exceptions import StoryError
+from storyscript.parser import Parser, Tree
+from storyscript.version import version
+
+
+@fixture
+def document(patch):
+    patch.object(Document, 'update')
+    return Document('story')
+
+
+@fixture
+def segments():
+    return [Segment(1, 'a = 1\n'), Segment(2, 'b = 2\nc = 3\n'),
+            Segment(4, 'd = 4\n')]
+
+
+def test_segment_init():
+    segment = Segment(1, 'source')
+    assert segment.start == 1
+    assert segment.source == 'source'
+    assert segment.trees is None
+    assert segment.lines is None
+    assert segment.first is None
+    assert segment.last is None
+    assert segment.services == {}
+    assert segment.functions == {}
+    assert segment.modules == {}
+    assert segment.defines == set()
+    assert segment.uses == set()
+
+
+def test_document_init(patch):
+    patch.init(Parser)
+    patch.object(Document, 'update')
+    document = Document('story', ebnf_file='ebnf', debug=True)
+    Parser.__init__.assert_called_with(ebnf_file='ebnf')
+    assert isinstance(document.parser, Parser)
+    assert document.debug is True
+    assert document.segments == []
+    assert document.definitions == {}
+    assert document.users == {}
+    assert document.compiled is None
+    Document.update.assert_called_with(0, 0, 'story')
+
+
+def test_document_split():
+    result = Document.split('a = 1\nif a\n    b = 2\nc = 3')
+    assert result == ['a = 1\n', 'if a\n    b = 2\n', 'c = 3']
+
+
+def test_document_split_blank():
+    """
+    Ensures blank lines at the start belong to the first segment
+    """
+    assert Document.split('\n\na = 1\n\nb = 2\n') == ['\n\na = 1\n\n',
+                                                      'b = 2\n']
+
+
+def test_document_split_continuation():
+    """
+    Ensures that else, catch and finally continue the segment before them
+    """
+    source = 'if a\n    b = 1\nelse\n    b = 2\nelsewhere = 1\n'
+    assert Document.split(source) == ['if a\n    b = 1\nelse\n    b = 2\n',
+                                      'elsewhere = 1\n']
+
+
+def test_document_statement():
+    statement = Tree('assignment', [])
+    tree = Tree('block', [Tree('rules', [statement])])
+    assert Document.statement(tree) == statement
+
+
+def test_document_continues():
+    tree = Tree('block', [Tree('arguments', [])])
+    assert Document.continues(tree) is True
+
+
+def test_document_continues_not(tree):
+    assert Document.continues(Tree('block', [tree])) is False
+
+
+def test_document_silent():
+    trees = [Tree('block', [Tree('rules', [Tree('imports', [])])]),
+             Tree('block', [Tree('rules', [Tree('values', [])])])]
+    assert Document.silent(trees) is True
+
+
+def test_document_silent_not():
+    trees = [Tree('block', [Tree('rules', [Tree('assignment', [])])])]
+    assert Document.silent(trees) is False
+
+
+def test_document_slashed():
+    tree = Tree('path', [Token('NAME', '/a')])
+    assert Document.slashed('/a', [tree]) is True
+
+
+def test_document_slashed_regexp():
+    tree = Tree('regular_expression', [Token('REGEXP', '/a/')])
+    assert Document.slashed('/a/', [tree]) is False
+
+
+def test_document_slashed_none(tree):
+    assert Document.slashed('a', [tree]) is False
+
+
+def test_document_missing():
+    error = UnexpectedToken(Token('$END', ''), [])
+    assert Document.missing(error, 1, 'a =') == ''
+
+
+def test_document_missing_token():
+    error = UnexpectedToken(Token('NAME', 'a'), [])
+    assert Document.missing(error, 1, 'a =') is None
+
+
+def test_document_missing_quote():
+    """
+    Ensures the position is found in the source without the padding lines
+    """
+    error = UnexpectedCharacters('\n\na = "b', 6, 3, 5)
+    assert Document.missing(error, 3, 'a = "b') == '"'
+
+
+def test_document_missing_character():
+    error = UnexpectedCharacters('\na = $', 5, 2, 5)
+    assert Document.missing(error, 2, 'a = $') is None
+
+
+def test_document_missing_other(magic):
+    assert Document.missing(magic(), 1, 'a') is None
+
+
+def test_document_renumber():
+    assert Document.renumber('4', 2) == '6'
+    assert Document.renumber('4.1', -1) == '3.1'
+
+
+def test_document_rename():
+    item = [{'paths': ['$a', 'b']}, 1, None]
+    result = Document.rename(item, {'$a': '$c'})
+    assert result == [{'paths': ['$c', 'b']}, 1, None]
+
+
+def test_document_join():
+    before = [Segment(1, 'a\n')]
+    after = [Segment(3, 'c\n')]
+    assert Document.join(before, 'b\n', after) == 'a\nb\nc\n'
+
+
+def test_document_line(document, segments):
+    document.segments = segments
+    assert document.line(1) == 2
+    assert document.line(3) == 5
+
+
+def test_document_line_empty(document):
+    assert document.line(0) == 1
+
+
+def test_document_find(document, segments):
+    document.segments = segments
+    assert document.find(1) == 0
+    assert document.find(3) == 1
+    assert document.find(4) == 2
+    assert document.find(10) == 2
+
+
+def test_document_offset(document, segments):
+    document.segments = segments
+    assert document.offset(0, (1, 3)) == 2
+    assert document.offset(0, (3, 1)) == 12
+    assert document.offset(1, (4, 2)) == 13
+
+
+def test_document_parse(patch, document):
+    patch.object(Parser, 'parse')
+    result = document.parse(3, 'source')
+    Parser.parse.assert_called_with('\n\nsource', debug=True)
+    assert result == Parser.parse().children
+
+
+def test_document_take(document):
+    pieces = ['a', 'b']
+    assert document.take(pieces, 0) == ('a', 0)
+    assert pieces == ['b']
+
+
+def test_document_take_segment(document, segments):
+    document.segments = segments
+    assert document.take([], 1) == ('b = 2\nc = 3\n', 2)
+
+
+def test_document_take_none(document):
+    assert document.take([], 0) == (None, 0)
+
+
+def test_document_take_until(document, segments):
+    document.segments = segments
+    result = document.take_until('a = "\n', '"', ['b\n', 'c"\n', 'd\n'], 0)
+    assert result == ('a = "\nb\nc"\n', 0)
+
+
+def test_document_take_until_none(document):
+    assert document.take_until('a = "', '"', ['b\n'], 0) == (None, 0)
+
+
+def test_document_take_all(document, segments):
+    document.segments = segments
+    result = document.take_all('a = /\n', ['b\n'], 2)
+    assert result == ('a = /\nb\nd = 4\n', 3)
+
+
+def test_document_take_all_none(document):
+    assert document.take_all('a = /\n', [], 0) == (None, 0)
+
+
+def test_document_recover(patch, document):
+    patch.object(Document, 'missing', return_value='"')
+    patch.object(Document, 'take_until')
+    error = UnexpectedToken(Token('$END', ''), [])
+    result = document.recover(error, 1, 'a = "', ['b'], 2)
+    Document.missing.assert_called_with(error, 1, 'a = "')
+    Document.take_until.assert_called_with('a = "', '"', ['b'], 2)
+    assert result == Document.take_until()
+
+
+def test_document_recover_slash(patch, document):
+    patch.object(Document, 'take_all')
+    error = StoryError('unknown', None)
+    result = document.recover(error, 1, 'a = /', ['b'], 2)
+    Document.take_all.assert_called_with('a = /', ['b'], 2)
+    assert result == Document.take_all()
+
+
+def test_document_recover_none(document):
+    error = StoryError('unknown', None)
+    assert document.recover(error, 1, 'a = 1', ['b'], 2) == (None, 2)
+
+
+def test_document_take_previous(patch, document):
+    patch.object(Document, 'silent', return_value=False)
+    segments = [Segment(1, 'a = 1\n', ['tree'])]
+    result = document.take_previous('b\n', segments, 3)
+    Document.silent.assert_called_with(['tree'])
+    assert result == ('a = 1\nb\n', 1, 3)
+    assert segments == []
+
+
+def test_document_take_previous_document(patch, document, segments):
+    """
+    Ensures segments are taken from the document, parsing them when needed
+    """
+    patch.object(Document, 'silent', return_value=False)
+    patch.object(Document, 'parse')
+    document.segments = segments
+    result = document.take_previous('e\n', [], 2)
+    Document.parse.assert_called_with(2, 'b = 2\nc = 3\n')
+    assert segments[1].trees == Document.parse()
+    assert result == ('b = 2\nc = 3\ne\n', 2, 1)
+
+
+def test_document_take_previous_silent(patch, document, segments):
+    """
+    Ensures silent segments are taken with the one before them
+    """
+    patch.object(Document, 'silent', side_effect=[True, False])
+    document.segments = segments
+    for segment in segments:
+        segment.trees = []
+    result = document.take_previous('e\n', [], 2)
+    assert result == ('a = 1\nb = 2\nc = 3\ne\n', 1, 0)
+
+
+def test_document_take_previous_first(patch, document, segments):
+    patch.object(Document, 'silent', return_value=True)
+    document.segments = segments
+    segments[0].trees = []
+    assert document.take_previous('b\n', [], 1) == ('a = 1\nb\n', 1, 0)
+
+
+def test_document_defined(document, segments):
+    document.definitions = {('variables', 'a'): {segments[0]}}
+    assert document.defined(2, 'variables', 'a') is True
+    assert document.defined(1, 'variables', 'a') is False
+    assert document.defined(2, 'variables', 'b') is False
+
+
+def test_document_register(document, segments):
+    segments[0].defines = {('variables', 'a')}
+    segments[0].uses = {('variables', 'b')}
+    document.register(segments[0])
+    assert document.definitions == {('variables', 'a'): {segments[0]}}
+    assert document.users == {('variables', 'b'): {segments[0]}}
+
+
+def test_document_unregister(document, segments):
+    segments[0].defines = {('variables', 'a')}
+    segments[0].uses = {('variables', 'b')}
+    document.register(segments[0])
+    document.unregister(segments[0])
+    assert document.definitions == {('variables', 'a'): set()}
+    assert document.users == {('variables', 'b'): set()}
+
+
+def test_document_compile(document):
+    """
+    Ensures a segment is compiled with the names defined before it
+    """
+    name = ('variables', ('a',))
+    document.definitions = {name: {Segment(1, 'a = 1\n')}}
+    segment = Segment(2, 'a echo\nb = 2\n')
+    document.compile(segment)
+    assert segment.trees is not None
+    assert segment.first == '2'
+    assert segment.last == '3'
+    assert segment.lines['2']['method'] == 'expression'
+    assert segment.defines == {('variables', ('b',))}
+    assert segment.uses == {name}
+    assert document.users[name] == {segment}
+
+
+def test_document_move(document):
+    segment = Segment(1, 'source', trees=[])
+    name = FakeTree.name('1.1')
+    segment.lines = {
+        '1.1': {'ln': '1.1', 'name': [name], 'args': [], 'next': '1'},
+        '1': {'ln': '1', 'name': None, 'args': [{'paths': [name]}],
+              'enter': None, 'parent': '0'}
+    }
+    segment.first = '1.1'
+    segment.last = '1'
+    segment.services = {'alpine': '1'}
+    segment.functions = {'f': '1'}
+    document.move(segment, 2)
+    new_name = FakeTree.name('3.1')
+    assert segment.start == 3
+    assert segment.trees is None
+    assert segment.lines == {
+        '3.1': {'ln': '3.1', 'name': [new_name], 'args': [], 'next': '3'},
+        '3': {'ln': '3', 'name': None, 'args': [{'paths': [new_name]}],
+              'enter': None, 'parent': '2'}
+    }
+    assert segment.first == '3.1'
+    assert segment.last == '3'
+    assert segment.services == {'alpine': '3'}
+    assert segment.functions == {'f': '3'}
+
+
+def test_document_move_no_lines(document):
+    segment = Segment(1, 'import "a" as b\n', trees=[])
+    segment.lines = {}
+    document.move(segment, 1)
+    assert segment.start == 2
+    assert segment.first is None
+
+
+def test_document_notify(document, segments):
+    document.users = {('variables', 'a'): {segments[0], segments[2]}}
+    pending = []
+    document.notify({('variables', 'a')}, 2, pending)
+    assert pending == [(4, id(segments[2]), segments[2])]
+
+
+def test_document_reset(document):
+    document.definitions = {'name': set()}
+    document.users = {'name': set()}
+    document.reset('source')
+    assert document.segments[0].start == 1
+    assert document.segments[0].source == 'source'
+    assert document.definitions == {}
+    assert document.users == {}
+
+
+def test_document_reset_empty(document):
+    document.reset('')
+    assert document.segments == []
+
+
+def test_document_link(document):
+    segment = Segment(1, 'source')
+    item = {'ln': '1', 'next': '2'}
+    segment.lines = {'1': item}
+    segment.last = '1'
+    result = document.link(segment, '3')
+    assert result == {'ln': '1', 'next': '3'}
+    assert segment.lines['1'] == result
+    assert item == {'ln': '1', 'next': '2'}
+
+
+def test_document_link_last(document):
+    segment = Segment(1, 'source')
+    segment.lines = {'1': {'ln': '1', 'next': '2'}}
+    segment.last = '1'
+    assert document.link(segment, None) == {'ln': '1'}
+
+
+def test_document_link_same(document):
+    segment = Segment(1, 'source')
+    item = {'ln': '1', 'next': '2'}
+    segment.lines = {'1': item}
+    segment.last = '1'
+    assert document.link(segment, '2') is item
+
+
+def test_document_assemble(document, segments):
+    segments[0].lines = {'1': {'ln': '1', 'next': '2'}}
+    segments[0].first = '1'
+    segments[0].last = '1'
+    segments[0].services = {'alpine': '1'}
+    segments[1].lines = {}
+    segments[1].modules = {'m': 'module'}
+    segments[2].lines = {'4': {'ln': '4'}}
+    segments[2].first = '4'
+    segments[2].last = '4'
+    segments[2].functions = {'f': '4'}
+    document.segments = segments
+    result = document.assemble()
+    assert result == {
+        'tree': {'1': {'ln': '1', 'next': '4'}, '4': {'ln': '4'}},
+        'services': ['alpine'], 'entrypoint': '1', 'modules': {'m': 'module'},
+        'functions': {'f': '4'}, 'version': version
+    }
+
+
+def test_document_load(patch, document):
+    patch.many(Document, ['reset', 'compile'])
+    patch.object(Parser, 'parse')
+    document.segments = [Segment(1, 'source')]
+    document.load('source')
+    Document.reset.assert_called_with('source')
+    Parser.parse.assert_called_with('source', debug=document.debug)
+    assert document.segments[0].trees == Parser.parse().children
+    Document.compile.assert_called_with(document.segments[0])
+
+
+def test_document_update(patch, segments):
+    patch.many(Document, ['apply', 'assemble'])
+    document = Document('')
+    document.segments = segments
+    result = document.update(0, 1, 'source')
+    Document.apply.assert_called_with(0, 1, 'source')
+    assert document.compiled == Document.assemble()
+    assert result == Document.assemble()
+
+
+def test_document_update_error(patch, segments):
+    """
+    Ensures the story is loaded as a whole when an edit fails
+    """
+    patch.many(Document, ['apply', 'assemble', 'load'])
+    document = Document('')
+    Document.apply.side_effect = StoryError('error', None)
+    document.segments = segments
+    document.update(1, 2, 'source')
+    Document.load.assert_called_with('a = 1\nsourced = 4\n')
+
+
+def test_document_update_exit(patch, segments):
+    """
+    Ensures a story that can't be loaded is kept as one segment
+    """
+    patch.many(Document, ['apply', 'load'])
+    document = Document('')
+    Document.apply.side_effect = StoryError('error', None)
+    Document.load.side_effect = SystemExit
+    document.segments = segments
+    with raises(SystemExit):
+        document.update(1, 2, 'source\n')
+    assert len(document.segments) == 1
+    assert document.segments[0].source == 'a = 1\nsource\nd = 4\n'
+
+
+def test_document_edit(document, segments):
+    document.segments = segments
+    document.edit((3, 5), (3, 6), '5')
+    Document.update.assert_called_with(1, 2, 'b = 2\nc = 5\n')
+
+
+def test_document_edit_start(document, segments):
+    """
+    Ensures an edit at the start of a segment takes the one before it
+    """
+    document.segments = segments
+    document.edit((2, 1), (2, 1), '\n')
+    Document.update.assert_called_with(0, 2, 'a = 1\n\nb = 2\nc = 3\n')
+
+
+def test_document_edit_empty(document):
+    document.edit((1, 1), (1, 1), 'a = 1')
+    Document.update.assert_called_with(0, 0, 'a = 1')
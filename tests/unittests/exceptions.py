@@ -42,6 +42,11 @@ def test_exceptions_storyerror_tree_template(error):
     assert error.tree_template('value', 1) == expected
 
 
+def test_exceptions_storyerror_value_template(error):
+    expected = 'Failed reading story because of unexpected "value"'
+    assert error.value_template('value') == expected
+
+
 def test_exceptions_storyerror_compile_template(patch, error):
     patch.object(StoryError, 'token_template')
     result = error.compile_template()
@@ -94,6 +99,17 @@ def test_exceptions_storyerror_compile_template_dict(patch, error):
     assert result == StoryError.tree_template()
 
 
+def test_exceptions_storyerror_compile_template_dict_value(patch, error):
+    """
+    Ensures compile_template can handle dictionary items without a line.
+    """
+    patch.object(StoryError, 'value_template')
+    error.item = {'value': 'value'}
+    result = error.compile_template()
+    StoryError.value_template.assert_called_with('value')
+    assert result == StoryError.value_template()
+
+
 def test_exceptions_storyerror_message(patch, error):
     patch.many(StoryError, ['compile_template', 'escape_string'])
     result = error.message()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import operator
+
+from pytest import mark, raises
+
+from storyscript.expression import Expression
+
+
+def test_expression_init():
+    expression = Expression('{} > 1')
+    assert expression.template == '{} > 1'
+    assert expression.tokens == ['{}', '>', '1']
+    assert expression.position == 0
+    assert expression.placeholders == 0
+
+
+def test_expression_tokenize():
+    expression = Expression('({} // 2.5)**"a b" and not x')
+    tokens = ['(', '{}', '//', '2.5', ')', '**', '"a b"', 'and', 'not', 'x']
+    assert expression.tokens == tokens
+
+
+def test_expression_tokenize_error():
+    with raises(ValueError):
+        Expression('{} $ {}')
+
+
+def test_expression_compile(patch):
+    patch.init(Expression)
+    patch.object(Expression, 'parse')
+    patch.object(Expression, '_cache', {})
+    result = Expression.compile('{} > 1')
+    Expression.__init__.assert_called_with('{} > 1')
+    assert result == Expression.parse()
+    assert Expression._cache == {'{} > 1': result}
+
+
+def test_expression_compile_cached(patch):
+    patch.object(Expression, '_cache', {'{} > 1': 'function'})
+    assert Expression.compile('{} > 1') == 'function'
+
+
+@mark.parametrize('template, values, result', [
+    ('{} == 1', [1], True),
+    ('{} > {}', [1, 2], False),
+    ('{} >= {}', [2, 2], True),
+    ('{} < {}', [1, 2], True),
+    ('{} <= {}', [3, 2], False),
+    ('{} != {}', ['a', 'b'], True),
+    ('{} + {}', [3, 2], 5),
+    ('{} + {}', ['a', 'b'], 'ab'),
+    ('{} - {} - {}', [10, 3, 2], 5),
+    ('{} * {} + {}', [2, 3, 4], 10),
+    ('{} * ({} + {})', [2, 3, 4], 14),
+    ('{} / {}', [1, 2], 0.5),
+    ('{} // {}', [7, 2], 3),
+    ('{} % {}', [7, 3], 1),
+    ('{} ^ {}', [6, 3], 5),
+    ('-{} ** 2', [3], -9),
+    ('2 ** -1', [], 0.5),
+    ('{} and {}', [0, 2], 0),
+    ('{} or {}', [0, 2], 2),
+    ('not {} == {}', [1, 2], True),
+    ('1 < {} < 3', [2], True),
+    ('1 < {} < 3', [3], False),
+    ('{} == "a"', ['a'], True),
+    ('{} != None', [None], False),
+])
+def test_expression_evaluate(template, values, result):
+    """
+    Ensures templates are evaluated as eval would
+    """
+    assert Expression.compile(template)(values) == result
+
+
+@mark.parametrize('template', [
+    '{} +', '({}', '{} ({})', 'name', '', '{} is None'
+])
+def test_expression_parse_error(template):
+    with raises(ValueError):
+        Expression(template).parse()
+
+
+def test_expression_constant():
+    assert Expression.constant(1)([]) == 1
+
+
+def test_expression_apply():
+    function = Expression.apply(operator.neg, operator.itemgetter(0))
+    assert function([1]) == -1
+
+
+def test_expression_combine():
+    function = Expression.combine(operator.add, operator.itemgetter(0),
+                                  operator.itemgetter(1))
+    assert function([1, 2]) == 3
+
+
+def test_expression_either(magic):
+    right = magic()
+    assert Expression.either(lambda values: 1, right)([]) == 1
+    assert right.call_count == 0
+
+
+def test_expression_both(magic):
+    right = magic()
+    assert Expression.both(lambda values: 0, right)([]) == 0
+    assert right.call_count == 0
+
+
+def test_expression_chain(magic):
+    """
+    Ensures a chained comparison stops at the first false result
+    """
+    last = magic()
+    chain = [(operator.lt, operator.itemgetter(1)), (operator.lt, last)]
+    function = Expression.chain(operator.itemgetter(0), chain)
+    assert function([2, 1]) is False
+    assert last.call_count == 0
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import os
+import pickle
+
+import lark
+from lark.parsers.lalr_analysis import Reduce, Shift
+
+from pytest import fixture
+
+from storyscript.parser.cache import Cache, CachePickler, CacheUnpickler
+from storyscript.version import version
+
+
+@fixture
+def cache():
+    return Cache(directory='cache')
+
+
+def test_cache_pickler_actions():
+    assert CachePickler.actions == {'Shift': Shift, 'Reduce': Reduce}
+
+
+def test_cache_pickler_persistent_id(magic):
+    pickler = CachePickler(magic())
+    assert pickler.persistent_id(Shift) == 'Shift'
+    assert pickler.persistent_id(Reduce) == 'Reduce'
+    assert pickler.persistent_id('other') is None
+
+
+def test_cache_unpickler_persistent_load(magic):
+    unpickler = CacheUnpickler(magic())
+    assert unpickler.persistent_load('Shift') is Shift
+
+
+def test_cache_pickling_keeps_actions():
+    stream = io.BytesIO()
+    CachePickler(stream).dump([(Shift, 1), (Reduce, 2)])
+    stream.seek(0)
+    result = CacheUnpickler(stream).load()
+    assert result[0][0] is Shift
+    assert result[1][0] is Reduce
+
+
+def test_cache_init(cache):
+    assert cache.directory == 'cache'
+
+
+def test_cache_init_default(patch):
+    patch.object(Cache, 'default_directory')
+    assert Cache().directory == Cache.default_directory()
+
+
+def test_cache_default_directory(patch):
+    patch.dict(os.environ, {'STORYSCRIPT_CACHE_DIR': 'dir'})
+    assert Cache.default_directory() == 'dir'
+
+
+def test_cache_default_directory_xdg(patch):
+    patch.dict(os.environ, {'XDG_CACHE_HOME': 'home'})
+    os.environ.pop('STORYSCRIPT_CACHE_DIR', None)
+    assert Cache.default_directory() == os.path.join('home', 'storyscript')
+
+
+def test_cache_default_directory_home(patch):
+    patch.dict(os.environ, {})
+    os.environ.pop('STORYSCRIPT_CACHE_DIR', None)
+    os.environ.pop('XDG_CACHE_HOME', None)
+    patch.object(os.path, 'expanduser', return_value='user')
+    expected = os.path.join('user', '.cache', 'storyscript')
+    assert Cache.default_directory() == expected
+
+
+def test_cache_key():
+    string = 'lalr:hash:{}:{}'.format(lark.__version__, version)
+    expected = hashlib.sha256(string.encode('utf-8')).hexdigest()
+    assert Cache.key('lalr', 'hash') == expected
+
+
+def test_cache_key_embedded():
+    string = 'lalr:hash:{}:{}:transformer'.format(lark.__version__, version)
+    expected = hashlib.sha256(string.encode('utf-8')).hexdigest()
+    assert Cache.key('lalr', 'hash', embedded=True) == expected
+
+
+def test_cache_path(cache):
+    assert cache.path('key') == os.path.join('cache', 'key.lark')
+
+
+def test_cache_load(patch, cache):
+    patch.object(io, 'open')
+    patch.object(CacheUnpickler, 'load')
+    patch.init(CacheUnpickler)
+    result = cache.load('key')
+    io.open.assert_called_with(cache.path('key'), 'rb')
+    CacheUnpickler.__init__.assert_called_with(io.open().__enter__())
+    assert result == CacheUnpickler.load()
+
+
+def test_cache_load_missing(cache):
+    assert cache.load('missing') is None
+
+
+def test_cache_save_load(tmpdir):
+    cache = Cache(directory=str(tmpdir.join('nested')))
+    cache.save('key', {'lark': Shift})
+    assert cache.load('key') == {'lark': Shift}
+    directory = tmpdir.join('nested')
+    assert directory.listdir() == [directory.join('key.lark')]
+
+
+def test_cache_save_error(patch, tmpdir):
+    patch.object(CachePickler, 'dump', side_effect=pickle.PicklingError)
+    cache = Cache(directory=str(tmpdir))
+    cache.save('key', 'lark')
+    assert tmpdir.listdir() == []
@@ -12,3 +12,15 @@ def test_indenter():
     assert CustomIndenter.INDENT_type == '_INDENT'
     assert CustomIndenter.DEDENT_type == '_DEDENT'
     assert CustomIndenter.tab_len == 8
+
+
+def test_indenter_process(patch):
+    patch.object(Indenter, 'process')
+    indenter = CustomIndenter()
+    indenter.paren_level = 1
+    indenter.indent_level = [0, 4]
+    result = indenter.process('stream')
+    Indenter.process.assert_called_with('stream')
+    assert indenter.paren_level == 0
+    assert indenter.indent_level == [0]
+    assert result == Indenter.process()
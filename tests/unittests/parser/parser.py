@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import io
 import os
 
 from lark import Lark
-from lark.exceptions import UnexpectedInput, UnexpectedToken
+from lark.exceptions import (UnexpectedCharacters, UnexpectedInput,
+                             UnexpectedToken)
+from lark.lexer import Token
 
-from pytest import fixture, raises
+from pytest import fixture, mark, raises
 
 from storyscript.exceptions import StoryError
-from storyscript.parser import (CustomIndenter, Grammar, Parser, Transformer,
-                                Tree)
+from storyscript.parser import (Cache, CustomIndenter, Grammar, Parser,
+                                Transformer, Tree)
+from storyscript.story import Story
 
 
 @fixture
@@ -20,6 +24,8 @@ def parser():
 def test_parser_init(parser):
     assert parser.algo == 'lalr'
     assert parser.ebnf_file is None
+    assert parser.embed_transformer is True
+    assert parser.key is None
 
 
 def test_parser_init_algo():
@@ -32,24 +38,61 @@ def test_parser_init_ebnf_file():
     assert parser.ebnf_file == 'grammar.ebnf'
 
 
+def test_parser_init_embed_transformer():
+    parser = Parser(embed_transformer=False)
+    assert parser.embed_transformer is False
+
+
+@mark.parametrize('algo, embed, expected', [
+    ('lalr', True, True), ('lalr', False, False), ('earley', True, False)
+])
+def test_parser_embedded(algo, embed, expected):
+    assert Parser(algo=algo, embed_transformer=embed).embedded() is expected
+
+
 def test_parser_indenter(patch, parser):
     patch.init(CustomIndenter)
     assert isinstance(parser.indenter(), CustomIndenter)
 
 
+def test_parser_rules(patch, magic, parser):
+    rules = [magic(), magic(), magic()]
+    rules[0].origin.name = 'start'
+    rules[1].origin.name = '__anon_star_0'
+    rules[2].origin.name = 'start'
+    patch.object(Parser, 'lark')
+    Parser.lark().rules = rules
+    assert parser.rules() == {'start'}
+
+
 def test_parser_transfomer(patch, parser):
     patch.init(Transformer)
-    assert isinstance(parser.transformer(), Transformer)
+    patch.object(Parser, 'rules')
+    result = parser.transformer()
+    Transformer.__init__.assert_called_with(rules=Parser.rules())
+    assert isinstance(result, Transformer)
 
 
 def test_parser_grammar(patch, parser):
+    patch.object(Parser, '_grammar', None)
     patch.init(Grammar)
     patch.object(Grammar, 'build')
     result = parser.grammar()
     assert Grammar.__init__.call_count == 1
+    assert Parser._grammar == Grammar().build()
     assert result == Grammar().build()
 
 
+def test_parser_grammar_built(patch, parser):
+    """
+    Ensures the default grammar is built once for all parsers
+    """
+    patch.object(Parser, '_grammar', 'grammar')
+    patch.init(Grammar)
+    assert Parser().grammar() == 'grammar'
+    assert Grammar.__init__.call_count == 0
+
+
 def test_parser_grammar_ebnf_file(patch, parser):
     patch.object(io, 'open')
     parser.ebnf_file = 'test.ebnf'
@@ -58,16 +101,139 @@ def test_parser_grammar_ebnf_file(patch, parser):
     assert result == io.open().__enter__().read()
 
 
-def test_parser_lark(patch, parser):
+def test_parser_hash_grammar():
+    result = Parser.hash_grammar('grammar')
+    assert result == hashlib.sha256(b'grammar').hexdigest()
+
+
+def test_parser_cache_key(patch, parser):
+    patch.object(Parser, 'hash_grammar')
+    result = parser.cache_key('grammar')
+    Parser.hash_grammar.assert_called_with('grammar')
+    assert result == ('lalr', Parser.hash_grammar(), True)
+
+
+def test_parser_find_key(patch, parser):
+    patch.dict(Parser._keys, clear=True)
+    patch.many(Parser, ['grammar', 'cache_key'])
+    result = parser.find_key()
+    Parser.cache_key.assert_called_with(Parser.grammar())
+    assert Parser._keys == {('lalr', True): Parser.cache_key()}
+    assert result == Parser.cache_key()
+
+
+def test_parser_find_key_kept(patch, parser):
+    patch.dict(Parser._keys, {('lalr', True): 'key'}, clear=True)
+    patch.many(Parser, ['grammar', 'cache_key'])
+    assert Parser().find_key() == 'key'
+    assert Parser.grammar.call_count == 0
+
+
+def test_parser_find_key_ebnf_file(patch):
+    patch.dict(Parser._keys, clear=True)
+    patch.many(Parser, ['grammar', 'cache_key'])
+    result = Parser(ebnf_file='test.ebnf').find_key()
+    Parser.cache_key.assert_called_with(Parser.grammar())
+    assert Parser._keys == {}
+    assert result == Parser.cache_key()
+
+
+def test_parser_cache(patch, parser):
+    patch.init(Cache)
+    assert isinstance(parser.cache(), Cache)
+
+
+def test_parser_build_lark(patch, parser):
+    patch.object(Parser, 'cache')
+    result = parser.build_lark('grammar', ('lalr', 'hash', True))
+    Parser.cache().key.assert_called_with('lalr', 'hash', True)
+    Parser.cache().load.assert_called_with(Parser.cache().key())
+    assert result == Parser.cache().load()
+
+
+def test_parser_build_lark_uncached(patch, parser):
     patch.init(Lark)
-    patch.many(Parser, ['indenter', 'grammar'])
-    result = parser.lark()
-    Lark.__init__.assert_called_with(parser.grammar(),
-                                     parser=parser.algo,
-                                     postlex=Parser.indenter())
+    patch.init(Transformer)
+    patch.many(Parser, ['indenter', 'cache'])
+    Parser.cache().load.return_value = None
+    result = parser.build_lark('grammar', ('lalr', 'hash', True))
+    kwargs = Lark.__init__.call_args[1]
+    assert isinstance(kwargs['transformer'], Transformer)
+    Lark.__init__.assert_called_with('grammar', parser=parser.algo,
+                                     postlex=Parser.indenter(),
+                                     transformer=kwargs['transformer'],
+                                     tree_class=Tree)
+    Parser.cache().save.assert_called_with(Parser.cache().key(), result)
     assert isinstance(result, Lark)
 
 
+def test_parser_build_lark_not_embedded(patch):
+    patch.init(Lark)
+    patch.many(Parser, ['indenter', 'cache'])
+    Parser.cache().load.return_value = None
+    parser = Parser(embed_transformer=False)
+    parser.build_lark('grammar', ('lalr', 'hash', False))
+    Lark.__init__.assert_called_with('grammar', parser=parser.algo,
+                                     postlex=Parser.indenter())
+
+
+def test_parser_lark(patch, parser):
+    patch.dict(Parser._cache, clear=True)
+    patch.many(Parser, ['grammar', 'find_key', 'build_lark'])
+    result = parser.lark()
+    Parser.build_lark.assert_called_with(Parser.grammar(),
+                                         Parser.find_key())
+    assert Parser._cache[Parser.find_key()] == Parser.build_lark()
+    assert parser.key == Parser.find_key()
+    assert result == Parser.build_lark()
+
+
+def test_parser_lark_key(patch, parser):
+    """
+    Ensures the cache key is found only once
+    """
+    patch.dict(Parser._cache, {'key': 'lark'}, clear=True)
+    patch.object(Parser, 'find_key', return_value='key')
+    parser.lark()
+    assert parser.lark() == 'lark'
+    assert Parser.find_key.call_count == 1
+
+
+def test_parser_lark_cached(patch, parser):
+    patch.dict(Parser._cache, {'key': 'lark'}, clear=True)
+    patch.object(Parser, 'find_key', return_value='key')
+    patch.object(Parser, 'build_lark')
+    assert parser.lark() == 'lark'
+    assert Parser.build_lark.call_count == 0
+
+
+def test_parser_invalidate(patch, parser):
+    patch.dict(Parser._cache, {'key': 'lark', 'other': 'lark'}, clear=True)
+    patch.object(Parser, 'find_key', return_value='key')
+    parser.invalidate()
+    assert Parser._cache == {'other': 'lark'}
+    assert parser.key is None
+
+
+def test_parser_invalidate_key(patch, parser):
+    """
+    Ensures the Lark instance of the grammar last used is removed, even
+    when the grammar changed since
+    """
+    patch.dict(Parser._cache, {'old': 'lark', 'new': 'lark'}, clear=True)
+    patch.object(Parser, 'find_key', return_value='new')
+    parser.key = 'old'
+    parser.invalidate()
+    assert Parser._cache == {'new': 'lark'}
+    assert parser.key is None
+
+
+def test_parser_clear_cache(patch):
+    patch.dict(Parser._cache, {'key': 'lark'})
+    Parser.clear_cache()
+    assert Parser._cache == {}
+
+
 def test_parser_parse(patch, parser):
     """
     Ensures the build method can build the grammar
@@ -75,6 +241,16 @@ def test_parser_parse(patch, parser):
     patch.many(Parser, ['lark', 'transformer'])
     result = parser.parse('source')
     Parser.lark().parse.assert_called_with('source\n')
+    assert Parser.transformer.call_count == 0
+    assert result == Parser.lark().parse()
+
+
+def test_parser_parse_not_embedded(patch):
+    """
+    Ensures the tree is transformed when the transformer is not embedded
+    """
+    patch.many(Parser, ['lark', 'transformer'])
+    result = Parser(embed_transformer=False).parse('source')
     Parser.transformer().transform.assert_called_with(Parser.lark().parse())
     assert result == Parser.transformer().transform()
 
@@ -127,3 +303,112 @@ def test_parser_lex(patch, parser):
     result = parser.lex('source')
     Parser.lark().lex.assert_called_with('source')
     assert result == Parser.lark().lex()
+
+
+def test_parser_lexer(patch, parser):
+    patch.object(Parser, 'lark')
+    del Parser.lark().lexer
+    result = parser.lexer()
+    assert result == Parser.lark()._build_lexer()
+    assert Parser.lark().lexer == result
+
+
+def test_parser_lexer_built(patch, parser):
+    patch.object(Parser, 'lark')
+    assert parser.lexer() == Parser.lark().lexer
+    assert Parser.lark()._build_lexer.call_count == 0
+
+
+def test_parser_chunks():
+    stream = io.StringIO('one\ntwo\nthree\n')
+    assert list(Parser.chunks(stream, 5)) == ['one\ntwo\n', 'three\n']
+
+
+def test_parser_chunks_last():
+    stream = io.StringIO('one\ntwo')
+    assert list(Parser.chunks(stream, 100)) == ['one\ntwo']
+
+
+def test_parser_shift():
+    token = Token('NAME', 'name', 2, 1, 3)
+    token.end_line = 1
+    token.end_column = 7
+    result = Parser.shift(token, (10, 3, 5))
+    assert result is token
+    assert (token.line, token.column) == (3, 7)
+    assert (token.end_line, token.end_column) == (3, 11)
+    assert token.pos_in_stream == 12
+
+
+def test_parser_shift_lines():
+    token = Token('NAME', 'name', 2, 2, 3)
+    token.end_line = 2
+    token.end_column = 7
+    Parser.shift(token, (10, 3, 5))
+    assert (token.line, token.column) == (4, 3)
+    assert (token.end_line, token.end_column) == (4, 7)
+
+
+def test_parser_lex_part(patch, magic, parser):
+    patch.object(Parser, 'shift')
+    lexer = magic()
+    lexer.lex.return_value = ['one', 'two']
+    result = list(parser.lex_part(lexer, 'part', 'start'))
+    lexer.lex.assert_called_with('part')
+    Parser.shift.assert_called_with('two', 'start')
+    assert result == [Parser.shift(), Parser.shift()]
+
+
+def test_parser_lex_part_error(parser):
+    with raises(UnexpectedCharacters) as e:
+        list(parser.lex_part(parser.lexer(), 'a\n?', (10, 3, 5)))
+    assert (e.value.line, e.value.column) == (4, 1)
+    assert e.value.pos_in_stream == 12
+
+
+def test_parser_stream_tokens(patch, parser):
+    """
+    Ensures the last token of a chunk is lexed again with the next chunk
+    """
+    patch.many(Parser, ['lexer', 'lex_part'])
+    first = [Token('NAME', 'a', 0, 1, 1), Token('_NL', '\n', 5, 1, 6)]
+    last = [Token('_NL', '\nb = 2\n', 5, 1, 6)]
+    Parser.lex_part.side_effect = [iter(first), iter(last), iter(last)]
+    result = list(parser.stream_tokens(['a = 1\n', 'b = 2\n']))
+    Parser.lex_part.assert_called_with(Parser.lexer(), '\nb = 2\n',
+                                       (5, 1, 6))
+    assert result == [first[0], last[0]]
+
+
+def test_parser_stream_tokens_open_string(parser):
+    """
+    Ensures strings spanning chunks are found
+    """
+    result = list(parser.stream_tokens(["a = 'one\n", "two'\n"]))
+    assert [token.type for token in result] == ['NAME', 'EQUALS',
+                                                'SINGLE_QUOTED', '_NL']
+
+
+def test_parser_stream_tokens_error(parser):
+    with raises(UnexpectedCharacters):
+        list(parser.stream_tokens(['a = ?\n', 'b = 1\n']))
+
+
+def test_parser_iter_tokens(patch, parser):
+    patch.many(Parser, ['indenter', 'stream_tokens', 'chunks'])
+    patch.object(Story, 'clean_chunks')
+    stream = io.StringIO('source')
+    result = parser.iter_tokens(stream)
+    Parser.chunks.assert_called_with(stream, 8192)
+    Story.clean_chunks.assert_called_with(Parser.chunks())
+    Parser.stream_tokens.assert_called_with(Story.clean_chunks())
+    Parser.indenter().process.assert_called_with(Parser.stream_tokens())
+    assert result == Parser.indenter().process()
+
+
+def test_parser_iter_tokens_string(patch, parser):
+    patch.many(Parser, ['indenter', 'stream_tokens', 'chunks'])
+    parser.iter_tokens('source', chunk_size=10)
+    stream = Parser.chunks.call_args[0][0]
+    assert stream.read() == 'source'
+    assert Parser.chunks.call_args[0][1] == 10
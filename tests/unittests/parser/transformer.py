@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from lark import Transformer as LarkTransformer
+from lark.lexer import Token
 
 from pytest import mark, raises
 
@@ -11,6 +12,31 @@ def test_transformer():
     assert issubclass(Transformer, LarkTransformer)
 
 
+def test_transformer_init(patch):
+    patch.object(Transformer, 'builder')
+    Transformer(rules=['start', 'arguments'])
+    Transformer.builder.assert_called_once_with('start')
+
+
+def test_transformer_builder():
+    transformer = Transformer()
+    result = transformer.builder('rule')
+    assert transformer.rule is result
+    assert result(['matches']) == Tree('rule', ['matches'])
+
+
+def test_transformer_tree(patch):
+    patch.object(Tree, 'locate')
+    result = Transformer.tree('rule', ['matches'])
+    assert Tree.locate.call_count == 1
+    assert result == Tree('rule', ['matches'])
+
+
+def test_transformer_tree_position():
+    token = Token('WORD', 'word', line=1, column=1)
+    assert Transformer.tree('rule', [token]).position == (1, 1, 1, 1)
+
+
 def test_transformer_arguments():
     assert Transformer().arguments('matches') == Tree('arguments', 'matches')
 
@@ -45,3 +71,22 @@ def test_transformer_rules(rule):
     assert isinstance(result, Tree)
     assert result.data == rule
     assert result.children == ['matches']
+
+
+def test_transformer_rules_position():
+    token = Token('WORD', 'word', line=1, column=1)
+    result = Transformer().start([token])
+    assert result.position == (1, 1, 1, 1)
+
+
+def test_transformer_rules_cached():
+    """
+    Ensures the builder of a rule is created only once
+    """
+    transformer = Transformer()
+    assert transformer.start is transformer.start
+
+
+def test_transformer_rules_special():
+    with raises(AttributeError):
+        Transformer().__special__
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import copy
+
 from lark.lexer import Token
 from lark.tree import Tree as LarkTree
 
-from pytest import fixture, mark
+from pytest import fixture, mark, raises
 
 from storyscript.parser import Tree
 from storyscript.version import version
@@ -18,8 +20,66 @@ def dictionary():
     return {'script': {}}
 
 
-def test_tree():
-    assert issubclass(Tree, LarkTree)
+def test_tree(tree):
+    assert tree.data == 'data'
+    assert tree.children == []
+    assert tree.first is None
+    assert tree.last is None
+    assert tree._index is None
+    assert tree._indexed is None
+
+
+def test_tree_slots(tree):
+    slots = ('data', 'children', 'first', 'last', '_index', '_indexed')
+    assert Tree.__slots__ == slots
+    assert hasattr(tree, '__dict__') is False
+
+
+def test_tree_paths():
+    assert isinstance(Tree.paths, dict)
+
+
+def test_tree_index():
+    first = Tree('inner', [])
+    tree = Tree('rule', [Token('test', 'test'), first, Tree('inner', [])])
+    assert tree.index() == {'inner': first}
+
+
+def test_tree_index_cached():
+    tree = Tree('rule', [Tree('inner', [])])
+    assert tree.index() is tree.index()
+
+
+def test_tree_index_children_reassigned():
+    tree = Tree('rule', [Tree('inner', [])])
+    tree.index()
+    tree.children = [Tree('other', [])]
+    assert list(tree.index()) == ['other']
+
+
+def test_tree_index_insert():
+    tree = Tree('rule', [Tree('inner', [])])
+    tree.index()
+    tree.insert(Tree('other', []))
+    assert list(tree.index()) == ['other', 'inner']
+
+
+def test_tree_index_replace():
+    tree = Tree('rule', [Tree('inner', [])])
+    tree.index()
+    tree.replace(0, Tree('other', []))
+    assert list(tree.index()) == ['other']
+
+
+def test_tree_shards(patch):
+    patch.dict(Tree.paths, {}, clear=True)
+    assert Tree.shards('a.b') == ['a', 'b']
+    assert Tree.paths == {'a.b': ['a', 'b']}
+
+
+def test_tree_shards_cached(patch):
+    patch.dict(Tree.paths, {'a.b': 'cached'})
+    assert Tree.shards('a.b') == 'cached'
 
 
 def test_tree_walk():
@@ -39,6 +99,10 @@ def test_tree_walk_token():
     assert result == inner_tree
 
 
+def test_tree_walk_missing():
+    assert Tree.walk(Tree('rule', []), 'inner') is None
+
+
 def test_tree_node(patch):
     patch.object(Tree, 'walk')
     tree = Tree('rule', [])
@@ -57,23 +121,128 @@ def test_tree_child_overflow():
     assert tree.child(1) is None
 
 
+def test_tree_boundaries_token():
+    token = Token('WORD', 'word')
+    assert Tree.boundaries(token) == (token, token)
+
+
+def test_tree_boundaries_tree():
+    tree = Tree('path', [])
+    tree.first = Token('WORD', 'first')
+    tree.last = Token('WORD', 'last')
+    assert Tree.boundaries(tree) == (tree.first, tree.last)
+
+
+def test_tree_boundaries_tree_locate(patch):
+    patch.object(Tree, 'locate')
+    tree = Tree('path', [])
+    assert Tree.boundaries(tree) == (None, None)
+    assert Tree.locate.call_count == 1
+
+
+def test_tree_boundaries_other():
+    assert Tree.boundaries('child') == (None, None)
+
+
+def test_tree_locate():
+    first = Token('WORD', 'first')
+    last = Token('WORD', 'last')
+    tree = Tree('outer', [first, Tree('path', [last])])
+    tree.locate()
+    assert tree.first is first
+    assert tree.last is last
+
+
+def test_tree_locate_end_missing():
+    first = Token('WORD', 'first')
+    tree = Tree('outer', [first, Tree('empty', [])])
+    tree.locate()
+    assert tree.last is first
+
+
+def test_tree_locate_empty(tree):
+    tree.first = Token('WORD', 'first')
+    tree.locate()
+    assert tree.first is None
+    assert tree.last is None
+
+
+def test_tree_position():
+    first = Token('WORD', 'first', line=1, column=1)
+    last = Token('WORD', 'last', line=2, column=1)
+    last.end_line = 2
+    last.end_column = 5
+    tree = Tree('outer', [first, last])
+    assert tree.position == (1, 1, 2, 5)
+
+
+def test_tree_position_no_end():
+    tree = Tree('outer', [Token('WORD', 'word', line=1, column=2)])
+    assert tree.position == (1, 2, 1, 2)
+
+
+def test_tree_position_empty(tree):
+    assert tree.position is None
+
+
 def test_tree_line():
     tree = Tree('outer', [Tree('path', [Token('WORD', 'word', line=1)])])
     assert tree.line() == '1'
 
 
+def test_tree_line_first(tree):
+    tree.first = Token('WORD', 'word', line=2)
+    assert tree.line() == '2'
+
+
+def test_tree_line_fake(tree):
+    """
+    Ensures the line of a tree follows the line of its first token
+    """
+    token = Token('WORD', 'word', line=2)
+    tree = Tree('outer', [Tree('path', [token])])
+    tree.locate()
+    token.line = '1.1'
+    assert tree.line() == '1.1'
+
+
+def test_tree_line_empty(tree):
+    assert tree.line() is None
+
+
 def test_tree_insert():
     tree = Tree('tree', [])
     tree.insert('child')
     assert tree.children == ['child']
 
 
+def test_tree_insert_position():
+    tree = Tree('tree', [Token('WORD', 'word', line=2)])
+    tree.locate()
+    tree.insert(Token('WORD', 'word', line=1))
+    assert tree.first is None
+    assert tree.line() == '1'
+
+
+def test_tree_insert_index():
+    tree = Tree('tree', ['one', 'three'])
+    tree.insert('two', index=1)
+    assert tree.children == ['one', 'two', 'three']
+
+
 def test_tree_replace():
     tree = Tree('tree', ['old'])
     tree.replace(0, 'new')
     assert tree.children == ['new']
 
 
+def test_tree_replace_position():
+    tree = Tree('tree', [Token('WORD', 'word', line=2)])
+    tree.locate()
+    tree.replace(0, Token('WORD', 'word', line=1))
+    assert tree.line() == '1'
+
+
 def test_tree_extract_path():
     tree = Tree('path', [Token('NAME', 'one')])
     assert tree.extract_path() == 'one'
@@ -93,6 +262,34 @@ def test_tree_attributes(patch):
     assert result == Tree.node()
 
 
+def test_tree_attributes_private(tree):
+    with raises(AttributeError):
+        tree._private
+
+
+def test_tree_iter_subtrees():
+    first = Tree('first', [Tree('nested', [])])
+    second = Tree('second', ['token'])
+    tree = Tree('start', [first, 'token', second])
+    result = [subtree.data for subtree in tree.iter_subtrees()]
+    assert result == ['nested', 'first', 'second', 'start']
+
+
+def test_tree_iter_subtrees_shared():
+    """
+    Ensures subtrees found more than once are given once
+    """
+    shared = Tree('path', [])
+    tree = Tree('start', [Tree('one', [shared]), Tree('two', [shared])])
+    assert list(tree.iter_subtrees()).count(shared) == 1
+
+
+def test_tree_find_data():
+    expected = Tree('assignment', ['x'])
+    tree = Tree('start', [Tree('block', [expected]), expected])
+    assert list(tree.find_data('assignment')) == [expected]
+
+
 def test_tree_find():
     """
     Ensures Tree.find can find the correct subtree.
@@ -100,3 +297,33 @@ def test_tree_find():
     expected = Tree('assignment', ['x'])
     tree = Tree('start', [Tree('block', [Tree('line', [expected])])])
     assert tree.find('assignment') == [expected]
+
+
+def test_tree_pretty():
+    tree = Tree('start', [Tree('path', ['x']), 'token'])
+    assert tree.pretty() == 'start\n  path\tx\n  token\n'
+
+
+def test_tree_deepcopy():
+    token = Token('WORD', 'word', line=1)
+    tree = Tree('start', [Tree('path', [token])])
+    tree.locate()
+    result = copy.deepcopy(tree)
+    assert result == tree
+    assert result.children[0] is not tree.children[0]
+    assert result.first is None
+
+
+def test_tree_eq():
+    assert Tree('path', ['x']) == Tree('path', ['x'])
+    assert Tree('path', ['x']) == LarkTree('path', ['x'])
+    assert Tree('path', ['x']) != Tree('path', ['y'])
+    assert (Tree('path', ['x']) == 'path') is False
+
+
+def test_tree_hash():
+    assert hash(Tree('path', ['x'])) == hash(('path', ('x',)))
+
+
+def test_tree_repr():
+    assert repr(Tree('path', ['x'])) == "Tree(path, ['x'])"
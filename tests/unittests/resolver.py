@@ -3,6 +3,7 @@ import re
 
 from pytest import mark, raises
 
+from storyscript.expression import Expression
 from storyscript.resolver import Resolver
 
 
@@ -35,6 +36,48 @@ def test_resolver_string():
     assert Resolver.string('hello', {}) == 'hello'
 
 
+def test_resolver_string_values(patch):
+    patch.object(Resolver, 'values', return_value=[1])
+    patch.object(Resolver, 'split')
+    result = Resolver.string('a {}', 'data', values=['value'])
+    Resolver.values.assert_called_with(['value'], 'data')
+    assert Resolver.split.call_count == 0
+    assert result == 'a 1'
+
+
+def test_resolver_string_braces(patch):
+    """
+    Ensures strings with literal braces are resolved by joining their
+    segments
+    """
+    values = [{'$OBJECT': 'path', 'paths': ['a']}]
+    patch.object(Resolver, 'split', return_value=['{ ', values[0], ' }'])
+    result = Resolver.string('{ {} }', {'a': 1}, values=values)
+    Resolver.split.assert_called_with('{ {} }', values)
+    assert result == '{ 1 }'
+
+
+def test_resolver_string_segments(patch):
+    patch.object(Resolver, 'split')
+    values = [{'$OBJECT': 'path', 'paths': ['a']}]
+    segments = ['{ ', values[0], ' }']
+    result = Resolver.string('{ {} }', {'a': 1}, values, segments)
+    assert Resolver.split.call_count == 0
+    assert result == '{ 1 }'
+
+
+@mark.parametrize('string, values, segments', [
+    ('hello', [], ['hello']),
+    ('{}', ['a'], ['a']),
+    ('hello {}!', ['a'], ['hello ', 'a', '!']),
+    ('{}{}', ['a', 'b'], ['a', 'b']),
+    ('{} and {}', ['a', 'b'], ['a', ' and ', 'b']),
+    ('} {} {', ['a'], ['} ', 'a', ' {'])
+])
+def test_resolver_split(string, values, segments):
+    assert Resolver.split(string, values) == segments
+
+
 def test_resolver_object_str_str():
     items = [
         [{'$OBJECT': 'string', 'string': 'example'},
@@ -56,6 +99,57 @@ def test_resolver_file_values(patch):
     assert result == 'a.py'
 
 
+def test_resolver_flags():
+    assert Resolver.flags('im') == re.IGNORECASE | re.MULTILINE
+
+
+def test_resolver_flags_none():
+    assert Resolver.flags(None) == 0
+
+
+def test_resolver_flags_global():
+    assert Resolver.flags('g') == 0
+
+
+def test_resolver_flags_unknown():
+    with raises(ValueError):
+        Resolver.flags('z')
+
+
+def test_resolver_regexp(patch):
+    patch.object(Resolver, '_regexps', {})
+    patch.object(re, 'compile')
+    patch.object(Resolver, 'flags')
+    result = Resolver.regexp('/regexp/', 'i')
+    Resolver.flags.assert_called_with('i')
+    re.compile.assert_called_with('regexp', Resolver.flags())
+    assert Resolver._regexps == {('/regexp/', 'i'): re.compile()}
+    assert result == re.compile()
+
+
+def test_resolver_regexp_slashes(patch):
+    patch.object(Resolver, '_regexps', {})
+    patch.object(re, 'compile')
+    Resolver.regexp('regexp')
+    re.compile.assert_called_with('regexp', 0)
+
+
+def test_resolver_regexp_cached(patch):
+    patch.object(Resolver, '_regexps', {('regexp', None): 'compiled'})
+    assert Resolver.regexp('regexp') == 'compiled'
+
+
+def test_resolver_regexp_size(patch):
+    """
+    Ensures the oldest regexp is dropped when the cache is full
+    """
+    patch.object(Resolver, '_regexps', {('old', None): 'old'})
+    patch.object(Resolver, 'regexps_size', 1)
+    patch.object(re, 'compile')
+    Resolver.regexp('new')
+    assert Resolver._regexps == {('new', None): re.compile()}
+
+
 def test_resolver_argument(patch):
     patch.object(Resolver, 'object')
     result = Resolver.argument('argument', {})
@@ -90,6 +184,97 @@ def test_resolver_path_key_error():
     assert Resolver.path(['a', 'b'], {}) is None
 
 
+def test_resolver_path_accessor(patch):
+    patch.object(Resolver, 'accessor')
+    result = Resolver.path(['a'], 'data')
+    Resolver.accessor.assert_called_with(['a'])
+    Resolver.accessor().assert_called_with('data')
+    assert result == Resolver.accessor()()
+
+
+def test_resolver_accessor(patch):
+    patch.object(Resolver, '_paths', {})
+    patch.object(Resolver, 'compile_accessor')
+    result = Resolver.accessor(['a', 'b'])
+    Resolver.compile_accessor.assert_called_with(['a', 'b'])
+    assert Resolver._paths == {('a', 'b'): Resolver.compile_accessor()}
+    assert result == Resolver.compile_accessor()
+
+
+def test_resolver_accessor_size(patch):
+    """
+    Ensures the oldest path is dropped when the cache is full
+    """
+    patch.object(Resolver, '_paths', {('old',): 'old'})
+    patch.object(Resolver, 'paths_size', 1)
+    patch.object(Resolver, 'compile_accessor')
+    Resolver.accessor(['new'])
+    assert Resolver._paths == {('new',): Resolver.compile_accessor()}
+
+
+def test_resolver_accessor_cached(patch):
+    patch.object(Resolver, '_paths', {('a', 'b'): 'accessor'})
+    assert Resolver.accessor(['a', 'b']) == 'accessor'
+
+
+def test_resolver_accessor_objects(patch):
+    """
+    Ensures paths with objects are compiled without being kept
+    """
+    patch.object(Resolver, '_paths', {})
+    patch.object(Resolver, 'compile_accessor')
+    paths = ['a', {'$OBJECT': 'path', 'paths': ['b']}]
+    result = Resolver.accessor(paths)
+    Resolver.compile_accessor.assert_called_with(paths)
+    assert result == Resolver.compile_accessor()
+    assert Resolver._paths == {}
+
+
+@mark.parametrize('path, result', [
+    ('0', 0),
+    ('10', 10),
+    ('a', 'a'),
+    ({'$OBJECT': 'path'}, {'$OBJECT': 'path'})
+])
+def test_resolver_segment(path, result):
+    assert Resolver.segment(path) == result
+
+
+@mark.parametrize('paths, data, result', [
+    (['a'], {'a': 1}, 1),
+    (['a'], {}, None),
+    (['a'], None, None),
+    (['a', 'b'], {'a': {'b': 1}}, 1),
+    (['a', 'b'], {'a': 1}, None),
+    (['a', '0'], {'a': [1]}, 1),
+    (['a', '1'], {'a': [1]}, None),
+    (['a', 'b', 'c'], {'a': {'b': {'c': 1}}}, 1),
+    (['a', 'b', 'c'], {'a': {'b': {}}}, None),
+    (['a', '1', 'b'], {'a': [None, {'b': 1}]}, 1)
+])
+def test_resolver_compile_accessor(paths, data, result):
+    assert Resolver.compile_accessor(paths)(data) == result
+
+
+def test_resolver_compile_accessor_dynamic(patch):
+    patch.object(Resolver, 'compile_dynamic_accessor')
+    paths = ['a', '0', {'$OBJECT': 'path', 'paths': ['b']}]
+    result = Resolver.compile_accessor(paths)
+    segments = ['a', 0, {'$OBJECT': 'path', 'paths': ['b']}]
+    Resolver.compile_dynamic_accessor.assert_called_with(segments)
+    assert result == Resolver.compile_dynamic_accessor()
+
+
+@mark.parametrize('segments, data, result', [
+    (['a', {'$OBJECT': 'path', 'paths': ['b']}], {'a': {'c': 1}, 'b': 'c'}, 1),
+    (['a', {'$OBJECT': 'string', 'string': 'c'}], {'a': {'c': 1}}, 1),
+    ([{'$OBJECT': 'path', 'paths': ['b']}, 0], {'b': 'a', 'a': [1]}, 1),
+    (['a', {'$OBJECT': 'path', 'paths': ['b']}], {'a': {'c': 1}}, None)
+])
+def test_resolver_compile_dynamic_accessor(segments, data, result):
+    assert Resolver.compile_dynamic_accessor(segments)(data) == result
+
+
 def test_resolver_dictionary(patch):
     patch.object(Resolver, 'resolve')
     result = Resolver.dictionary({'key': 'value'}, 'data')
@@ -129,6 +314,13 @@ def test_resolver_method_notlike(mocker, match, expectation):
     assert result is expectation
 
 
+def test_resolver_method_like_string(patch):
+    patch.object(Resolver, 'regexp')
+    Resolver.method('like', 'left', '/right/')
+    Resolver.regexp.assert_called_with('/right/')
+    Resolver.regexp().match.assert_called_with('left')
+
+
 def test_resolver_method_in():
     assert Resolver.method('in', 'left', ['left'])
 
@@ -157,11 +349,21 @@ def test_resolver_method_value_error():
 
 def test_resolver_expression(patch):
     patch.object(Resolver, 'values', return_value=[1])
-    patch.object(Resolver, 'stringify', return_value='1')
+    patch.object(Expression, 'compile')
     result = Resolver.expression('data', '{} == 1', 'values')
     Resolver.values.assert_called_with('values', data='data')
-    Resolver.stringify.assert_called_with(1)
-    assert result
+    Expression.compile.assert_called_with('{} == 1')
+    Expression.compile().assert_called_with([1])
+    assert result == Expression.compile()()
+
+
+def test_resolver_expression_strings():
+    """
+    Ensures strings are compared as they are, even with quotes
+    """
+    values = [{'$OBJECT': 'value', 'value': 'a"""b'},
+              {'$OBJECT': 'value', 'value': 'a"""b'}]
+    assert Resolver.expression({}, '{} == {}', values) is True
 
 
 def test_resolver_object_string(patch):
@@ -174,12 +376,25 @@ def test_resolver_object_string(patch):
 
 def test_resolver_object_string_values(patch):
     patch.object(Resolver, 'string')
-    item = {'$OBJECT': 'string', 'string': 'message', 'values': 'values'}
+    item = {'$OBJECT': 'string', 'string': 'message', 'values': 'values',
+            'segments': 'segments'}
     result = Resolver.object(item, 'data')
-    Resolver.string.assert_called_with('message', 'data', values='values')
+    Resolver.string.assert_called_with('message', 'data', values='values',
+                                       segments='segments')
     assert result == Resolver.string()
 
 
+def test_resolver_object_string_stateless():
+    """
+    Ensures strings with values are not kept by the resolver between calls
+    """
+    item = {'$OBJECT': 'string', 'string': 'hi {}',
+            'values': [{'$OBJECT': 'path', 'paths': ['a']}]}
+    assert Resolver.object(item, {'a': 1}) == 'hi 1'
+    item['values'] = [{'$OBJECT': 'path', 'paths': ['b']}]
+    assert Resolver.object(item, {'b': 2}) == 'hi 2'
+
+
 def test_resolver_object_path(patch):
     patch.object(Resolver, 'path')
     path = {'$OBJECT': 'path', 'paths': ['example']}
@@ -197,10 +412,18 @@ def test_resolver_object_dict(patch):
 
 
 def test_resolver_object_regexp(patch):
-    patch.object(re, 'compile')
+    patch.object(Resolver, 'regexp')
     expression = {'$OBJECT': 'regexp', 'regexp': 'regular'}
+    result = Resolver.object(expression, 'data')
+    Resolver.regexp.assert_called_with('regular', None)
+    assert result == Resolver.regexp()
+
+
+def test_resolver_object_regexp_flags(patch):
+    patch.object(Resolver, 'regexp')
+    expression = {'$OBJECT': 'regexp', 'regexp': 'regular', 'flags': 'i'}
     Resolver.object(expression, 'data')
-    re.compile.assert_called_with('regular')
+    Resolver.regexp.assert_called_with('regular', 'i')
 
 
 def test_resolver_object_value():
@@ -309,3 +532,172 @@ def test_resolver_resolve_list(patch):
     result = Resolver.resolve([], 'data')
     Resolver.list.assert_called_with([], 'data')
     assert result == Resolver.list()
+
+
+def test_resolver_compile(patch):
+    patch.object(Resolver, 'compile_object')
+    result = Resolver.compile({'$OBJECT': 'value'})
+    Resolver.compile_object.assert_called_with({'$OBJECT': 'value'})
+    assert result == Resolver.compile_object()
+
+
+def test_resolver_compile_list(patch):
+    patch.object(Resolver, 'compile_list')
+    result = Resolver.compile(['item'])
+    Resolver.compile_list.assert_called_with(['item'])
+    assert result == Resolver.compile_list()
+
+
+def test_resolver_constant():
+    assert Resolver.constant('value')('data') == 'value'
+
+
+def test_resolver_compile_other():
+    assert Resolver.compile('item')('data') == 'item'
+
+
+def test_resolver_compile_values(patch):
+    patch.object(Resolver, 'compile', return_value=lambda data: data)
+    result = Resolver.compile_values(['one', {'two': 2}])
+    Resolver.compile.assert_called_with({'two': 2})
+    assert result('data') == ['data', 'data']
+
+
+def test_resolver_compile_values_plain():
+    items = ['one', 2]
+    result = Resolver.compile_values(items)('data')
+    assert result == items
+    assert result is not items
+
+
+def test_resolver_compile_string():
+    assert Resolver.compile_string('hello')({}) == 'hello'
+
+
+def test_resolver_compile_string_values():
+    values = [{'$OBJECT': 'path', 'paths': ['name']}]
+    function = Resolver.compile_string('hello {}', values)
+    assert function({'name': 'world'}) == 'hello world'
+
+
+def test_resolver_compile_string_segments():
+    segments = ['a ', {'$OBJECT': 'path', 'paths': ['b']}, ' c']
+    function = Resolver.compile_string('ignored', ['ignored'], segments)
+    assert function({'b': 1}) == 'a 1 c'
+
+
+def test_resolver_compile_string_braces():
+    """
+    Ensures literal braces are kept, as the string is not formatted
+    """
+    values = [{'$OBJECT': 'path', 'paths': ['b']}]
+    assert Resolver.compile_string('{ {} }', values)({'b': 1}) == '{ 1 }'
+
+
+def test_resolver_compile_path(patch):
+    patch.object(Resolver, 'accessor')
+    result = Resolver.compile_path(['a'])
+    Resolver.accessor.assert_called_with(['a'])
+    assert result == Resolver.accessor()
+
+
+def test_resolver_compile_method(patch):
+    patch.object(Resolver, 'method')
+    left = {'$OBJECT': 'value', 'value': 1}
+    right = {'$OBJECT': 'path', 'paths': ['a']}
+    result = Resolver.compile_method('is', left, right)({'a': 2})
+    Resolver.method.assert_called_with('is', 1, 2)
+    assert result == Resolver.method()
+
+
+@mark.parametrize('method, left, result', [
+    ('like', 'abc', True),
+    ('like', 'bc', False),
+    ('notlike', 'abc', False),
+    ('notlike', 'bc', True)
+])
+def test_resolver_compile_method_like(patch, method, left, result):
+    patch.object(Resolver, 'method')
+    patch.object(Resolver, 'regexp', return_value=re.compile('a'))
+    right = {'$OBJECT': 'regexp', 'regexp': '/a/', 'flags': 'i'}
+    left = {'$OBJECT': 'value', 'value': left}
+    function = Resolver.compile_method(method, left, right)
+    Resolver.regexp.assert_called_with('/a/', 'i')
+    assert function({}) is result
+    assert Resolver.method.call_count == 0
+
+
+def test_resolver_compile_expression(patch):
+    patch.object(Expression, 'compile')
+    values = [{'$OBJECT': 'value', 'value': 1}]
+    result = Resolver.compile_expression('{} == 1', values)('data')
+    Expression.compile.assert_called_with('{} == 1')
+    Expression.compile().assert_called_with([1])
+    assert result == Expression.compile()()
+
+
+def test_resolver_compile_dict():
+    items = [[{'$OBJECT': 'string', 'string': 'key'},
+              {'$OBJECT': 'path', 'paths': ['a']}]]
+    assert Resolver.compile_dict(items)({'a': 1}) == {'key': 1}
+
+
+def test_resolver_compile_dictionary():
+    dictionary = {'key': {'$OBJECT': 'path', 'paths': ['a']}, 'other': 2}
+    result = Resolver.compile_dictionary(dictionary)({'a': 1})
+    assert result == {'key': 1, 'other': 2}
+
+
+@mark.parametrize('item', [
+    {'$OBJECT': 'string', 'string': 'string'},
+    {'$OBJECT': 'file', 'string': '{}.py',
+     'values': [{'$OBJECT': 'path', 'paths': ['a']}]},
+    {'$OBJECT': 'path', 'paths': ['a']},
+    {'$OBJECT': 'value', 'value': 1},
+    {'$OBJECT': 'method', 'method': 'is',
+     'left': {'$OBJECT': 'value', 'value': 1},
+     'right': {'$OBJECT': 'path', 'paths': ['a']}},
+    {'$OBJECT': 'expression', 'expression': '{} > "a"',
+     'values': [{'$OBJECT': 'path', 'paths': ['a']}]},
+    {'$OBJECT': 'argument', 'name': 'arg',
+     'argument': {'$OBJECT': 'path', 'paths': ['a']}},
+    {'$OBJECT': 'dict', 'items': [[{'$OBJECT': 'string', 'string': 'k'},
+                                   {'$OBJECT': 'path', 'paths': ['a']}]]},
+    {'$OBJECT': 'list', 'items': [{'$OBJECT': 'path', 'paths': ['a']}, 2]},
+    {'$OBJECT': 'mutation', 'mutation': 'length', 'arguments': []},
+    {'key': {'$OBJECT': 'path', 'paths': ['a']}},
+])
+def test_resolver_compile_object(item):
+    """
+    Ensures compiled objects resolve as objects do
+    """
+    data = {'a': 'abc'}
+    assert Resolver.compile_object(item)(data) == Resolver.object(item, data)
+
+
+def test_resolver_compile_object_regexp(patch):
+    patch.object(Resolver, 'regexp')
+    item = {'$OBJECT': 'regexp', 'regexp': 'a', 'flags': 'i'}
+    function = Resolver.compile_object(item)
+    Resolver.regexp.assert_called_with('a', 'i')
+    assert function({}) == Resolver.regexp()
+
+
+def test_resolver_compile_list_join():
+    items = ['a', {'$OBJECT': 'path', 'paths': ['b']}]
+    assert Resolver.compile_list(items)({'b': 'c'}) == 'a c'
+
+
+def test_resolver_compile_list_booleans():
+    assert Resolver.compile_list([True])({}) == [True]
+
+
+def test_resolver_compile_line(patch):
+    patch.object(Resolver, 'compile_values')
+    result = Resolver.compile_line({'args': ['args']})
+    Resolver.compile_values.assert_called_with(['args'])
+    assert result == Resolver.compile_values()
+
+
+def test_resolver_compile_line_no_args():
+    assert Resolver.compile_line({'args': None})('data') == []
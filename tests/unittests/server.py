@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import socket
+import socketserver
+
+from pytest import fixture
+
+from storyscript.app import App
+from storyscript.buildcache import BuildCache
+from storyscript.client import Client
+from storyscript.server import Handler, Server
+from storyscript.version import version
+
+
+@fixture
+def server(patch):
+    patch.init(Server)
+    server = Server()
+    server.path = 'path'
+    server.memory = BuildCache(directory=None, size=Server.size)
+    server.caches = {}
+    return server
+
+
+def test_handler_handle(magic):
+    handler = Handler.__new__(Handler)
+    handler.rfile = io.BytesIO(b'{"method": "ping"}\n')
+    handler.wfile = io.BytesIO()
+    handler.server = magic()
+    handler.server.respond.return_value = {'result': 'ok'}
+    handler.handle()
+    handler.server.respond.assert_called_with({'method': 'ping'})
+    assert handler.wfile.getvalue() == b'{"result": "ok"}\n'
+
+
+def test_handler_handle_invalid(magic):
+    handler = Handler.__new__(Handler)
+    handler.rfile = io.BytesIO(b'{\n')
+    handler.wfile = io.BytesIO()
+    handler.server = magic()
+    handler.server.respond.return_value = {}
+    handler.handle()
+    handler.server.respond.assert_called_with(None)
+
+
+def test_handler_handle_timeout(magic):
+    handler = Handler.__new__(Handler)
+    handler.rfile = magic()
+    handler.rfile.readline.side_effect = socket.timeout
+    handler.wfile = io.BytesIO()
+    handler.server = magic()
+    handler.handle()
+    assert handler.server.respond.call_count == 0
+    assert handler.wfile.getvalue() == b''
+
+
+def test_server_init(patch):
+    patch.init(socketserver.UnixStreamServer)
+    patch.object(Server, 'remove')
+    patch.object(os, 'umask', return_value='mask')
+    server = Server('path')
+    Server.remove.assert_called_with('path')
+    init = socketserver.UnixStreamServer.__init__
+    init.assert_called_with('path', Handler)
+    os.umask.assert_any_call(0o177)
+    os.umask.assert_called_with('mask')
+    assert server.path == 'path'
+    assert server.memory.directory is None
+    assert server.memory.size == Server.size
+    assert server.caches == {}
+
+
+def test_server_init_default(patch):
+    patch.init(socketserver.UnixStreamServer)
+    patch.object(Server, 'remove')
+    patch.object(Client, 'socket_path')
+    server = Server()
+    assert server.path == Client.socket_path()
+
+
+def test_server_remove(patch):
+    patch.object(os.path, 'exists', return_value=True)
+    patch.object(os, 'remove')
+    patch.object(Client, 'request', return_value=None)
+    Server.remove('path')
+    Client.request.assert_called_with('ping')
+    os.remove.assert_called_with('path')
+
+
+def test_server_remove_running(patch):
+    """
+    Ensures the socket of a running server is not removed
+    """
+    patch.object(os.path, 'exists', return_value=True)
+    patch.object(os, 'remove')
+    patch.object(Client, 'request')
+    Server.remove('path')
+    assert os.remove.call_count == 0
+
+
+def test_server_server_close(patch, server):
+    patch.object(socketserver.UnixStreamServer, 'server_close')
+    patch.object(os.path, 'exists', return_value=True)
+    patch.object(os, 'remove')
+    server.server_close()
+    assert socketserver.UnixStreamServer.server_close.call_count == 1
+    os.remove.assert_called_with('path')
+
+
+def test_server_build_cache(server):
+    assert server.build_cache('cwd', False) == server.memory
+
+
+def test_server_build_cache_directory(server):
+    result = server.build_cache('cwd', True)
+    assert result.directory == os.path.join('cwd', '.storyscript_cache')
+    assert result.size == Server.size
+    assert server.build_cache('cwd', True) == result
+
+
+def test_server_compile(patch, server):
+    patch.object(App, 'compile', return_value='results')
+    patch.object(os, 'chdir')
+    result = server.compile('cwd', 'path', debug=True, workers=2)
+    App.compile.assert_called_with('path', ebnf_file=None, debug=True,
+                                   cache=server.memory, workers=2)
+    os.chdir.assert_any_call('cwd')
+    os.chdir.assert_called_with(os.getcwd())
+    assert result == {'results': 'results', 'output': '', 'exited': False,
+                      'code': None, 'error': None}
+
+
+def test_server_compile_exit(patch, server):
+    """
+    Ensures what is printed before exiting is returned
+    """
+    def compile(*args, **kwargs):
+        print('error')
+        exit(2)
+
+    patch.object(App, 'compile', side_effect=compile)
+    patch.object(os, 'chdir')
+    result = server.compile('cwd', 'path')
+    assert result['output'] == 'error\n'
+    assert result['exited'] is True
+    assert result['code'] == 2
+
+
+def test_server_compile_error(patch, server):
+    patch.object(App, 'compile', side_effect=ValueError('error'))
+    patch.object(os, 'chdir')
+    result = server.compile('cwd', 'path')
+    assert 'ValueError: error' in result['error']
+    assert result['results'] is None
+
+
+def test_server_respond(patch, server):
+    patch.object(Server, 'compile')
+    request = {'id': 1, 'method': 'compile',
+               'params': {'cwd': 'cwd', 'path': 'path', 'version': version}}
+    result = server.respond(request)
+    Server.compile.assert_called_with(cwd='cwd', path='path')
+    assert result == {'jsonrpc': '2.0', 'id': 1, 'result': Server.compile()}
+
+
+def test_server_respond_ping(server):
+    result = server.respond({'id': 1, 'method': 'ping'})
+    assert result == {'jsonrpc': '2.0', 'id': 1, 'result': version}
+
+
+def test_server_respond_invalid(server):
+    result = server.respond(None)
+    assert result['error']['code'] == -32700
+
+
+def test_server_respond_method(server):
+    result = server.respond({'id': 1, 'method': 'unknown'})
+    assert result['error']['code'] == -32601
+
+
+def test_server_respond_version(server):
+    """
+    Ensures requests from other versions are refused
+    """
+    request = {'id': 1, 'method': 'compile', 'params': {'version': '0'}}
+    assert server.respond(request)['error']['code'] == 1
+
+
+def test_server_respond_params(server):
+    request = {'id': 1, 'method': 'compile',
+               'params': {'version': version, 'other': 1}}
+    assert server.respond(request)['error']['code'] == -32602
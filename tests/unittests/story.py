@@ -1,9 +1,8 @@
 # -*- coding: utf-8 -*-
 import io
 import os
-import re
 
-from pytest import fixture, raises
+from pytest import fixture, mark, raises
 
 from storyscript.compiler import Compiler
 from storyscript.parser import Parser
@@ -23,11 +22,57 @@ def test_story_clean_source(patch):
     """
     Ensures that a story is cleaned correctly
     """
-    patch.object(re, 'sub')
+    patch.object(Story, 'comments')
     result = Story.clean_source('source')
-    expression = '(?<=###)\s(.*|\\n)+(?=\s###)|#(.*)'
-    re.sub.assert_called_with(expression, '', 'source')
-    assert result == re.sub()
+    Story.comments.sub.assert_called_with(Story.uncomment, 'source')
+    assert result == Story.comments.sub()
+
+
+def test_story_uncomment(magic):
+    match = magic()
+    match.group.return_value = '###\ncomment\n###'
+    assert Story.uncomment(match) == '\n\n'
+
+
+def test_story_uncomment_string(magic):
+    match = magic()
+    match.group.return_value = '"#"'
+    assert Story.uncomment(match) == '"#"'
+
+
+@mark.parametrize('source, expected', [
+    ('a = 1 # comment\nb = 2', 'a = 1 \nb = 2'),
+    ('###\ncomment\n###\na = 1', '\n\n\na = 1'),
+    ('### title ###\na = 1', '\na = 1'),
+    ('###\na\n### b\nc = 1\n###\nd\n###', '\n\n\nc = 1\n\n\n'),
+    ('### comment\na = 1', '\na = 1'),
+    ('a = "#" # comment', 'a = "#" '),
+    ("a = 'b\n#c' # it's", "a = 'b\n#c' "),
+    ("a = /don't/ # note\nb = 'x'\n", "a = /don't/ \nb = 'x'\n"),
+    ('a = /#/ # note', 'a = /#/ '),
+    ('alpine echo pattern:/a#/ # b', 'alpine echo pattern:/a#/ '),
+    ('alpine/echo x # see foo/bar\nb = 1', 'alpine/echo x \nb = 1'),
+    ('a = 4 / 2 # half of a/b\nb = 1', 'a = 4 / 2 \nb = 1'),
+])
+def test_story_clean_source_comments(source, expected):
+    """
+    Ensures comments are removed, keeping the strings and the line numbers
+    """
+    assert Story.clean_source(source) == expected
+
+
+@mark.parametrize('chunks, expected', [
+    (['a = 1 # one\n', 'b = 2\n'], ['a = 1 \n', 'b = 2\n']),
+    (["a = 'b\n", "#c' # d\n"], ['a = ', "'b\n#c' \n"]),
+    (['###\n', 'a = 1\n', '###\n', 'b = 2\n'], ['\n\n\n', 'b = 2\n']),
+    (['a = "#\n'], ['a = ', '"\n'])
+])
+def test_story_clean_chunks(chunks, expected):
+    """
+    Ensures comments are removed chunk by chunk, keeping open strings and
+    block comments for the next chunks
+    """
+    assert list(Story.clean_chunks(chunks)) == expected
 
 
 def test_story_read(patch):
@@ -112,7 +157,8 @@ def test_story_compile(patch, story):
     patch.object(Compiler, 'compile')
     story.tree = 'tree'
     story.compile()
-    Compiler.compile.assert_called_with(story.tree, debug=False)
+    Compiler.compile.assert_called_with(story.tree, debug=False,
+                                        segments=False)
     assert story.compiled == Compiler.compile()
 
 
@@ -120,13 +166,43 @@ def test_story_compile_debug(patch, story):
     patch.object(Compiler, 'compile')
     story.tree = 'tree'
     story.compile(debug='debug')
-    Compiler.compile.assert_called_with(story.tree, debug='debug')
+    Compiler.compile.assert_called_with(story.tree, debug='debug',
+                                        segments=False)
+
+
+def test_story_compile_segments(patch, story):
+    patch.object(Compiler, 'compile')
+    story.tree = 'tree'
+    story.compile(segments=True)
+    Compiler.compile.assert_called_with(story.tree, debug=False,
+                                        segments=True)
 
 
 def test_story_lex(patch, story):
     patch.init(Parser)
-    patch.object(Parser, 'lex')
-    assert story.lex() == Parser.lex()
+    patch.object(Parser, 'iter_tokens')
+    result = story.lex()
+    Parser.iter_tokens.assert_called_with(story.story)
+    assert result == Parser.iter_tokens()
+
+
+def test_story_lex_file(patch):
+    patch.object(io, 'open')
+    patch.init(Parser)
+    patch.object(Parser, 'iter_tokens', return_value=['token'])
+    result = list(Story.lex_file('hello.story'))
+    io.open.assert_called_with('hello.story', 'r')
+    Parser.iter_tokens.assert_called_with(io.open().__enter__())
+    assert result == ['token']
+
+
+def test_story_lex_file_not_found(patch, capsys):
+    patch.object(io, 'open', side_effect=FileNotFoundError)
+    with raises(SystemExit):
+        list(Story.lex_file('whatever'))
+    abspath = os.path.abspath('whatever')
+    message = 'File "whatever" not found at {}\n'.format(abspath)
+    assert capsys.readouterr().out == message
 
 
 def test_story_process(patch, story):
@@ -134,7 +210,7 @@ def test_story_process(patch, story):
     story.compiled = 'compiled'
     result = story.process()
     Story.parse.assert_called_with(ebnf_file=None, debug=False)
-    Story.compile.assert_called_with(debug=False)
+    Story.compile.assert_called_with(debug=False, segments=False)
     assert result == story.compiled
 
 
@@ -143,7 +219,14 @@ def test_story_process_debug(patch, story):
     story.compiled = 'compiled'
     story.process(debug='debug')
     Story.parse.assert_called_with(ebnf_file=None, debug='debug')
-    Story.compile.assert_called_with(debug='debug')
+    Story.compile.assert_called_with(debug='debug', segments=False)
+
+
+def test_story_process_segments(patch, story):
+    patch.many(Story, ['parse', 'compile'])
+    story.compiled = 'compiled'
+    story.process(segments=True)
+    Story.compile.assert_called_with(debug=False, segments=True)
 
 
 def test_story_process_ebnf_file(patch, story):
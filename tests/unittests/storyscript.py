@@ -1,15 +1,39 @@
 # -*- coding: utf-8 -*-
+from pytest import raises
+
+import storyscript
 from storyscript import load, loads, version
 from storyscript.api import Api
 from storyscript.version import version as real_version
 
 
-def test_storyscript_load():
-    assert load == Api.load
+def test_storyscript_load(patch):
+    patch.object(Api, 'load')
+    result = load('stream')
+    Api.load.assert_called_with('stream')
+    assert result == Api.load()
+
+
+def test_storyscript_loads(patch):
+    patch.object(Api, 'loads')
+    result = loads('string')
+    Api.loads.assert_called_with('string')
+    assert result == Api.loads()
+
+
+def test_storyscript_loads_segments(patch):
+    patch.object(Api, 'loads')
+    loads('string', segments=True)
+    Api.loads.assert_called_with('string', segments=True)
+
+
+def test_storyscript_api():
+    assert storyscript.Api is Api
 
 
-def test_storyscript_loads():
-    assert loads == Api.loads
+def test_storyscript_getattr_missing():
+    with raises(AttributeError):
+        storyscript.missing
 
 
 def test_storyscript_version():